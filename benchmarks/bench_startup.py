@@ -0,0 +1,64 @@
+"""
+Startup time of the botblox CLI.
+
+Runs typical invocations of the CLI in fresh interpreters (like provisioning scripts do) and reports the wall time of
+each. Usage:
+
+    python benchmarks/bench_startup.py [--repeat N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+INVOCATIONS = [
+    ['--help'],
+    ['-D', 'test', 'erase'],
+    ['-D', 'test', 'vlan', '--group', '1', '2'],
+    ['-D', 'test', 'mirror', '--rx-port', '1'],
+    ['-D', 'test', 'tag-vlan', '--vlan', '2', '1', '2', '--default-vlan', '2'],
+    ['-S', 'nano', '-D', 'test', 'tag-vlan', '--reset'],
+]
+
+
+def time_invocation(argv: List[str], repeat: int) -> List[float]:
+    """
+    Run the CLI with the given arguments several times.
+    :param argv: The CLI arguments.
+    :param repeat: Number of runs.
+    :return: Wall times of the runs in seconds.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([root, env.get('PYTHONPATH', '')])
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'botblox_config'] + argv, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='Number of runs of each invocation (default: 10)')
+    args = parser.parse_args()
+
+    interpreter = list()
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        interpreter.append(time.perf_counter() - start)
+    sys.stdout.write('bare interpreter: min {:.1f} ms\n'.format(1000 * min(interpreter)))
+    for argv in INVOCATIONS:
+        times = sorted(time_invocation(argv, args.repeat))
+        sys.stdout.write('botblox {:<60} min {:6.1f} ms  median {:6.1f} ms\n'.format(
+            ' '.join(argv), 1000 * times[0], 1000 * times[len(times) // 2]))
+
+
+if __name__ == '__main__':
+    main()
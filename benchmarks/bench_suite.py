@@ -0,0 +1,252 @@
+"""
+Benchmarks of the hot paths of botblox: switch construction, building and parsing configurations, command generation,
+CLI startup and the serial push (against a board emulated on a pseudo-terminal).
+
+Each benchmark is timed in several rounds. A round calls the benchmark as many times as needed to run for at least
+--min-time seconds, and the time per call is recorded. Results are written as JSON, and can be compared with the
+results of an earlier run to catch regressions. Usage:
+
+    python benchmarks/bench_suite.py [--output results.json] [--compare baseline.json] [--filter NAME]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_startup import time_invocation  # noqa: E402
+from botblox_config import __version__  # noqa: E402
+from botblox_config.cli import create_parser, get_parser, parse_commands  # noqa: E402
+from botblox_config.data_manager import TagVlanConfigCLI  # noqa: E402
+from botblox_config.switch import create_switch, SwitchChip  # noqa: E402
+from botblox_config.switch.baud_registry import BaudRateRegistry  # noqa: E402
+from botblox_config.switch.config_writer import UARTWriter  # noqa: E402
+from botblox_config.switch.device_state import STOP_COMMAND  # noqa: E402
+from botblox_config.switch.emulator import EmulatedDevice  # noqa: E402
+
+# full VLAN table of the SwitchBlox: VLANs 2..17, each with two of the five ports
+FULL_VLAN_TABLE = [arg for vlan in range(16) for arg in ['--vlan', str(vlan + 2), str(vlan % 5 + 1),
+                                                         str((vlan + 1) % 5 + 1)]]
+TAG_VLAN_ARGS = ['tag-vlan', '--vlan-mode', 'ENABLED', '--default-vlan', '2'] + FULL_VLAN_TABLE
+
+# a benchmark prepares its data and returns the function to time (or None if it cannot run here)
+Benchmark = Callable[[], Optional[Callable[[], object]]]
+BENCHMARKS: Dict[str, Benchmark] = dict()
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    def register(setup: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _tag_vlan_cli() -> Tuple[TagVlanConfigCLI, SwitchChip, argparse.Namespace]:
+    """
+    :return: The tag-vlan CLI, its switch and the parsed TAG_VLAN_ARGS.
+    """
+    switch = create_switch('switchblox')
+    parser = argparse.ArgumentParser()
+    cli = TagVlanConfigCLI(parser.add_subparsers(), switch)
+    return cli, switch, parser.parse_args(TAG_VLAN_ARGS)
+
+
+def _configured_switch() -> SwitchChip:
+    cli, switch, args = _tag_vlan_cli()
+    cli.apply(args)
+    return switch
+
+
+@benchmark('create_switch.switchblox')
+def bench_create_switch() -> Callable[[], object]:
+    return lambda: create_switch('switchblox')
+
+
+@benchmark('create_switch.nano')
+def bench_create_switch_nano() -> Callable[[], object]:
+    return lambda: create_switch('nano')
+
+
+@benchmark('tag_vlan.apply_full_table')
+def bench_tag_vlan_apply() -> Callable[[], object]:
+    cli, _, args = _tag_vlan_cli()
+    return lambda: cli.apply(args)
+
+
+@benchmark('get_commands.all')
+def bench_get_commands() -> Callable[[], object]:
+    switch = _configured_switch()
+    return lambda: switch.get_commands(leave_out_default=False)
+
+
+@benchmark('get_commands.non_default')
+def bench_get_commands_non_default() -> Callable[[], object]:
+    switch = _configured_switch()
+    return lambda: switch.get_commands()
+
+
+@benchmark('get_commands.only_touched')
+def bench_get_commands_only_touched() -> Callable[[], object]:
+    switch = _configured_switch()
+    return lambda: switch.get_commands(only_touched=True)
+
+
+@benchmark('cli.parse_tag_vlan')
+def bench_parse() -> Callable[[], object]:
+    argv = ['--device', 'test'] + TAG_VLAN_ARGS
+    return lambda: parse_commands(create_parser(), argv)[1].get_commands()
+
+
+@benchmark('cli.parse_tag_vlan_shared_parser')
+def bench_parse_shared_parser() -> Callable[[], object]:
+    argv = ['--device', 'test'] + TAG_VLAN_ARGS
+    return lambda: parse_commands(get_parser(), argv)[1].get_commands()
+
+
+@benchmark('cli.startup')
+def bench_startup() -> Callable[[], object]:
+    return lambda: time_invocation(['-D', 'test', 'vlan', '--group', '1', '2'], 1)
+
+
+@benchmark('uart.write_full_table')
+def bench_uart_write() -> Optional[Callable[[], object]]:
+    if not hasattr(os, 'openpty'):
+        return None
+    _, transaction = parse_commands(create_parser(), ['--device', 'test'] + TAG_VLAN_ARGS)
+    commands = transaction.get_commands()
+    commands.append([STOP_COMMAND, 0, 0, 0])
+    device = EmulatedDevice('switchblox')
+    writer = UARTWriter(device.start(), rtscts=True, timeout=2, protocol='auto')  # the emulated board is framed
+    writer.baud_registry = BaudRateRegistry(os.path.join(tempfile.mkdtemp(prefix='botblox-bench-'),
+                                                         BaudRateRegistry.FILE_NAME))
+    writer.connect()  # the pty lives until the process ends
+
+    def write() -> None:
+        if not writer.write(commands):
+            raise RuntimeError('Emulated board did not confirm the configuration')
+    return write
+
+
+def measure(run: Callable[[], object], rounds: int, min_time: float) -> Dict:
+    """
+    Time a benchmark.
+    :param run: The function to time.
+    :param rounds: Number of rounds.
+    :param min_time: Minimum duration of a round (in seconds).
+    :return: Statistics of the time per call (in seconds).
+    """
+    run()  # warm up caches
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        duration = time.perf_counter() - start
+        if duration >= min_time:
+            break
+        loops *= 10 if duration < min_time / 10 else 2
+
+    times = [duration / loops]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        times.append((time.perf_counter() - start) / loops)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'rounds': len(times),
+        'loops': loops,
+    }
+
+
+def machine_info() -> Dict:
+    """
+    :return: Description of the environment the benchmarks ran in.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'botblox': __version__,
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Find benchmarks that got slower than in the baseline.
+    :param results: Results of this run.
+    :param baseline: Results of an earlier run.
+    :param threshold: Allowed ratio of the new and old median time.
+    :return: Descriptions of the regressions.
+    """
+    regressions = list()
+    for name, stats in results['benchmarks'].items():
+        old = baseline.get('benchmarks', dict()).get(name)
+        if old is None:
+            continue
+        ratio = stats['median'] / old['median']
+        if ratio > threshold:
+            regressions.append('{}: {:.3g} s -> {:.3g} s ({:.2f}x)'.format(name, old['median'], stats['median'], ratio))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('-c', '--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('-t', '--threshold', type=float, default=1.25,
+                        help='Report a regression if a median is this many times slower than before (default: 1.25)')
+    parser.add_argument('-k', '--filter', help='Run only benchmarks whose name contains this string')
+    parser.add_argument('--rounds', type=int, default=5, help='Number of rounds of each benchmark (default: 5)')
+    parser.add_argument('--min-time', type=float, default=0.1,
+                        help='Minimum duration of a round in seconds (default: 0.1)')
+    args = parser.parse_args()
+
+    results = {'machine': machine_info(), 'benchmarks': dict()}
+    for name, setup in BENCHMARKS.items():
+        if args.filter is not None and args.filter not in name:
+            continue
+        run = setup()
+        if run is None:
+            sys.stdout.write('{:<32} skipped\n'.format(name))
+            continue
+        stats = measure(run, max(args.rounds, 1), args.min_time)
+        results['benchmarks'][name] = stats
+        sys.stdout.write('{:<32} min {:10.1f} us  median {:10.1f} us  ({} x {} calls)\n'.format(
+            name, 1e6 * stats['min'], 1e6 * stats['median'], stats['rounds'], stats['loops']))
+
+    if args.output is not None:
+        with open(args.output, 'wt') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare, 'rt') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            sys.stdout.write('REGRESSION ' + regression + '\n')
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
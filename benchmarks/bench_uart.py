@@ -0,0 +1,96 @@
+"""
+Throughput of the UART protocol, measured against emulated boards (no hardware needed, POSIX only).
+
+Pushes a full configuration to a board emulated on a pseudo-terminal in frames and with the pacing modes of the
+legacy format, and to several boards in parallel. The effect of the window of unacknowledged frames is measured with
+a large configuration and a slow round trip. Usage:
+
+    python benchmarks/bench_uart.py [--repeat N] [--devices N] [--command-time SECONDS] [--latency SECONDS]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botblox_config.batch import BatchJob, compile_commands, provision  # noqa: E402
+from botblox_config.switch.config_writer import UARTWriter  # noqa: E402
+from botblox_config.switch.device_state import DeviceStateStore  # noqa: E402
+from botblox_config.switch.emulator import EmulatedDevice  # noqa: E402
+
+CONFIG = ['vlan', '--group', '1', '2', '+', 'tag-vlan', '--vlan', '2', '1', '2', '--default-vlan', '2']
+
+
+def time_runs(run: Callable[[], None], repeat: int) -> List[float]:
+    """
+    :param run: The function to time.
+    :param repeat: Number of runs.
+    :return: Sorted wall times of the runs in seconds.
+    """
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+def report(name: str, times: List[float], num_commands: int) -> None:
+    median = times[len(times) // 2]
+    sys.stdout.write('{:<40} min {:7.1f} ms  median {:7.1f} ms  {:8.0f} commands/s\n'.format(
+        name, 1000 * times[0], 1000 * median, num_commands / median))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs of each scenario (default: 5)')
+    parser.add_argument('--devices', type=int, default=8, help='Number of boards provisioned in parallel (default: 8)')
+    parser.add_argument('--command-time', type=float, default=0.0002,
+                        help='Time the emulated MCU needs for one command in seconds (default: 0.0002)')
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='Round trip time of the line for the window scenarios in seconds (default: 0.002)')
+    args = parser.parse_args()
+
+    commands = compile_commands('switchblox', CONFIG)
+    num = len(commands)
+    sys.stdout.write('configuration: {} commands\n'.format(num))
+    # keep the emulated boards out of the real caches (device state, baud rates)
+    os.environ['BOTBLOX_CACHE_DIR'] = tempfile.mkdtemp(prefix='botblox-bench-')
+
+    with EmulatedDevice('switchblox', command_time=args.command_time) as device:
+        for name, kwargs in [('framed', {'protocol': 'framed'}),
+                             ('framed, initial baud rate', {'protocol': 'framed', 'negotiate_baudrate': False}),
+                             ('flow control (no pause)', {'rtscts': True, 'protocol': 'legacy'}),
+                             ('adaptive pause', {'adaptive_gap': True, 'protocol': 'legacy'}),
+                             ('default pause', {'protocol': 'legacy'})]:
+            writer = UARTWriter(device.device_name, timeout=2, **kwargs)
+            report(name, time_runs(lambda: writer.write(commands), args.repeat), num)
+
+    # every register of the switch, in frames of 8 commands
+    large = compile_commands('switchblox', ['erase']) + [[phy, mii, 0, 0] for phy in range(32) for mii in range(32)]
+    with EmulatedDevice('switchblox', latency=args.latency) as device:
+        device.emulator.capabilities.max_payload = 1 + 8 * 4
+        for window in (1, 4, 16):
+            device.emulator.capabilities.window = window
+            writer = UARTWriter(device.device_name, timeout=2, protocol='framed', negotiate_baudrate=False)
+            report('window of {} frames'.format(window), time_runs(lambda: writer.write(large), args.repeat),
+                   len(large))
+
+    devices = [EmulatedDevice('switchblox', command_time=args.command_time) for _ in range(args.devices)]
+    try:
+        jobs = [BatchJob(device.start(), 'switchblox', CONFIG) for device in devices]
+        state_store = DeviceStateStore()
+        for workers in sorted({1, args.devices}):
+            times = time_runs(lambda: provision(jobs, workers, state_store=state_store), args.repeat)
+            report('{} boards, {} worker(s)'.format(len(jobs), workers), times, num * len(jobs))
+    finally:
+        for device in devices:
+            device.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+"""Provisioning of many devices in parallel."""
+
+import argparse
+import functools
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .cli import COMMAND_SEPARATOR, get_parser, get_writer_settings, parse_commands, split_commands
+from .compiler import CommandCache, compile_config
+from .switch import create_switch, probe_switch
+from .switch.commands import CommandBuffer
+from .switch.device_state import DeviceStateStore, STOP_COMMAND
+
+
+class BatchJob:
+    """
+    Configuration of one device listed in a batch manifest.
+    """
+    def __init__(self, device: str, switch_type: str, config_args: Sequence[str],
+                 writer_settings: Optional[Dict[str, Any]] = None) -> None:
+        """
+        :param device: The device to configure (e.g. /dev/ttyUSB0).
+        :param switch_type: Type of the switch connected to the device.
+        :param config_args: CLI arguments describing the configuration (e.g. ["tag-vlan", "--reset"]).
+        :param writer_settings: Settings of the config writer for this device (see UARTSettings).
+        """
+        self.device = device
+        self.switch_type = switch_type
+        self.config_args: Tuple[str, ...] = tuple(config_args)
+        self.writer_settings: Dict[str, Any] = dict(writer_settings or dict())
+
+    def config_key(self) -> Tuple[str, Tuple[str, ...]]:
+        """
+        :return: Key that is equal for all jobs that need the same commands.
+        """
+        return self.switch_type, self.config_args
+
+
+class DeviceReport:
+    """
+    Result of provisioning one device.
+    """
+    def __init__(self, device: str, switch_type: str) -> None:
+        self.device = device
+        self.switch_type = switch_type
+        self.success = False
+        self.attempts = 0
+        self.num_commands = 0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> Dict:
+        """
+        :return: JSON-serializable representation of the report.
+        """
+        return {
+            'device': self.device,
+            'switch': self.switch_type,
+            'success': self.success,
+            'attempts': self.attempts,
+            'retries': max(self.attempts - 1, 0),
+            'commands': self.num_commands,
+            'duration': round(self.duration, 3),
+            'error': self.error,
+        }
+
+    def __str__(self) -> str:
+        status = 'OK' if self.success else 'FAILED ({})'.format(self.error)
+        return '{}: {} in {:.2f} s, {} attempt(s), {} command(s)'.format(
+            self.device, status, self.duration, self.attempts, self.num_commands)
+
+
+# settings of the config writer that can be given for each device in a manifest, and their types
+WRITER_SETTINGS = {
+    'protocol': (str,),
+    'negotiate_baudrate': (bool,),
+    'rtscts': (bool,),
+    'adaptive_gap': (bool,),
+    'command_gap': (int, float),
+}
+
+
+def load_manifest(path: str) -> List[BatchJob]:
+    """
+    Load the list of jobs from a JSON manifest file.
+
+    The manifest looks like this:
+
+        {
+            "configs": {"office": ["tag-vlan", "--vlan", "2", "1", "2"]},
+            "devices": [
+                {"device": "/dev/ttyUSB0", "switch": "switchblox", "config": "office"},
+                {"device": "/dev/ttyUSB1", "switch": "nano", "config": ["mirror", "--rx-port", "1"], "rtscts": true}
+            ]
+        }
+
+    The "config" of a device is either a list of CLI arguments or a name of an entry in "configs". The "switch" is
+    optional and defaults to "switchblox". The settings of the config writer listed in WRITER_SETTINGS ("protocol",
+    "negotiate_baudrate", "rtscts", "adaptive_gap" and "command_gap") can be given for each device, they override the
+    CLI options.
+
+    :param path: Path to the manifest.
+    :return: The jobs.
+    :raise ValueError: If the manifest is invalid.
+    """
+    with open(path, 'rt') as f:
+        manifest = json.load(f)
+
+    configs: Dict[str, List[str]] = manifest.get('configs', dict())
+    jobs = list()
+    for entry in manifest.get('devices', list()):
+        if 'device' not in entry or 'config' not in entry:
+            raise ValueError('Each device in the manifest needs a "device" and a "config", got {}'.format(entry))
+        config = entry['config']
+        if isinstance(config, str):
+            if config not in configs:
+                raise ValueError('Unknown config "{}" used for device {}'.format(config, entry['device']))
+            config = configs[config]
+        settings = {key: value for key, value in entry.items() if key in WRITER_SETTINGS}
+        for key, value in settings.items():
+            types = WRITER_SETTINGS[key]
+            if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):  # bool is an int
+                raise ValueError('Invalid "{}" for device {}: {}'.format(key, entry['device'], value))
+        jobs.append(BatchJob(entry['device'], entry.get('switch', 'switchblox'), [str(a) for a in config], settings))
+    return jobs
+
+
+def compile_commands(switch_type: str, config_args: Sequence[str]) -> CommandBuffer:
+    """
+    Create the commands (including the stop command) for the given configuration.
+    :param switch_type: Type of the switch.
+    :param config_args: CLI arguments describing the configuration. Several commands can be combined with "+".
+    :return: The commands.
+    :raise ValueError: If the configuration is invalid.
+    """
+    argv = ['--switch', switch_type, '--device', 'test'] + list(config_args)
+    try:
+        _, transaction = parse_commands(get_parser(), argv)
+    except SystemExit:
+        raise ValueError('Invalid configuration: {}'.format(' '.join(config_args)))
+    if transaction is None:
+        raise ValueError('Not a configuration command: {}'.format(' '.join(config_args)))
+    data = transaction.get_commands()
+    data.append([STOP_COMMAND, 0, 0, 0])
+    return data
+
+
+def config_settings(switch_type: str, config_args: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Return the normalized settings of a configuration: the options of each of its commands as parsed by the CLI,
+    without the global options. Equivalent arguments (e.g. "-g" instead of "--group", or options in another order)
+    give the same settings.
+    :param switch_type: Type of the switch.
+    :param config_args: CLI arguments describing the configuration. Several commands can be combined with "+".
+    :return: The command and options of each command, in the given order.
+    :raise ValueError: If the configuration is invalid.
+    """
+    parser = get_parser()
+    global_options = set(vars(parser.parse_args([])))
+    settings = list()
+    for segment in split_commands(config_args):
+        try:
+            args = parser.parse_args(['--switch', switch_type] + segment)
+        except SystemExit:
+            raise ValueError('Invalid configuration: {}'.format(' '.join(config_args)))
+        if 'execute' not in args:
+            raise ValueError('Not a configuration command: {}'.format(' '.join(config_args)))
+        options = {key: value for key, value in vars(args).items() if key not in global_options and key != 'execute'}
+        settings.append({'command': args.execute.__qualname__, 'options': options})
+    return settings
+
+
+# commands reading a file, whose arguments therefore do not identify the configuration
+FILE_COMMANDS = ('apply',)
+
+
+def args_identify_config(config_args: Sequence[str]) -> bool:
+    """
+    :param config_args: CLI arguments describing the configuration.
+    :return: Whether the arguments alone identify the commands, i.e. none of the commands reads a file (the profile
+             of apply can change between runs; compile_profile() caches its commands by the file contents instead).
+    """
+    return not any(arg in FILE_COMMANDS for i, arg in enumerate(config_args)
+                   if i == 0 or config_args[i - 1] == COMMAND_SEPARATOR)
+
+
+def provision_device(job: BatchJob,
+                     commands: CommandBuffer,
+                     retries: int = 1,
+                     only_changed: bool = False,
+                     state_store: Optional[DeviceStateStore] = None,
+                     probe: bool = False,
+                     writer_settings: Optional[Dict[str, Any]] = None) -> DeviceReport:
+    """
+    Write the commands to one device.
+
+    The writer does not repeat a push that the board did not confirm, so the retries are the only repetitions: a device
+    that does not answer receives the commands at most retries + 1 times.
+    :param job: The job describing the device.
+    :param commands: The commands to write (including the stop command).
+    :param retries: How many times to retry a failed write.
+    :param only_changed: If True, registers already holding the written value are left out.
+    :param state_store: Store of the last known device state.
+    :param probe: Whether to check that the expected switch answers before writing to it.
+    :param writer_settings: Settings of the config writer (see UARTSettings). Those of the job take precedence.
+    :return: The report.
+    """
+    report = DeviceReport(job.device, job.switch_type)
+    start = time.monotonic()
+    try:
+        switch = create_switch(job.switch_type)
+        writer = switch.get_config_writer(job.device, **dict(writer_settings or dict(), **job.writer_settings))
+        device_key = writer.device_key()
+        if only_changed and device_key is not None and state_store is not None:
+            commands = state_store.diff(device_key, switch.name(), commands[:-1])
+            commands = commands + [[STOP_COMMAND, 0, 0, 0]] if len(commands) > 0 else CommandBuffer()
+        report.num_commands = len(commands)
+        if len(commands) == 0:
+            report.success = True
+        else:
+            with writer:
+                if probe:
+                    probe_switch(writer, job.switch_type)
+                while not report.success and report.attempts <= retries:
+                    report.attempts += 1
+                    report.success = writer.write(commands)
+            if not report.success:
+                report.error = 'board did not confirm the configuration'
+            elif device_key is not None and state_store is not None:
+                state_store.record(device_key, switch.name(), commands)
+    except Exception as e:
+        report.error = str(e)
+    report.duration = time.monotonic() - start
+    return report
+
+
+def provision(jobs: Sequence[BatchJob],
+              max_workers: int = 8,
+              retries: int = 1,
+              only_changed: bool = False,
+              state_store: Optional[DeviceStateStore] = None,
+              command_cache: Optional[CommandCache] = None,
+              probe: bool = False,
+              writer_settings: Optional[Dict[str, Any]] = None) -> List[DeviceReport]:
+    """
+    Configure all devices listed in the jobs concurrently.
+
+    Commands are created only once for each distinct configuration and then pushed to all devices that need them.
+    Configurations compiled by earlier runs are taken from the command cache, unless they are read from files. The
+    cache is keyed by the normalized settings of the configuration (see config_settings()).
+
+    :param jobs: The jobs to run.
+    :param max_workers: Maximum number of devices configured at the same time.
+    :param retries: How many times to retry a failed write.
+    :param only_changed: If True, registers already holding the written value are left out.
+    :param state_store: Store of the last known device state. A default store is used if None.
+    :param command_cache: Cache of compiled commands. A default cache is used if None.
+    :param probe: Whether to check that the expected switch answers before writing to it.
+    :param writer_settings: Settings of the config writer for all devices (see UARTSettings). Those of a job take
+                            precedence.
+    :return: Reports for all jobs (in the same order as jobs).
+    """
+    if state_store is None:
+        state_store = DeviceStateStore()
+    if command_cache is None:
+        command_cache = CommandCache()
+
+    compiled: Dict[Tuple[str, Tuple[str, ...]], CommandBuffer] = dict()
+    errors: Dict[Tuple[str, Tuple[str, ...]], str] = dict()
+    for job in jobs:
+        key = job.config_key()
+        if key in compiled or key in errors:
+            continue
+        try:
+            cache = command_cache if args_identify_config(job.config_args) else None
+            config = config_settings(job.switch_type, job.config_args) if cache is not None else None
+            compiled[key] = compile_config(
+                job.switch_type, config, functools.partial(compile_commands, job.switch_type, job.config_args), cache)
+        except ValueError as e:
+            errors[key] = str(e)
+
+    def run_job(job: BatchJob) -> DeviceReport:
+        key = job.config_key()
+        if key in errors:
+            report = DeviceReport(job.device, job.switch_type)
+            report.error = errors[key]
+            return report
+        return provision_device(job, compiled[key], retries, only_changed, state_store, probe, writer_settings)
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        return list(executor.map(run_job, jobs))
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """
+    Run the "batch" CLI command.
+    :param args: The parsed CLI args.
+    :return: Exit code of the program.
+    """
+    jobs = load_manifest(args.manifest)
+    start = time.monotonic()
+    reports = provision(jobs, args.jobs, args.retries, args.only_changed, probe=args.probe,
+                        writer_settings=get_writer_settings(args))
+    duration = time.monotonic() - start
+
+    for report in reports:
+        if report.success:
+            logging.info(str(report))
+        else:
+            logging.error(str(report))
+    num_failed = len([r for r in reports if not r.success])
+    logging.info('Configured {} of {} devices in {:.2f} s'.format(len(reports) - num_failed, len(reports), duration))
+
+    if args.report is not None:
+        with open(args.report, 'wt') as f:
+            json.dump([r.as_dict() for r in reports], f, indent=1)
+
+    return 1 if num_failed > 0 else 0
@@ -0,0 +1,61 @@
+"""Local on-disk storage for state the tool remembers between runs."""
+
+import json
+import os
+import tempfile
+from typing import Any
+
+
+def get_cache_dir() -> str:
+    """
+    Return the directory where botblox keeps its caches.
+
+    The directory can be set using the BOTBLOX_CACHE_DIR environment variable. Otherwise, it is "botblox" in
+    XDG_CACHE_HOME (~/.cache by default).
+    :return: Path to the cache directory (it does not need to exist).
+    """
+    cache_dir = os.environ.get('BOTBLOX_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(xdg_cache_home, 'botblox')
+
+
+def get_cache_file(name: str) -> str:
+    """
+    :param name: Name of the file.
+    :return: Path to the given file in the cache directory.
+    """
+    return os.path.join(get_cache_dir(), name)
+
+
+def load_json(path: str, default: Any = None) -> Any:
+    """
+    Load a JSON file, tolerating a missing or corrupt file.
+    :param path: Path to the file.
+    :param default: The value to return if the file cannot be read.
+    :return: The loaded data.
+    """
+    try:
+        with open(path, 'rt') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path: str, data: Any) -> None:
+    """
+    Atomically replace the given file with JSON-serialized data, creating its directory if needed.
+    :param path: Path to the file.
+    :param data: The data to store.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wt') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -1,24 +1,92 @@
 """File for defining BotBlox CLI."""
 
 import argparse
+import io
 import logging
 import sys
-from typing import List, Tuple
+import threading
+from typing import Any, Dict, IO, List, Optional, Sequence, Tuple, TYPE_CHECKING
 
-from .data_manager import (
-    EraseConfigCLI,
-    PortMirrorConfig,
-    TagVlanConfigCLI,
-    VlanConfig,
-)
-from .switch import create_switch, SwitchChip
+from .data_manager.argparse_utils import LazySubParsersAction
 
-logging.basicConfig(level=logging.DEBUG)
+if TYPE_CHECKING:
+    from .data_manager.transaction import ConfigTransaction
+    from .switch import SwitchChip
+    from .switch.commands import CommandBuffer
 
+SWITCH_TYPES = ("switchblox", "switchblox_nano", "nano")
 
-def create_parser(argv: List[str] = None) -> Tuple[argparse.ArgumentParser, SwitchChip]:
-    """Define all cli parser and subparsers here."""
-    parser = argparse.ArgumentParser(
+# separates configuration commands that are written to the device together
+COMMAND_SEPARATOR = '+'
+
+
+class _CapturedStreams(threading.local):
+    """
+    Streams receiving the messages of CLIParser instances in the current thread (None means sys.stdout/sys.stderr).
+    """
+    def __init__(self) -> None:
+        self.output: Optional[IO[str]] = None
+        self.errors: Optional[IO[str]] = None
+
+
+_captured = _CapturedStreams()
+
+
+class CLIParser(argparse.ArgumentParser):
+    """
+    Argument parser whose messages (help, usage and errors) are captured while run() is executing in the same thread.
+    """
+    def _print_message(self, message: str, file: Optional[IO[str]] = None) -> None:
+        if message:
+            if file is sys.stderr and _captured.errors is not None:
+                file = _captured.errors
+            elif file is not sys.stderr and _captured.output is not None:
+                file = _captured.output
+        super()._print_message(message, file)
+
+
+class Result:
+    """
+    Outcome of one in-process run of the CLI (see run()).
+    """
+    def __init__(self,
+                 exit_code: int,
+                 commands: Optional['CommandBuffer'] = None,
+                 output: str = '',
+                 errors: str = '') -> None:
+        """
+        :param exit_code: Exit code the program would end with.
+        :param commands: Commands sent to the device (including the stop command), or None if nothing was sent. For
+                         the "test" device, the commands that would be sent.
+        :param output: Text printed to stdout by the argument parser (e.g. help).
+        :param errors: Text printed to stderr by the argument parser (usage and errors), and the reason of a failed
+                       configuration.
+        """
+        self.exit_code = exit_code
+        self.commands = commands
+        self.output = output
+        self.errors = errors
+
+    @property
+    def success(self) -> bool:
+        """
+        :return: Whether the run ended with exit code 0.
+        """
+        return self.exit_code == 0
+
+    def __repr__(self) -> str:
+        return 'Result(exit_code={}, commands={}, errors={!r})'.format(self.exit_code, self.commands, self.errors)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """
+    Define all cli parser and subparsers here.
+
+    Arguments of the subcommands are added only when the subcommand is selected (see LazySubParsersAction), so only the
+    data manager of the selected subcommand is imported and set up.
+    """
+    parser = CLIParser(
+        prog='botblox',
         description='CLI for configuring SwitchBlox managed settings',
         epilog='Please open any issue on https://github.com/botblox/botblox-manager-software/ if there is a problem',
     )
@@ -27,171 +95,437 @@ def create_parser(argv: List[str] = None) -> Tuple[argparse.ArgumentParser, Swit
         '-S',
         '--switch',
         type=str,
-        choices=("switchblox", "switchblox_nano", "nano"),
+        choices=SWITCH_TYPES,
         help='Select the type of the connected switch (default is switchblox)',
         nargs='?',
         default="switchblox",
         required=False,
     )
 
-    try:
-        if argv is None:
-            argv = sys.argv
-        switch_namespace, _ = parser.parse_known_args(list(filter(lambda a: a != '-h' and a != '--help', argv)))
-        switch_name = switch_namespace.switch
-    except argparse.ArgumentError as e:
-        switch_name = "switchblox"
-        logging.error(str(e))
-
-    switch = create_switch(switch_name)
-
     parser.add_argument(
         '-D',
         '--device',
-        type=switch.get_config_writer,
-        help='Select the {} device. Set to "test" to disable actual writing to the device.'.format(
-            switch.get_config_writer_description()
-        ),
+        type=str,
+        help='Select the config writer device of the switch (e.g. the UART to USB converter). Set to "test" to '
+             'disable actual writing to the device.',
         nargs='?',
-        required=True,
+        required=False,
+    )
+
+    parser.add_argument(
+        '--only-changed',
+        action='store_true',
+        help='Only send registers whose value differs from what was last successfully written to the device',
+    )
+    parser.add_argument(
+        '--probe',
+        action='store_true',
+        help='Check that the board answers and is the --switch type before writing to it. Only for boards with '
+             'firmware that supports the framed protocol, older firmware stores the probe as a register write',
+    )
+    parser.add_argument(
+        '--protocol',
+        type=str,
+        choices=('legacy', 'framed', 'auto'),
+        default=None,
+        help='Format of the commands sent to the board (default: legacy). "framed" sends CRC-protected frames, "auto" '
+             'asks the board with a hello command first. Only use them with boards whose firmware supports the framed '
+             'protocol, older firmware stores the hello as a register write',
+    )
+    parser.add_argument(
+        '--no-baud-negotiation',
+        action='store_true',
+        help='Keep the initial baud rate, even if the board supports faster ones (framed protocol only)',
+    )
+    parser.add_argument(
+        '--rtscts',
+        action='store_true',
+        help='Use RTS/CTS hardware flow control instead of pausing between commands (the converter and board must '
+             'support it)',
+    )
+    gap_group = parser.add_mutually_exclusive_group()
+    gap_group.add_argument(
+        '--adaptive-gap',
+        action='store_true',
+        help='Start with a short pause between commands and make it longer if the board does not confirm a write. '
+             'Only for boards known to keep up, a board missing commands can confirm a partial configuration',
+    )
+    gap_group.add_argument(
+        '--command-gap',
+        type=float,
+        default=None,
+        metavar='SECONDS',
+        help='Pause between commands (default: 0.1)',
     )
 
     subparsers = parser.add_subparsers(
         title='Individual group commands for each configuration',
-        description='Please choose a certain command',
+        description='Please choose a certain command. Several configuration commands can be combined with "{}" to '
+                    'write them to the device at once, e.g. "vlan --group 1 2 {} mirror --rx-port 3".'.format(
+                        COMMAND_SEPARATOR, COMMAND_SEPARATOR),
+        action=LazySubParsersAction,
     )
+    subparsers.add_lazy_parser('vlan', _build_vlan_parser, help='Configure the ports to be in VLAN groups')
+    subparsers.add_lazy_parser('mirror', _build_mirror_parser, help='Configure the ports to mirror traffic')
+    subparsers.add_lazy_parser('tag-vlan', _build_tag_vlan_parser, help='Configure tagged VLAN')
+    subparsers.add_lazy_parser('erase', _build_erase_parser, help='Erase all configuration')
+    subparsers.add_lazy_parser(
+        'apply', _build_apply_parser, help='Apply a complete switch configuration from a profile file')
+    subparsers.add_lazy_parser(
+        'show', _build_show_parser,
+        help='Read and print the configuration of the switch (only for boards with framed firmware)')
+    subparsers.add_lazy_parser(
+        'batch', _build_batch_parser, help='Configure many devices in parallel as described in a manifest file')
+    subparsers.add_lazy_parser(
+        'discover', _build_discover_parser,
+        help='List the USB serial ports, and find the boards with framed firmware on them (--framed-firmware)')
+
+    return parser
+
+
+_parser: Optional[argparse.ArgumentParser] = None
+_parser_lock = threading.Lock()
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Return the parser shared by all callers in this process, created by create_parser() on first use.
+
+    Parsing does not modify the parser (subcommand parsers are built once for each switch type and kept), so the
+    parser can be used for any number of command lines, also from several threads at once.
+    :return: The parser.
+    """
+    global _parser
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                _parser = create_parser()
+    return _parser
+
+
+def split_commands(argv: Sequence[str]) -> List[List[str]]:
+    """
+    :param argv: CLI arguments that can contain several commands separated by COMMAND_SEPARATOR.
+    :return: The arguments of each command (the first one includes the global options).
+    """
+    segments: List[List[str]] = [[]]
+    for arg in argv:
+        if arg == COMMAND_SEPARATOR:
+            segments.append(list())
+        else:
+            segments[-1].append(arg)
+    return segments
+
+
+def parse_commands(parser: argparse.ArgumentParser, argv: List[str]) \
+        -> Tuple[argparse.Namespace, 'ConfigTransaction']:
+    """
+    Parse CLI arguments that can contain several configuration commands separated by COMMAND_SEPARATOR. The global
+    options are given before the first command. All commands configure the same switch chip, so their registers are
+    merged into one command stream.
+    :param parser: Parser created by create_parser().
+    :param argv: The CLI arguments (without the program name).
+    :return: The parsed arguments of the first command and a transaction holding the configuration of all commands
+             (None if the first command is not a configuration command).
+    """
+    segments = split_commands(argv)
+    args = parser.parse_args(segments[0])
+    if 'execute' not in args:
+        if len(segments) > 1:
+            parser.error('only configuration commands can be combined with "{}"'.format(COMMAND_SEPARATOR))
+        return args, None
+
+    from .data_manager.transaction import ConfigTransaction
+    from .switch import create_switch
+
+    # all commands configure the switch of the transaction, the parser keeps only the switch it was built for
+    switch = create_switch(args.switch)
+    transaction = ConfigTransaction(switch)
+    args.execute(args, switch).add_to(transaction)
+    for segment in segments[1:]:
+        if len(segment) == 0:
+            parser.error('a command is missing after "{}"'.format(COMMAND_SEPARATOR))
+        command_args = parser.parse_args(['--switch', args.switch] + segment)
+        if 'execute' not in command_args:
+            parser.error('"{}" cannot be combined with other commands'.format(segment[0]))
+        command_args.execute(command_args, switch).add_to(transaction)
+    return args, transaction
+
+
+def get_writer_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    :param args: The parsed CLI args.
+    :return: Settings of the config writer given by the global options (see UARTSettings), only those that are set.
+    """
+    settings: Dict[str, Any] = dict()
+    if args.protocol is not None:
+        settings['protocol'] = args.protocol
+    if args.no_baud_negotiation:
+        settings['negotiate_baudrate'] = False
+    if args.rtscts:
+        settings['rtscts'] = True
+    if args.adaptive_gap:
+        settings['adaptive_gap'] = True
+    if args.command_gap is not None:
+        settings['command_gap'] = args.command_gap
+    return settings
+
+
+def _get_switch(subparsers: LazySubParsersAction, switch_type: str) -> 'SwitchChip':
+    """
+    :return: The switch chip the subcommands of the parser are built for (it is never configured, parse_commands()
+             passes the switch to configure to the subcommands).
+    """
+    key = ('switch', switch_type)
+    if key not in subparsers.shared:
+        from .switch import create_switch
+        subparsers.shared[key] = create_switch(switch_type)
+    return subparsers.shared[key]
+
+
+def _build_vlan_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    from .data_manager.vlan import VlanConfigCLI
+
+    VlanConfigCLI(subparsers, _get_switch(subparsers, switch_type))
 
-    # VLAN CLI
-    vlan_parser = subparsers.add_parser(
-        'vlan',
-        help='Configure the ports to be in VLAN groups',
+
+def _build_mirror_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    from .data_manager.mirror import PortMirrorConfigCLI
+
+    PortMirrorConfigCLI(subparsers, _get_switch(subparsers, switch_type))
+
+
+def _build_tag_vlan_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    from .data_manager.tagvlan import TagVlanConfigCLI
+
+    TagVlanConfigCLI(subparsers, _get_switch(subparsers, switch_type))
+
+
+def _build_erase_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    from .data_manager.erase import EraseConfigCLI
+
+    EraseConfigCLI(subparsers, _get_switch(subparsers, switch_type))
+
+
+def _build_apply_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    from .data_manager.profiles import ProfileConfigCLI
+
+    ProfileConfigCLI(subparsers, _get_switch(subparsers, switch_type), switch_type)
+
+
+def _build_show_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    show_parser = subparsers.add_parser(
+        'show',
+        description='Read the configuration of the switch. Only boards whose firmware supports the framed protocol '
+                    'answer the read command; older firmware stores it as a register write with the next '
+                    'configuration, so reading has to be enabled with --framed-firmware.',
     )
-    vlan_parser_group = vlan_parser.add_mutually_exclusive_group(required=True)
-    vlan_parser_group.add_argument(
-        '-g',
-        '--group',
-        nargs='+',
-        action='append',
-        type=int,
-        choices=[1, 2, 3, 4, 5],
-        required=False,
-        help='''Define the VLAN member groups using port number,
-        i.e. --group 1 2 --group 3 4 makes Group A have
-        ports 1 and 2 and Group B have ports 3 and 4. All unmentioned
-        ports are assigned to default group. If a group has only 1 port,
-        the port gets isolated. In this example, port 5 would
-        not be allowed to communicate with any other port.'''
-    )
-    vlan_parser_group.add_argument(
-        '-r',
-        '--reset',
+    show_parser.add_argument(
+        '--framed-firmware',
         action='store_true',
-        default=argparse.SUPPRESS,
-        help='''Reset the VLAN configuration to be as system default'''
+        help='Confirm that the board runs firmware supporting the framed protocol (required)',
     )
-    vlan_parser_group.set_defaults(execute=VlanConfig)
-
-    # Port mirroring CLI
-    portmirror_parser = subparsers.add_parser(
-        'mirror',
-        help='Configure the ports to mirror traffic',
+    show_parser.add_argument(
+        '--raw',
+        action='store_true',
+        help='Print the register values instead of the configuration fields',
+    )
+    show_parser.add_argument(
+        '--changed',
+        action='store_true',
+        help='Print only fields (or registers) that differ from their default value',
     )
-    portmirror_parser_mutex_grouping = portmirror_parser.add_mutually_exclusive_group()
-    portmirror_parser_config_group = portmirror_parser_mutex_grouping.add_argument_group()
+    show_parser.set_defaults(run=_run_show)
 
-    portmirror_parser_config_group.add_argument(
-        '-m',
-        '--mode',
-        nargs='?',
-        default='RX',
+
+def _run_show(args: argparse.Namespace) -> int:
+    from .show import run_show
+    return run_show(args)
+
+
+def _build_batch_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    batch_parser = subparsers.add_parser('batch')
+    batch_parser.add_argument(
+        'manifest',
         type=str,
-        choices=['RX', 'TX', 'RXorTX', 'RXandTX'],
-        required=False,
-        help='''Select the mirror mode during operation''',
+        help='JSON file listing the devices, their switch types and configurations',
     )
-    portmirror_parser_config_group.add_argument(
-        '-M',
-        '--mirror-port',
-        nargs=1,
+    batch_parser.add_argument(
+        '-j',
+        '--jobs',
         type=int,
-        choices=[1, 2, 3, 4, 5],
-        required=False,
-        default=5,
-        help='''Select the mirror port (default: port 5)''',
+        default=8,
+        help='Maximum number of devices configured at the same time (default: 8)',
     )
-    portmirror_parser_config_group.add_argument(
-        '-rx',
-        '--rx-port',
-        nargs='+',
+    batch_parser.add_argument(
+        '--retries',
         type=int,
-        choices=[1, 2, 3, 4, 5],
-        required=any(mode in sys.argv for mode in ['RX', 'RXorTX', 'RXandTX']),
-        default=argparse.SUPPRESS,
-        help='''Select the source (receive) port to be mirrored''',
-    )
-    portmirror_parser_config_group.add_argument(
-        '-tx',
-        '--tx-port',
-        nargs='+',
+        default=1,
+        help='How many times to retry configuring a device that failed (default: 1)',
+    )
+    batch_parser.add_argument(
+        '--report',
+        type=str,
+        default=None,
+        help='Write a JSON report with results of all devices to this file',
+    )
+    batch_parser.set_defaults(run=_run_batch)
+
+
+def _run_batch(args: argparse.Namespace) -> int:
+    from .batch import run_batch
+    return run_batch(args)
+
+
+def _build_discover_parser(subparsers: argparse.Action, switch_type: str) -> None:
+    discover_parser = subparsers.add_parser(
+        'discover',
+        description='List the USB serial ports boards can be connected to. With --framed-firmware, each port is probed '
+                    'with the hello command (code 103) to find the boards and their switch types. Only boards whose '
+                    'firmware supports the framed protocol answer it. Older firmware stores the hello as a register '
+                    'write with the next configuration, and other USB serial devices receive it too, so only probe '
+                    'when all connected boards run framed firmware.',
+    )
+    discover_parser.add_argument(
+        '--framed-firmware',
+        action='store_true',
+        help='Probe the ports for boards with firmware supporting the framed protocol (older firmware stores the '
+             'probe as a register write)',
+    )
+    discover_parser.add_argument(
+        '-j',
+        '--jobs',
         type=int,
-        choices=[1, 2, 3, 4, 5],
-        required=any(mode in sys.argv for mode in ['TX', 'RXorTX', 'RXandTX']),
-        default=argparse.SUPPRESS,
-        help='''Select the destination (transmit) port to be mirrored''',
-    )
-    portmirror_parser_mutex_grouping.add_argument(
-        '-r',
-        '--reset',
+        default=None,
+        help='Maximum number of ports probed at the same time (default: all at once)',
+    )
+    discover_parser.add_argument(
+        '--json',
         action='store_true',
-        default=argparse.SUPPRESS,
-        help='Reset the Port mirroring configuration to default, this will turn port mirroring off'
+        help='Print the results as JSON',
     )
-    # (1) DEPRECATED
-    # portmirror_parser_mutex_grouping.set_defaults(execute=PortMirror().create_configuration)
-    # (2)
-    portmirror_parser_mutex_grouping.set_defaults(execute=PortMirrorConfig)
+    discover_parser.add_argument(
+        '--cached',
+        action='store_true',
+        help='Print the boards found by earlier discoveries (by USB serial number) without probing any port',
+    )
+    discover_parser.set_defaults(run=_run_discover)
 
-    commands = list()
-    commands.append(TagVlanConfigCLI(subparsers, switch))
-    commands.append(EraseConfigCLI(subparsers, switch))
 
-    return parser, switch
+def _run_discover(args: argparse.Namespace) -> int:
+    from .discover import run_discover
+    return run_discover(args)
 
 
-def cli() -> None:
-    parser, switch = create_parser()
+def run(argv: Sequence[str], parser: Optional[argparse.ArgumentParser] = None) -> Result:
+    """
+    Run the CLI in this process, e.g. from tests or services embedding botblox.
+
+    Neither sys.argv nor sys.exit() are used, and messages of the argument parser are returned instead of printed.
+    Commands that run on their own (show, batch, discover) still print their output and log as usual.
+
+    :param argv: The CLI arguments (without the program name).
+    :param parser: Parser created by create_parser(). The parser shared by the process is used if None.
+    :return: The result.
+    """
+    output, errors = io.StringIO(), io.StringIO()
+    _captured.output, _captured.errors = output, errors
+    try:
+        exit_code, commands, error = _run(parser if parser is not None else get_parser(), list(argv))
+    except SystemExit as e:  # the argument parser gave up (or printed help)
+        exit_code, commands, error = _exit_code(e), None, None
+    finally:
+        _captured.output, _captured.errors = None, None
+    if error is not None:
+        errors.write(error + '\n')
+    return Result(exit_code, commands, output.getvalue(), errors.getvalue())
+
 
-    if len(sys.argv) < 2:
-        sys.argv.append('--help')
-    elif len(sys.argv) == 3 and sys.argv[1] in ['--device', '-d']:
-        sys.argv.append('--help')
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    return e.code if isinstance(e.code, int) else 1
 
-    args = parser.parse_args()
 
-    config = args.execute(args)
-    data: List[List[int]] = config.create_configuration()
+def _run(parser: argparse.ArgumentParser, argv: List[str]) -> Tuple[int, Optional['CommandBuffer'], Optional[str]]:
+    """
+    Run the CLI.
+    :param parser: Parser created by create_parser().
+    :param argv: The CLI arguments (without the program name).
+    :return: The exit code, the commands sent to the device (None if nothing was sent) and the reason of a failure.
+    :raise SystemExit: If the arguments are wrong or help was printed.
+    """
+    if len(argv) < 1:
+        argv.append('--help')
+    elif len(argv) == 2 and argv[0] in ['--device', '-D', '-d']:
+        argv.append('--help')
+
+    args, transaction = parse_commands(parser, argv)
+
+    if 'run' in args:
+        return args.run(args), None, None
+    if args.device is None:
+        parser.error('the following arguments are required: -D/--device')
+    if 'execute' not in args:
+        parser.error('please choose a command')
+
+    # imported here to keep the startup of commands that don't write to a device (help, batch) fast
+    from .switch import create_switch, probe_switch
+    from .switch.config_writer import TestWriter
+    from .switch.device_state import DeviceStateStore, STOP_COMMAND
+
+    switch = create_switch(args.switch)
+    try:
+        writer = switch.get_config_writer(args.device, **get_writer_settings(args))
+    except ValueError as e:
+        parser.error('argument -D/--device: {}'.format(e))
+
+    data = transaction.get_commands()
 
     logging.debug('Data to be sent (excl. "stop" command): ')
     logging.debug('------------------------------------------')
     logging.debug(data)
     logging.debug('------------------------------------------')
 
+    state_store = DeviceStateStore()
+    device_key = writer.device_key()
+    if args.only_changed and device_key is not None:
+        data = state_store.diff(device_key, switch.name(), data)
+        if len(data) == 0:
+            logging.info('Device already holds this configuration, nothing to write')
+            return 0, data, None
+
     # add stop command
-    data.append([100, 0, 0, 0])
+    data.append([STOP_COMMAND, 0, 0, 0])
 
     logging.debug('Data sent (inc. "stop" command): ')
     logging.debug('------------------------------------------')
     logging.debug(data)
     logging.debug('------------------------------------------')
 
-    device_name = args.device
-    if device_name != "test":
-        writer = switch.get_config_writer(device_name)
+    if isinstance(writer, TestWriter):
+        logging.info('Test device used, no data were written to any serial port')
+        return 0, data, None
+
+    with writer:
+        if args.probe:
+            try:
+                probe_switch(writer, args.switch)
+            except (TimeoutError, ValueError) as e:
+                logging.error('{} (leave out --probe for boards with older firmware)'.format(e))
+                return 1, None, 'Cannot configure {}: {}'.format(args.device, e)
         is_success = writer.write(data)
 
-        if is_success:
-            logging.info('Successful configuration')
-        else:
-            logging.error('Failed to configure - check logs')
-    else:
-        logging.info('Test device used, no data were written to any serial port')
+    if not is_success:
+        logging.error('Failed to configure - check logs')
+        return 1, data, 'Failed to configure {}'.format(args.device)
+    logging.info('Successful configuration')
+    if device_key is not None:
+        state_store.record(device_key, switch.name(), data)
+    return 0, data, None
+
+
+def cli() -> None:
+    logging.basicConfig(level=logging.DEBUG)
+    exit_code, _, _ = _run(get_parser(), sys.argv[1:])
+    sys.exit(exit_code)
@@ -0,0 +1,175 @@
+"""
+Compilation of configurations into command streams.
+
+A configuration is normalized (switch type and the semantic settings) and hashed. The compiled command stream is
+stored as a binary blob under that hash in an on-disk cache, so provisioning devices with a configuration compiled
+before needs no argument parsing and no register computation.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Callable, List, Optional
+
+from . import __version__
+from .cache import get_cache_file
+from .switch.all import get_switch_class
+from .switch.commands import CommandBuffer, CommandsLike
+
+# bump when the meaning of a configuration changes so that blobs compiled by older versions are not reused
+COMPILER_VERSION = 1
+
+
+def encode_commands(commands: CommandsLike) -> bytes:
+    """
+    :param commands: The commands.
+    :return: Binary blob with the commands (4 bytes each, as they are sent to the device).
+    :raise ValueError: If a command doesn't have 4 byte values.
+    """
+    if isinstance(commands, CommandBuffer):
+        return commands.tobytes()
+    return CommandBuffer(commands).tobytes()
+
+
+def decode_commands(blob: bytes) -> CommandBuffer:
+    """
+    :param blob: Binary blob created by encode_commands().
+    :return: The commands.
+    :raise ValueError: If the blob is not a whole number of commands.
+    """
+    return CommandBuffer(blob)
+
+
+def config_key(switch_type: str, config: Any) -> str:
+    """
+    Return the key of a configuration. Configurations with the same key compile to the same commands.
+    :param switch_type: Type of the switch (aliases like "nano" and "switchblox_nano" have the same key).
+    :param config: JSON-serializable semantic settings of the configuration.
+    :return: Hex digest identifying the configuration.
+    :raise ValueError: If the switch type is unknown.
+    """
+    normalized = {
+        'compiler': COMPILER_VERSION,
+        'version': __version__,
+        'switch': get_switch_class(switch_type).__name__,
+        'config': config,
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+class CommandCache:
+    """
+    Content-addressed on-disk store of compiled command blobs with LRU eviction.
+
+    Each blob is a file named by its configuration key. Reading a blob refreshes its modification time, and when the
+    store holds more than max_entries blobs, the least recently used ones are removed.
+    """
+
+    DIR_NAME = 'commands'
+    DEFAULT_MAX_ENTRIES = 4096
+    SUFFIX = '.bin'
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """
+        :param directory: Directory of the store. Defaults to "commands" in the cache directory.
+        :param max_entries: Maximum number of stored blobs.
+        """
+        self._directory = directory if directory is not None else get_cache_file(self.DIR_NAME)
+        self._max_entries = max(max_entries, 1)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        :param key: Key of the configuration.
+        :return: The stored blob, or None if there is none.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return blob
+
+    def put(self, key: str, blob: bytes) -> None:
+        """
+        Atomically store the blob and evict the least recently used blobs if the store is full. Failures (e.g. a
+        read-only cache directory) are not fatal.
+        :param key: Key of the configuration.
+        :param blob: The compiled commands.
+        """
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(blob)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._evict()
+        except OSError as e:
+            logging.debug('Cannot cache compiled commands in {}: {}'.format(self._directory, e))
+
+    def keys(self) -> List[str]:
+        """
+        :return: Keys of all stored blobs.
+        """
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return list()
+        return [name[:-len(self.SUFFIX)] for name in names if name.endswith(self.SUFFIX)]
+
+    def _evict(self) -> None:
+        keys = self.keys()
+        if len(keys) <= self._max_entries:
+            return
+        entries = list()
+        for key in keys:
+            try:
+                entries.append((os.stat(self._path(key)).st_mtime_ns, key))
+            except OSError:  # removed by another process
+                pass
+        for _, key in sorted(entries)[:len(entries) - self._max_entries]:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+def compile_config(switch_type: str,
+                   config: Any,
+                   build: Callable[[], CommandsLike],
+                   cache: Optional[CommandCache] = None) -> CommandBuffer:
+    """
+    Return the commands of a configuration, building them only if they are not cached.
+    :param switch_type: Type of the switch.
+    :param config: JSON-serializable semantic settings of the configuration (see config_key()).
+    :param build: Function computing the commands of the configuration (called only on a cache miss).
+    :param cache: The cache to use. If None, the commands are always built.
+    :return: The commands.
+    :raise ValueError: If the switch type is unknown, or whatever build() raises.
+    """
+    if cache is None:
+        return CommandBuffer(build())
+
+    key = config_key(switch_type, config)
+    blob = cache.get(key)
+    if blob is not None:
+        try:
+            commands = decode_commands(blob)
+            logging.debug('Using cached commands {}'.format(key))
+            return commands
+        except ValueError:  # a damaged blob is compiled again
+            pass
+
+    commands = CommandBuffer(build())
+    cache.put(key, commands.tobytes())
+    return commands
@@ -1,14 +1,33 @@
 """Package for containing data manager functions to convert user input to commands."""
 
-from botblox_config.data_manager.erase import EraseConfigCLI
-from botblox_config.data_manager.mirror import PortMirrorConfig
-from botblox_config.data_manager.tagvlan import TagVlanConfig, TagVlanConfigCLI
-from botblox_config.data_manager.vlan import VlanConfig
-
-__all__ = [
-    EraseConfigCLI,
-    PortMirrorConfig,
-    TagVlanConfig,
-    TagVlanConfigCLI,
-    VlanConfig,
-]
+import importlib
+import sys
+from typing import Any
+
+# Data managers are imported on first use so that the CLI loads only the one it runs.
+_MODULES = {
+    'EraseConfigCLI': 'erase',
+    'PortMirrorConfig': 'mirror',
+    'PortMirrorConfigCLI': 'mirror',
+    'ProfileConfigCLI': 'profiles',
+    'TagVlanConfig': 'tagvlan',
+    'TagVlanConfigCLI': 'tagvlan',
+    'ConfigTransaction': 'transaction',
+    'VlanConfig': 'vlan',
+    'VlanConfigCLI': 'vlan',
+}
+
+__all__ = list(_MODULES.keys())
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name: str) -> Any:
+        if name in _MODULES:
+            return getattr(importlib.import_module('.' + _MODULES[name], __name__), name)
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+else:  # module __getattr__ is not supported before Python 3.7
+    from botblox_config.data_manager.erase import EraseConfigCLI  # noqa: F401
+    from botblox_config.data_manager.mirror import PortMirrorConfig, PortMirrorConfigCLI  # noqa: F401
+    from botblox_config.data_manager.profiles import ProfileConfigCLI  # noqa: F401
+    from botblox_config.data_manager.tagvlan import TagVlanConfig, TagVlanConfigCLI  # noqa: F401
+    from botblox_config.data_manager.transaction import ConfigTransaction  # noqa: F401
+    from botblox_config.data_manager.vlan import VlanConfig, VlanConfigCLI  # noqa: F401
@@ -1,7 +1,8 @@
 import argparse
+import threading
 from argparse import Action, ArgumentParser, Namespace
 from enum import Enum
-from typing import Any, AnyStr, Callable, Dict, List, Sequence, Union
+from typing import Any, AnyStr, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 
 def _copy_items(items: Union[List, Dict]) -> Union[List, Dict]:
@@ -63,3 +64,88 @@ def add_multi_argument(parser: Union[Action, ArgumentParser],  # noqa: C901
         metavar=tuple(map(str.upper, names)),
         **kwargs
     )
+
+
+class LazySubParsersAction(argparse._SubParsersAction):
+    """
+    Subparsers action whose subcommand parsers are filled in only when the subcommand is selected.
+
+    Subcommands are registered by add_lazy_parser() with a builder. Until the subcommand is used, its parser is empty,
+    which is enough to list it in the help of the main parser. Right before the arguments of the subcommand are parsed,
+    the parser of the subcommand for the type of the switch (value of the "switch" attribute of the parsed namespace)
+    is looked up. If there is none yet, a new parser is created and the builder is called with this action and the
+    switch type. The builder adds the subcommand's arguments; calling add_parser() for its subcommand returns the new
+    parser. Builders can keep objects common to all subcommands (e.g. the switch chip they are built for) in the
+    shared dict.
+
+    Built parsers are kept for each switch type, and parsing does not modify them, so one parser can parse many command
+    lines, also from several threads at once.
+    """
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.shared: Dict[Any, Any] = dict()
+        self._builders: Dict[str, Callable[[Action, str], None]] = dict()
+        self._built: Dict[Tuple[str, str], ArgumentParser] = dict()
+        self._building: Optional[Tuple[str, ArgumentParser]] = None  # name and parser of the subcommand being built
+        self._lock = threading.RLock()
+
+    def add_lazy_parser(self, name: str, builder: Callable[[Action, str], None], **kwargs: Any) -> ArgumentParser:
+        """
+        Register a subcommand whose arguments are added by the builder when the subcommand is selected.
+        :param name: Name of the subcommand.
+        :param builder: Function that adds arguments of the subcommand. It gets this action and the switch type.
+        :param kwargs: Arguments of add_parser() (e.g. help).
+        :return: The (so far empty) parser of the subcommand.
+        """
+        parser = self.add_parser(name, **kwargs)
+        self._builders[name] = builder
+        return parser
+
+    def add_parser(self, name: str, **kwargs: Any) -> ArgumentParser:
+        if self._building is not None and self._building[0] == name:
+            return self._building[1]
+        return super().add_parser(name, **kwargs)
+
+    def build(self, name: str, switch_type: str) -> ArgumentParser:
+        """
+        Return the parser of the given subcommand built for the given switch type, building it if needed.
+        :param name: Name of the subcommand.
+        :param switch_type: Type of the switch.
+        :return: The parser of the subcommand.
+        """
+        if name not in self._builders:
+            return self._name_parser_map[name]
+        key = (name, switch_type)
+        parser = self._built.get(key)
+        if parser is not None:
+            return parser
+        with self._lock:
+            if key not in self._built:
+                self._building = (name, self._parser_class(prog=self._name_parser_map[name].prog))
+                try:
+                    self._builders[name](self, switch_type)
+                    self._built[key] = self._building[1]
+                finally:
+                    self._building = None
+            return self._built[key]
+
+    def __call__(self,
+                 parser: ArgumentParser,
+                 namespace: Namespace,
+                 values: List[AnyStr],
+                 option_string: AnyStr = None) -> None:
+        if len(values) == 0 or values[0] not in self._name_parser_map:
+            super().__call__(parser, namespace, values, option_string)
+            return
+
+        # same as argparse._SubParsersAction.__call__(), but with the parser built for the switch type
+        name, arg_strings = values[0], values[1:]
+        if self.dest is not argparse.SUPPRESS:
+            setattr(namespace, self.dest, name)
+        subparser = self.build(name, getattr(namespace, "switch", None) or "switchblox")
+        subnamespace, arg_strings = subparser.parse_known_args(arg_strings, None)
+        for key, value in vars(subnamespace).items():
+            setattr(namespace, key, value)
+        if arg_strings:
+            vars(namespace).setdefault(argparse._UNRECOGNIZED_ARGS_ATTR, [])
+            getattr(namespace, argparse._UNRECOGNIZED_ARGS_ATTR).extend(arg_strings)
@@ -1,8 +1,13 @@
 from argparse import Action, Namespace
-from typing import (List)
+from typing import Optional, TYPE_CHECKING
 
 from .switch_config import SwitchConfigCLI
 from ..switch import SwitchChip
+from ..switch.commands import CommandBuffer
+from ..switch.device_state import ERASE_COMMAND
+
+if TYPE_CHECKING:
+    from .transaction import ConfigTransaction
 
 
 class EraseConfigCLI(SwitchConfigCLI):
@@ -16,10 +21,16 @@ class EraseConfigCLI(SwitchConfigCLI):
             "erase",
             help="Erase all configuration",
         )
-        self._subparser.set_defaults(execute=self.apply)
+
+        def execute(args: Namespace, switch: Optional[SwitchChip] = None) -> SwitchConfigCLI:
+            return self._bind(switch).apply(args)
+        self._subparser.set_defaults(execute=execute)
 
     def apply(self, args: Namespace) -> SwitchConfigCLI:
         return self
 
-    def create_configuration(self) -> List[List[int]]:
-        return [[101, 0, 0, 0]]
+    def create_configuration(self) -> CommandBuffer:
+        return CommandBuffer([[ERASE_COMMAND, 0, 0, 0]])
+
+    def add_to(self, transaction: 'ConfigTransaction') -> None:
+        transaction.add_commands(self.create_configuration())
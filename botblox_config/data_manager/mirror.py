@@ -1,249 +1,205 @@
-from typing import (
-    Dict,
-    List,
-    Optional,
-    Tuple,
-    Union,
-)
-
-from typing_extensions import (
-    TypedDict
-)
-
-
-class PortMirrorConfig:
-    _default_miim_register_map = {
-        'enable': {
-            'name': 'PORT_MIRROR_EN',
-            'phy': 20,
-            'reg': 3,
-            'number_of_bits': 1,
-            'offset': 15,
-            'sys_default': 0,
-            'data': -1,
-            'choice_mapping': {
-                True: 1,
-                False: 0,
-            }
-        },
-        'mode': {
-            'name': 'PORT_MIRROR_MODE',
-            'phy': 20,
-            'reg': 3,
-            'number_of_bits': 2,
-            'offset': 13,
-            'sys_default': 0,
-            'data': -1,
-            'choice_mapping': {
-                'RX': 0b00,
-                'TX': 0b01,
-                'RXandTX': 0b10,
-                'RXorTX': 0b11,
-            },
-        },
-        'rx_port': {
-            'name': 'SEL_RX_PORT_MIRROR',
-            'phy': 20,
-            'reg': 3,
-            'number_of_bits': 8,
-            'offset': 0,
-            'sys_default': 0x01,
-            'data': -1,
-            'choice_mapping': {
-                1: 0b00000100,
-                2: 0b00001000,
-                3: 0b00010000,
-                4: 0b01000000,
-                5: 0b10000000,
-            },
-        },
-        'mirror_port': {
-            'name': 'SEL_MIRROR_PORT',
-            'phy': 20,
-            'reg': 4,
-            'number_of_bits': 3,
-            'offset': 13,
-            'sys_default': 0b111,
-            'data': -1,
-            'choice_mapping': {
-                1: 0b010,
-                2: 0b011,
-                3: 0b100,
-                4: 0b110,
-                5: 0b111,
-            },
-        },
-        'tx_port': {
-            'name': 'SEL_TX_PORT_MIRROR',
-            'phy': 20,
-            'reg': 4,
-            'number_of_bits': 8,
-            'offset': 0,
-            'sys_default': 0x01,
-            'data': -1,
-            'choice_mapping': {
-                1: 0b00000100,
-                2: 0b00001000,
-                3: 0b00010000,
-                4: 0b01000000,
-                5: 0b10000000,
-            },
-        }
-    }
-
-    class ConfigOptions(TypedDict):
-        mirror_port: int
-        mode: str
-        rx_port: Optional[List[int]]
-        tx_port: Optional[List[int]]
-        reset: bool
-        enable: bool
-
-    _default_config_options: ConfigOptions = {
-        'mirror_port': None,
-        'mode': None,
-        'rx_port': None,
-        'tx_port': None,
-        'reset': False,
-        'enable': False,
-    }
-
-    _default_commands: List[List[int]] = []
-
-    def __init__(
-        self,
-        args: Tuple,
-    ) -> None:
-        self.miim_register_map = dict(self._default_miim_register_map)
-        self.commands = list(self._default_commands)
-
-        cli_options: Dict = vars(args)
-
-        self.config_options = dict(self._default_config_options)
-        for cli_option in cli_options.keys():
-            if cli_option in self.config_options.keys():
-                self.config_options[cli_option] = cli_options[cli_option]
-
-        # Now we can add any extra config that wasn't present in the cli arguments
-        # This is for options in the datasheet that we always want to be set but don't offer as configuration on the cli
-        if not cli_options.get('reset'):
-            self.config_options['enable'] = True
-
-    def is_command_already_present(
-        self,
-        option_name: str,
-    ) -> Tuple[bool, int]:
-        if self.commands != []:
-            option_phy = self.miim_register_map[option_name]['phy']
-            option_reg = self.miim_register_map[option_name]['reg']
-
-            for index, command in enumerate(self.commands):
-                if option_phy == command[0] and option_reg == command[1]:
-                    return (True, index)
-        return (False, -1)
-
-    def update_existing_command(
-        self,
-        index_of_command_to_update: int,
-        option_name: str,
-        option: Optional[Union[int, str, List[int]]] = None,
-        use_default: bool = False,
-    ) -> None:
-        command_to_update: List[int] = self.commands[index_of_command_to_update]
-
-        option_data: int = 0
-        option_bits_offset: int = self.miim_register_map[option_name]['offset']
-
-        if not use_default:
-            option_choice_mapping = self.miim_register_map[option_name]['choice_mapping']
-
-            if isinstance(option, str) or isinstance(option, int):
-                option_data = option_choice_mapping[option]
-            elif isinstance(option, list):
-                for each_option in option:
-                    option_data = option_data | option_choice_mapping[each_option]
-        else:
-            assert use_default is True
-            option_data = self.miim_register_map[option_name]['sys_default']
-
-        command_to_update[2] = command_to_update[2] | ((option_data << option_bits_offset) & 0xFF)
-        command_to_update[3] = command_to_update[3] | (((option_data << option_bits_offset) & 0xFF00) >> 8)
-
-        self.commands[index_of_command_to_update] = command_to_update
-        return None
-
-    def create_new_command(
-        self,
-        option_name: str,
-        option: Optional[Union[int, str, List[int]]] = None,
-        use_default: bool = False,
-    ) -> None:
-        option_data: int = 0
-        option_bits_offset = self.miim_register_map[option_name]['offset']
-
-        if not use_default:
-            option_choice_mapping = self.miim_register_map[option_name]['choice_mapping']
-            option_data = 0
-
-            if isinstance(option, str) or isinstance(option, int):
-                option_data = option_choice_mapping[option]
-            elif isinstance(option, list):
-                for each_option in option:
-                    option_data = option_data | option_choice_mapping[each_option]
-        else:
-            assert use_default is True
-            option_data = self.miim_register_map[option_name]['sys_default']
-
-        command = [
-            self.miim_register_map[option_name]['phy'],
-            self.miim_register_map[option_name]['reg'],
-            (option_data << option_bits_offset) & 0xFF,
-            ((option_data << option_bits_offset) & 0xFF00) >> 8,
-        ]
-        self.commands.append(command)
-        return None
-
-    def add_command_for_option_default(
-        self,
-        option_name: str,
-    ) -> None:
-        is_command_exist: Tuple[bool, int] = self.is_command_already_present(option_name)
-        if is_command_exist[0]:
-            command_index: int = is_command_exist[1]
-            self.update_existing_command(command_index, option_name=option_name, option=None, use_default=True)
-        else:
-            assert is_command_exist[0] is False
-            self.create_new_command(option_name, None, use_default=True)
-
-        return None
-
-    def create_configuration(
-        self,
-    ) -> List[List[int]]:
-        if self.config_options['reset']:
-            for option_name in self.config_options.keys():
-                if option_name in self.miim_register_map.keys():
-                    self.add_command_for_option_default(option_name)
-            else:
-                return self.commands
-
-        assert not self.config_options['reset']
-
-        non_reset_config_options = self.config_options
-        non_reset_config_options.pop('reset')
-
-        for option_name, option in non_reset_config_options.items():
-            if option is None:
-                self.add_command_for_option_default(option_name)
+import argparse
+from argparse import Action, Namespace
+from enum import Enum
+from typing import cast, List, Optional
+
+from .switch_config import SwitchConfig, SwitchConfigCLI
+from ..switch import Port, SwitchChip, SwitchFeature
+from ..switch.commands import CommandBuffer
+from ..switch.fields import BitField, BitsField, PortListField
+
+
+class PortMirrorMode(Enum):
+    """
+    Which traffic of the source ports is mirrored.
+    """
+    RX = "RX"  # packets received on the RX ports
+    TX = "TX"  # packets transmitted on the TX ports
+    RX_AND_TX = "RXandTX"  # packets received on the RX ports and transmitted on the TX ports
+    RX_OR_TX = "RXorTX"  # packets received on the RX ports or transmitted on the TX ports
+
+    def __str__(self) -> str:
+        return self.value
+
+
+# value of PORT_MIRROR_MODE for each mode
+_MODE_VALUES = {
+    PortMirrorMode.RX: 0b00,
+    PortMirrorMode.TX: 0b01,
+    PortMirrorMode.RX_AND_TX: 0b10,
+    PortMirrorMode.RX_OR_TX: 0b11,
+}
+
+
+class PortMirrorConfig(SwitchConfig):
+    """
+    Port mirroring configuration. Traffic of the source ports is copied to the mirror port.
+    """
+    def __init__(self, switch: SwitchChip) -> None:
+        super().__init__(switch)
+        self._switch.check_feature(SwitchFeature.PORT_MIRROR)
+        self._mode = PortMirrorMode.RX
+        self._mirror_port: Optional[Port] = None
+        self._rx_ports: Optional[List[Port]] = None
+        self._tx_ports: Optional[List[Port]] = None
+        self._reset = False
+
+    def set_mode(self, mode: PortMirrorMode) -> None:
+        self._mode = mode
+
+    def set_mirror_port(self, port: Port) -> None:
+        """
+        :param port: The port that gets the copies of the traffic. Defaults to the last port.
+        """
+        self._mirror_port = port
+
+    def set_rx_ports(self, ports: List[Port]) -> None:
+        """
+        :param ports: Ports whose received traffic is mirrored.
+        """
+        self._rx_ports = list(ports)
+
+    def set_tx_ports(self, ports: List[Port]) -> None:
+        """
+        :param ports: Ports whose transmitted traffic is mirrored.
+        """
+        self._tx_ports = list(ports)
+
+    def reset(self) -> None:
+        """
+        Turn port mirroring off and set all its registers to default.
+        """
+        self._reset = True
+
+    def apply_to_switch(self) -> None:
+        fields = self._switch.fields
+        enable = cast(BitField, fields["PORT_MIRROR_EN"])
+        mode = cast(BitsField, fields["PORT_MIRROR_MODE"])
+        mirror_port = cast(BitsField, fields["SEL_MIRROR_PORT"])
+        rx_ports = cast(PortListField, fields["SEL_RX_PORT_MIRROR"])
+        tx_ports = cast(PortListField, fields["SEL_TX_PORT_MIRROR"])
+
+        if self._reset:
+            for field in (enable, mode, mirror_port, rx_ports, tx_ports):
+                field.set_default()
+            return
+
+        enable.set_value(True)
+        mode.set_value(_MODE_VALUES[self._mode])
+        mirror_port.set_value((self._mirror_port if self._mirror_port is not None else self._ports()[-1]).id)
+        for field, ports in ((rx_ports, self._rx_ports), (tx_ports, self._tx_ports)):
+            if ports is None:
+                field.set_default()
                 continue
-
-            is_command_exist = self.is_command_already_present(option_name)
-
-            if is_command_exist[0]:
-                command_index: int = is_command_exist[1]
-                self.update_existing_command(command_index, option_name=option_name, option=option)
-            else:
-                assert is_command_exist[0] is False
-                self.create_new_command(option_name, option)
+            field.clear()
+            for port in ports:
+                field.add_port(port)
+
+
+class PortMirrorConfigCLI(SwitchConfigCLI):
+    """
+    CLI parser for the mirror command.
+    """
+    def __init__(self, subparsers: Action, switch: SwitchChip) -> None:
+        super().__init__(subparsers, switch)
+
+        self._subparser = self._subparsers.add_parser(
+            'mirror',
+            help='Configure the ports to mirror traffic',
+        )
+        port_numbers = [int(name) for name in self._switch.port_names()]
+
+        portmirror_parser_mutex_grouping = self._subparser.add_mutually_exclusive_group()
+        portmirror_parser_config_group = portmirror_parser_mutex_grouping.add_argument_group()
+
+        portmirror_parser_config_group.add_argument(
+            '-m',
+            '--mode',
+            nargs='?',
+            default=argparse.SUPPRESS,
+            type=str,
+            choices=['RX', 'TX', 'RXorTX', 'RXandTX'],
+            required=False,
+            help='''Select the mirror mode during operation (default: RX)''',
+        )
+        portmirror_parser_config_group.add_argument(
+            '-M',
+            '--mirror-port',
+            nargs=1,
+            type=int,
+            choices=port_numbers,
+            required=False,
+            default=port_numbers[-1],
+            help='''Select the mirror port (default: port {})'''.format(port_numbers[-1]),
+        )
+        portmirror_parser_config_group.add_argument(
+            '-rx',
+            '--rx-port',
+            nargs='+',
+            type=int,
+            choices=port_numbers,
+            required=False,
+            default=argparse.SUPPRESS,
+            help='''Select the source (receive) port to be mirrored''',
+        )
+        portmirror_parser_config_group.add_argument(
+            '-tx',
+            '--tx-port',
+            nargs='+',
+            type=int,
+            choices=port_numbers,
+            required=False,
+            default=argparse.SUPPRESS,
+            help='''Select the destination (transmit) port to be mirrored''',
+        )
+        portmirror_parser_mutex_grouping.add_argument(
+            '-r',
+            '--reset',
+            action='store_true',
+            default=argparse.SUPPRESS,
+            help='Reset the Port mirroring configuration to default, this will turn port mirroring off'
+        )
+
+        def execute(args: Namespace, switch: Optional[SwitchChip] = None) -> PortMirrorConfigCLI:
+            self._check_ports(args)
+            try:
+                return self._bind(switch).apply(args)
+            except Exception as e:
+                self._subparser.error(str(e))
+        self._subparser.set_defaults(execute=execute)
+
+    def _check_ports(self, args: Namespace) -> None:
+        """
+        Check that the ports mirrored by an explicitly given mode are given too.
+        :param args: The parsed CLI args.
+        """
+        if 'mode' not in args:
+            return
+        missing = list()
+        if 'rx_port' not in args and args.mode != str(PortMirrorMode.TX):
+            missing.append('-rx/--rx-port')
+        if 'tx_port' not in args and args.mode != str(PortMirrorMode.RX):
+            missing.append('-tx/--tx-port')
+        if len(missing) > 0:
+            self._subparser.error('the following arguments are required: {}'.format(', '.join(missing)))
+
+    def _get_ports(self, numbers: List[int]) -> List[Port]:
+        return [self._switch.get_port(str(number)) for number in numbers]
+
+    def apply(self, args: Namespace) -> 'PortMirrorConfigCLI':
+        config = PortMirrorConfig(self._switch)
+        if getattr(args, 'reset', False):
+            config.reset()
         else:
-            return self.commands
+            config.set_mode(PortMirrorMode(getattr(args, 'mode', str(PortMirrorMode.RX))))
+            mirror_port = args.mirror_port[0] if isinstance(args.mirror_port, list) else args.mirror_port
+            config.set_mirror_port(self._switch.get_port(str(mirror_port)))
+            if 'rx_port' in args:
+                config.set_rx_ports(self._get_ports(args.rx_port))
+            if 'tx_port' in args:
+                config.set_tx_ports(self._get_ports(args.tx_port))
+        config.apply_to_switch()
+        return self
+
+    def create_configuration(self) -> CommandBuffer:
+        return self._switch.get_commands(leave_out_default=False, only_touched=True)
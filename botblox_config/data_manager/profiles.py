@@ -0,0 +1,349 @@
+"""
+Switch profiles: complete switch configurations stored in a YAML, JSON or TOML file.
+
+A profile describes the port-based VLANs, port mirroring and tagged VLANs of a switch at once:
+
+    switch: switchblox
+    vlan:
+      groups: [[1, 2], [3, 4]]
+    mirror:
+      mode: RXandTX
+      mirror_port: 5
+      rx_ports: [1]
+      tx_ports: [2]
+    tag_vlan:
+      vlan_mode: STRICT
+      default_vlan: 2
+      vlans:
+        2: [1, 2]
+        3: [3, 4]
+      ports:
+        1: {default_vlan: 3, header_action: STRIP}
+
+Every section is optional, and each section can be {reset: true} to set it back to the defaults. "erase: true" erases
+the configuration stored on the device first. The profile is loaded into the configuration objects directly, without
+the CLI parser. The resulting commands are stored in the command cache (see compiler) by the profile content and
+switch type, so applying an unchanged profile again needs neither parsing nor register computation.
+"""
+
+import hashlib
+import json
+import os
+from argparse import Action, Namespace
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence, Type, TypeVar
+
+from .mirror import PortMirrorConfig, PortMirrorMode
+from .switch_config import SwitchConfigCLI
+from .tagvlan import TagVlanConfig, VLANHeaderAction, VLANMode, VLANReceiveMode
+from .transaction import ConfigTransaction
+from .vlan import VlanConfig
+from ..compiler import CommandCache, compile_config
+from ..switch import create_switch, Port, SwitchChip
+from ..switch.commands import CommandBuffer
+
+# bump when the meaning of a profile changes so that commands compiled by older versions are not reused
+PROFILE_CACHE_VERSION = 1
+
+PROFILE_FORMATS = {
+    '.json': 'json',
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.toml': 'toml',
+}
+
+_PORT_OPTIONS = ('default_vlan', 'vlan_mode', 'force_vlan_id', 'receive_mode', 'header_action', 'vlan_header_actions')
+
+E = TypeVar('E', bound=Enum)
+
+
+def get_profile_format(path: str) -> str:
+    """
+    :param path: Path to the profile.
+    :return: Format of the profile ("json", "yaml" or "toml") based on its extension.
+    :raise ValueError: If the extension is not known.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in PROFILE_FORMATS:
+        raise ValueError('Unknown profile format "{}", use one of {}'.format(
+            extension, ', '.join(sorted(PROFILE_FORMATS.keys()))))
+    return PROFILE_FORMATS[extension]
+
+
+def parse_profile(data: bytes, profile_format: str) -> Dict[str, Any]:
+    """
+    Parse the contents of a profile file. YAML needs PyYAML and TOML needs tomli on Python < 3.11.
+    :param data: Contents of the file.
+    :param profile_format: "json", "yaml" or "toml".
+    :return: The parsed profile.
+    :raise ValueError: If the profile cannot be parsed or the parser for its format is not installed.
+    """
+    if profile_format == 'yaml':
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError('YAML profiles need PyYAML, install it with "pip install botblox[yaml]"')
+    elif profile_format == 'toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError('TOML profiles need tomli, install it with "pip install botblox[toml]"')
+    elif profile_format != 'json':
+        raise ValueError('Unknown profile format "{}"'.format(profile_format))
+
+    try:
+        if profile_format == 'json':
+            profile = json.loads(data.decode('utf-8'))
+        elif profile_format == 'yaml':
+            profile = yaml.safe_load(data)
+        else:
+            profile = tomllib.loads(data.decode('utf-8'))
+    except Exception as e:  # each parser has its own exception types
+        raise ValueError('Cannot parse {} profile: {}'.format(profile_format, e))
+    return profile if profile is not None else dict()
+
+
+def _check_mapping(section: Any, where: str) -> None:
+    """
+    :raise ValueError: If the section is not a mapping.
+    """
+    if not isinstance(section, dict):
+        raise ValueError('{} has to be a mapping, got {!r}'.format(where, section))
+
+
+def _check_keys(section: Any, allowed: Sequence[str], where: str) -> None:
+    """
+    :raise ValueError: If the section is not a mapping or has keys that are not allowed (e.g. typos).
+    """
+    _check_mapping(section, where)
+    unknown = [str(key) for key in section.keys() if key not in allowed]
+    if len(unknown) > 0:
+        raise ValueError('Unknown option(s) {} in {}, allowed are {}'.format(
+            ', '.join(sorted(unknown)), where, ', '.join(allowed)))
+
+
+def _get_ports(switch: SwitchChip, names: Any, where: str) -> List[Port]:
+    if not isinstance(names, list):
+        raise ValueError('{} has to be a list of ports, got {!r}'.format(where, names))
+    return [switch.get_port(str(name)) for name in names]
+
+
+def _get_enum(enum_type: Type[E], value: Any, where: str) -> E:
+    for item in enum_type:
+        if str(value).lower() == item.value.lower():
+            return item
+    raise ValueError('{} has to be one of {}, got {!r}'.format(where, ', '.join(e.value for e in enum_type), value))
+
+
+def _get_int(value: Any, where: str) -> int:
+    try:
+        if isinstance(value, bool):
+            raise ValueError()
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('{} has to be a number, got {!r}'.format(where, value))
+
+
+def _get_bool(value: Any, where: str) -> bool:
+    if not isinstance(value, bool):
+        raise ValueError('{} has to be true or false, got {!r}'.format(where, value))
+    return value
+
+
+def _build_vlan(switch: SwitchChip, section: Any) -> VlanConfig:
+    _check_keys(section, ('groups', 'reset'), 'vlan')
+    config = VlanConfig(switch)
+    if section.get('reset', False):
+        config.reset()
+    for group in section.get('groups', list()):
+        config.add_group(_get_ports(switch, group, 'vlan.groups'))
+    return config
+
+
+def _build_mirror(switch: SwitchChip, section: Any) -> PortMirrorConfig:
+    _check_keys(section, ('mode', 'mirror_port', 'rx_ports', 'tx_ports', 'reset'), 'mirror')
+    config = PortMirrorConfig(switch)
+    if section.get('reset', False):
+        config.reset()
+        return config
+    if 'mode' in section:
+        config.set_mode(_get_enum(PortMirrorMode, section['mode'], 'mirror.mode'))
+    if 'mirror_port' in section:
+        config.set_mirror_port(switch.get_port(str(section['mirror_port'])))
+    if 'rx_ports' in section:
+        config.set_rx_ports(_get_ports(switch, section['rx_ports'], 'mirror.rx_ports'))
+    if 'tx_ports' in section:
+        config.set_tx_ports(_get_ports(switch, section['tx_ports'], 'mirror.tx_ports'))
+    return config
+
+
+def _build_tag_vlan(switch: SwitchChip, section: Any) -> TagVlanConfig:  # noqa: C901
+    _check_keys(section, ('vlans', 'ports', 'reset') + _PORT_OPTIONS[:-1], 'tag_vlan')
+    config = TagVlanConfig(switch)
+    if section.get('reset', False):
+        config.reset()
+        return config
+
+    if 'vlan_mode' in section:
+        config.set_all_port_vlan_mode(_get_enum(VLANMode, section['vlan_mode'], 'tag_vlan.vlan_mode'))
+    if 'force_vlan_id' in section:
+        config.set_all_port_force_vlan_id(_get_bool(section['force_vlan_id'], 'tag_vlan.force_vlan_id'))
+    if 'receive_mode' in section:
+        config.set_all_port_receive_mode(
+            _get_enum(VLANReceiveMode, section['receive_mode'], 'tag_vlan.receive_mode'))
+    if 'header_action' in section:
+        config.set_all_port_header_action(
+            _get_enum(VLANHeaderAction, section['header_action'], 'tag_vlan.header_action'))
+
+    port_sections = section.get('ports', dict())
+    _check_mapping(port_sections, 'tag_vlan.ports')
+    port_sections = dict([(switch.get_port(str(name)), options) for name, options in port_sections.items()])
+    default_vlan = section.get('default_vlan')
+    for port in switch.ports():
+        options = port_sections.get(port, dict())
+        where = 'tag_vlan.ports.{}'.format(port.name)
+        _check_keys(options, _PORT_OPTIONS, where)
+        port_default_vlan = options.get('default_vlan', default_vlan)
+        per_vlan_header_action = dict()
+        for vlan, action in options.get('vlan_header_actions', dict()).items():
+            per_vlan_header_action[_get_int(vlan, where + '.vlan_header_actions')] = \
+                _get_enum(VLANHeaderAction, action, where + '.vlan_header_actions')
+        config.set_port_config(
+            port,
+            default_vlan_id=_get_int(port_default_vlan, where + '.default_vlan')
+            if port_default_vlan is not None else None,
+            mode=_get_enum(VLANMode, options['vlan_mode'], where + '.vlan_mode') if 'vlan_mode' in options else None,
+            force_vlan_id=_get_bool(options['force_vlan_id'], where + '.force_vlan_id')
+            if 'force_vlan_id' in options else None,
+            receive_mode=_get_enum(VLANReceiveMode, options['receive_mode'], where + '.receive_mode')
+            if 'receive_mode' in options else None,
+            header_action=_get_enum(VLANHeaderAction, options['header_action'], where + '.header_action')
+            if 'header_action' in options else None,
+            per_vlan_header_action=per_vlan_header_action,
+        )
+
+    vlans = section.get('vlans', dict())
+    _check_mapping(vlans, 'tag_vlan.vlans')
+    if len(vlans) > switch.max_vlans():
+        raise ValueError('Too many VLAN table entries specified. Maximum is {}'.format(switch.max_vlans()))
+    for vlan_id, members in vlans.items():
+        vlan = config.add_vlan(_get_int(vlan_id, 'tag_vlan.vlans'))
+        for port in _get_ports(switch, members, 'tag_vlan.vlans.{}'.format(vlan_id)):
+            config.add_vlan_member(vlan, port)
+    return config
+
+
+def build_profile(profile: Dict[str, Any], switch: SwitchChip) -> ConfigTransaction:
+    """
+    Load a parsed profile into configuration objects of the given switch.
+    :param profile: The parsed profile.
+    :param switch: The switch to configure.
+    :return: Transaction holding the configuration of the whole profile.
+    :raise ValueError: If the profile is invalid.
+    :raise RuntimeError: If the switch does not support a configured feature.
+    """
+    _check_keys(profile, ('switch', 'erase', 'vlan', 'mirror', 'tag_vlan'), 'profile')
+    transaction = ConfigTransaction(switch)
+    if _get_bool(profile.get('erase', False), 'erase'):
+        transaction.erase()
+    if 'vlan' in profile:
+        transaction.add(_build_vlan(switch, profile['vlan']))
+    if 'mirror' in profile:
+        transaction.add(_build_mirror(switch, profile['mirror']))
+    if 'tag_vlan' in profile:
+        transaction.add(_build_tag_vlan(switch, profile['tag_vlan']))
+    return transaction
+
+
+def _check_switch_type(profile: Dict[str, Any], switch: SwitchChip, switch_type: str) -> None:
+    """
+    :raise ValueError: If the profile is written for another switch than switch_type.
+    """
+    if 'switch' not in profile:
+        return
+    profile_switch = create_switch(str(profile['switch']))
+    if type(profile_switch) is not type(switch):
+        raise ValueError('The profile is written for {}, but the selected switch is {} (use --switch {})'.format(
+            profile_switch.name(), switch.name(), profile['switch']))
+
+
+def compile_profile(path: str, switch_type: str, use_cache: bool = True) -> CommandBuffer:
+    """
+    Create the commands (without the stop command) configuring the whole profile.
+
+    The commands are stored in the command cache keyed by a hash of the profile contents and the switch type, so
+    only the file is read and hashed when an unchanged profile is compiled again.
+
+    :param path: Path to the profile.
+    :param switch_type: Type of the configured switch.
+    :param use_cache: Whether to use (and update) the command cache.
+    :return: The commands.
+    :raise ValueError: If the profile is invalid or its switch type doesn't match switch_type.
+    :raise OSError: If the profile cannot be read.
+    """
+    profile_format = get_profile_format(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    def build() -> CommandBuffer:
+        switch = create_switch(switch_type)
+        try:
+            profile = parse_profile(data, profile_format)
+            _check_switch_type(profile, switch, switch_type)
+            return build_profile(profile, switch).get_commands()
+        except (ValueError, RuntimeError) as e:
+            raise ValueError('Invalid profile {}: {}'.format(path, e))
+
+    config = {
+        'profile': hashlib.sha256(data).hexdigest(),
+        'format': profile_format,
+        'profile_version': PROFILE_CACHE_VERSION,
+    }
+    return compile_config(switch_type, config, build, CommandCache() if use_cache else None)
+
+
+class ProfileConfigCLI(SwitchConfigCLI):
+    """
+    CLI parser for the apply command that configures the switch from a profile file.
+    """
+    def __init__(self, subparsers: Action, switch: SwitchChip, switch_type: str) -> None:
+        super().__init__(subparsers, switch)
+        self._switch_type = switch_type
+        self._commands = CommandBuffer()
+
+        self._subparser = self._subparsers.add_parser(
+            'apply',
+            help='Apply a complete switch configuration from a profile file',
+        )
+        self._subparser.add_argument(
+            '-p',
+            '--profile',
+            type=str,
+            required=True,
+            help='YAML, JSON or TOML file describing the VLAN, mirror and tag-vlan configuration of the switch',
+        )
+        self._subparser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Compile the profile even if its commands are cached',
+        )
+
+        def execute(args: Namespace, switch: Optional[SwitchChip] = None) -> ProfileConfigCLI:
+            try:
+                return self._bind(switch).apply(args)
+            except Exception as e:
+                self._subparser.error(str(e))
+        self._subparser.set_defaults(execute=execute)
+
+    def apply(self, args: Namespace) -> 'ProfileConfigCLI':
+        self._commands = compile_profile(args.profile, self._switch_type, use_cache=not args.no_cache)
+        return self
+
+    def create_configuration(self) -> CommandBuffer:
+        return self._commands.copy()
+
+    def add_to(self, transaction: ConfigTransaction) -> None:
+        transaction.add_commands(self.create_configuration())
@@ -1,7 +1,12 @@
+import copy
 from argparse import Action, Namespace
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
 
 from ..switch import Port, SwitchChip
+from ..switch.commands import CommandBuffer
+
+if TYPE_CHECKING:
+    from .transaction import ConfigTransaction
 
 
 class SwitchConfig:
@@ -40,6 +45,17 @@ class SwitchConfigCLI:
         self._subparsers = subparsers
         self._switch = switch
 
+    def _bind(self, switch: Optional[SwitchChip]) -> 'SwitchConfigCLI':
+        """
+        Return a copy of this CLI that configures the given switch. The parser (and the switch it was built for) are
+        left untouched, so that the parser can be reused for other command lines.
+        :param switch: The switch to configure. If None, a copy of the switch the parser was built for.
+        :return: The copy.
+        """
+        other = copy.copy(self)
+        other._switch = switch if switch is not None else self._switch.clone()
+        return other
+
     def apply(self, args: Namespace) -> 'SwitchConfigCLI':
         """
         Load the given CLI args.
@@ -48,10 +64,16 @@ class SwitchConfigCLI:
         """
         raise NotImplementedError()
 
-    # TODO (anyone): when all commands are converted to use the switch class, this method can be left out and
-    #                switch.get_commands() can be called directly from the CLI class.
-    def create_configuration(self) -> List[List[int]]:
+    def create_configuration(self) -> CommandBuffer:
         """
-        :return: A SwitchConfig parsed from the CLI args passed previously to apply().
+        :return: Commands of the configuration parsed from the CLI args passed previously to apply().
         """
         raise NotImplementedError()
+
+    def add_to(self, transaction: 'ConfigTransaction') -> None:
+        """
+        Add the configuration parsed from the CLI args passed previously to apply() to the transaction. By default,
+        apply() configured the switch of the transaction, so its changed registers are merged into the transaction.
+        :param transaction: The transaction whose switch was passed to execute().
+        """
+        transaction.add_switch_changes()
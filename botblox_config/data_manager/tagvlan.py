@@ -8,6 +8,7 @@ from typing import (cast, Dict, List, Optional, Union)
 from .argparse_utils import add_multi_argument
 from .switch_config import SwitchConfig, SwitchConfigCLI
 from ..switch import Port
+from ..switch.commands import CommandBuffer
 from ..switch.fields import BitField, BitsField, PortListField, ShortField
 from ..switch.ip175g import IP175G
 from ..switch.switch import SwitchChip, SwitchFeature
@@ -476,9 +477,9 @@ class TagVlanConfigCLI(SwitchConfigCLI):
             help='Reset the tagged VLAN configuration to default'
         )
 
-        def execute(args: Namespace) -> TagVlanConfigCLI:
+        def execute(args: Namespace, switch: Optional[SwitchChip] = None) -> TagVlanConfigCLI:
             try:
-                return self.apply(args)
+                return self._bind(switch).apply(args)
             except Exception as e:
                 self._subparser.error(str(e))
         self._subparser.set_defaults(execute=execute)
@@ -565,5 +566,5 @@ class TagVlanConfigCLI(SwitchConfigCLI):
 
         return self
 
-    def create_configuration(self) -> List[List[int]]:
+    def create_configuration(self) -> CommandBuffer:
         return self._switch.get_commands(leave_out_default=False, only_touched=True)
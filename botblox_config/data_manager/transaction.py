@@ -0,0 +1,108 @@
+from typing import Dict, List, Tuple
+
+from .switch_config import SwitchConfig
+from ..switch import SwitchChip
+from ..switch.commands import CommandBuffer, CommandsLike
+from ..switch.config_writer import ConfigWriter
+from ..switch.device_state import ERASE_COMMAND, STOP_COMMAND
+
+
+class ConfigTransaction:
+    """
+    Several configurations of one switch written to the device at once.
+
+    All configurations are applied to the same switch chip, so registers shared by several configurations are sent
+    only once, and the device saves the result to its EEPROM only once (there is a single stop command). Commands are
+    merged in the order they were added: a later configuration or command for a register replaces an earlier one.
+
+        switch = create_switch("switchblox")
+        transaction = ConfigTransaction(switch)
+        vlan = VlanConfig(switch)
+        vlan.add_group([switch.get_port("1"), switch.get_port("2")])
+        transaction.add(vlan)
+        mirror = PortMirrorConfig(switch)
+        mirror.set_rx_ports([switch.get_port("3")])
+        transaction.add(mirror)
+        with switch.get_config_writer("/dev/ttyACM0") as writer:
+            transaction.write(writer)
+    """
+    def __init__(self, switch: SwitchChip) -> None:
+        """
+        :param switch: The switch all configurations belong to.
+        """
+        self._switch = switch
+        self._erase = False
+        self._commands = CommandBuffer()
+        # register address -> last command of the switch merged into the commands
+        self._merged: Dict[Tuple[int, int], List[int]] = dict()
+
+    def add(self, config: SwitchConfig) -> 'ConfigTransaction':
+        """
+        Apply the configuration to the switch of this transaction.
+        :param config: The configuration.
+        :return: Self.
+        :raise ValueError: If the configuration belongs to another switch.
+        """
+        if config._switch is not self._switch:
+            raise ValueError("All configurations in a transaction have to configure the same switch")
+        config.apply_to_switch()
+        return self.add_switch_changes()
+
+    def add_switch_changes(self) -> 'ConfigTransaction':
+        """
+        Merge the registers of the switch that were touched (or got another value) since the last call into the
+        commands, so that they replace commands added before them but not commands added after them. Has to be called
+        after the switch was configured directly; add(), add_commands() and get_commands() call it.
+        :return: Self.
+        """
+        changed = [command for command in self._switch.get_commands(leave_out_default=False, only_touched=True)
+                   if self._merged.get((command[0], command[1])) != command]
+        if len(changed) > 0:
+            for command in changed:
+                self._merged[(command[0], command[1])] = command
+            self._commands.extend(changed)
+            self._commands.dedup()
+        return self
+
+    def add_commands(self, commands: CommandsLike) -> 'ConfigTransaction':
+        """
+        Add commands created outside of the switch of this transaction (e.g. by SwitchConfigCLI.create_configuration()).
+        A later command for a register replaces an earlier one.
+        :param commands: The commands (without the stop command).
+        :return: Self.
+        """
+        self.add_switch_changes()
+        commands = CommandBuffer(commands)
+        if commands.discard(ERASE_COMMAND):
+            self.erase()
+        commands.discard(STOP_COMMAND)
+        self._commands.extend(commands)
+        self._commands.dedup()
+        return self
+
+    def erase(self) -> 'ConfigTransaction':
+        """
+        Erase the configuration stored on the device before writing the new one.
+        :return: Self.
+        """
+        self._erase = True
+        return self
+
+    def get_commands(self) -> CommandBuffer:
+        """
+        :return: The merged commands of all configurations (without the stop command), each register at most once.
+        """
+        self.add_switch_changes()
+        commands = self._commands.copy()
+        commands.sort()
+        result = CommandBuffer([[ERASE_COMMAND, 0, 0, 0]] if self._erase else None)
+        result.extend(commands)
+        return result
+
+    def write(self, writer: ConfigWriter) -> bool:
+        """
+        Write all configurations to the device followed by a single stop command.
+        :param writer: Writer connected to the device.
+        :return: Whether the device confirmed the configuration.
+        """
+        return writer.write(self.get_commands() + [[STOP_COMMAND, 0, 0, 0]])
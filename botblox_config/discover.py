@@ -0,0 +1,218 @@
+"""Finding the BotBlox boards connected to the serial ports."""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from serial.tools import list_ports
+from serial.tools.list_ports_common import ListPortInfo
+
+from .cache import get_cache_file, load_json, save_json
+from .switch.config_writer import UARTWriter
+
+
+class DiscoveredPort:
+    """
+    A serial port that may have a BotBlox board connected, and the result of probing it.
+    """
+    def __init__(self, device: str, serial_number: Optional[str] = None, description: Optional[str] = None) -> None:
+        """
+        :param device: Path to the serial port.
+        :param serial_number: USB serial number of the converter, if it has one.
+        :param description: Description of the port given by the operating system.
+        """
+        self.device = device
+        self.serial_number = serial_number
+        self.description = description
+        self.probed = False
+        self.found = False
+        self.switch_type: Optional[str] = None
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> Dict:
+        """
+        :return: JSON-serializable representation of the result.
+        """
+        return {
+            'device': self.device,
+            'serial_number': self.serial_number,
+            'description': self.description,
+            'probed': self.probed,
+            'board': self.found,
+            'switch': self.switch_type,
+            'duration': round(self.duration, 3),
+            'error': self.error,
+        }
+
+    def __str__(self) -> str:
+        if self.found:
+            status = 'BotBlox board ({})'.format(self.switch_type or 'unknown switch')
+        elif self.error is not None:
+            status = 'cannot open ({})'.format(self.error)
+        elif not self.probed:
+            description = ' ({})'.format(self.description) if self.description else ''
+            status = 'USB serial port{}, not probed'.format(description)
+        else:
+            status = 'no board'
+        serial_number = ' [{}]'.format(self.serial_number) if self.serial_number else ''
+        return '{}{}: {}'.format(self.device, serial_number, status)
+
+
+class DiscoveryCache:
+    """
+    Boards found by the last discoveries, keyed by the USB serial number of their converter.
+
+    A converter keeps its serial number when it is plugged into another USB port, so a cached board can be recognized
+    even if its device path changed. The cache is persisted as a JSON file in the cache directory.
+    """
+
+    FILE_NAME = 'discovered_boards.json'
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        :param path: Path to the cache file. Defaults to discovered_boards.json in the cache directory.
+        """
+        self._path = path if path is not None else get_cache_file(self.FILE_NAME)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        data = load_json(self._path, dict())
+        return data if isinstance(data, dict) else dict()
+
+    def get(self, serial_number: str) -> Optional[Dict]:
+        """
+        :param serial_number: USB serial number of the converter.
+        :return: The last discovery of the converter ("device", "board", "switch" and "time"), or None if unknown.
+        """
+        with self._lock:
+            entry = self._load().get(serial_number)
+        return entry if isinstance(entry, dict) else None
+
+    def entries(self) -> Dict[str, Dict]:
+        """
+        :return: The last discovery of all known converters, keyed by their USB serial number.
+        """
+        with self._lock:
+            return {key: entry for key, entry in self._load().items() if isinstance(entry, dict)}
+
+    def record(self, ports: List[DiscoveredPort]) -> None:
+        """
+        Record the results of a discovery. Ports that were not probed, whose converter has no USB serial number, or
+        that could not be opened, are left out.
+        :param ports: The probed ports.
+        """
+        now = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        with self._lock:
+            data = self._load()
+            for port in ports:
+                if port.probed and port.serial_number and port.error is None:
+                    data[port.serial_number] = {'device': port.device, 'board': port.found,
+                                                'switch': port.switch_type, 'time': now}
+            try:
+                save_json(self._path, data)
+            except OSError as e:
+                logging.warning('Cannot store discovered boards in {}: {}'.format(self._path, e))
+
+
+def probe_port(port: DiscoveredPort) -> DiscoveredPort:
+    """
+    Check whether a BotBlox board answers on the given port. The hello command is sent to it, which firmware without
+    the framed protocol stores as a register write (see UARTWriter.probe()).
+    :param port: The port. Its result is filled in.
+    :return: The port.
+    """
+    start = time.monotonic()
+    port.probed = True
+    try:
+        port.switch_type = UARTWriter(port.device, timeout=UARTWriter.PROBE_TIMEOUT).probe()
+        port.found = True
+    except TimeoutError:
+        port.found = False
+    except (OSError, ValueError) as e:  # serial.SerialException is an OSError, ValueError is raised for invalid ports
+        port.error = str(e)
+    port.duration = time.monotonic() - start
+    return port
+
+
+def is_usb_port(port: ListPortInfo) -> bool:
+    """
+    :param port: A serial port known to the operating system.
+    :return: Whether the port belongs to a USB converter (BotBlox boards are connected through one).
+    """
+    return port.vid is not None or 'USB' in (port.description or '')
+
+
+def list_candidate_ports() -> List[DiscoveredPort]:
+    """
+    :return: The USB serial ports known to the operating system, sorted by their path. Built-in serial ports and
+        Bluetooth ports are left out.
+    """
+    return [DiscoveredPort(port.device, port.serial_number, port.description)
+            for port in sorted(list_ports.comports(), key=lambda p: p.device) if is_usb_port(port)]
+
+
+def discover(ports: Optional[List[DiscoveredPort]] = None, workers: Optional[int] = None,
+             cache: Optional[DiscoveryCache] = None) -> List[DiscoveredPort]:
+    """
+    Probe serial ports for BotBlox boards, all at the same time.
+
+    Each probe waits only shortly for the board to answer (see UARTWriter.probe()), so discovering any number of ports
+    takes a fraction of a second. Only boards whose firmware answers the probe are found. Boards with older firmware,
+    and other devices on the probed ports, receive the hello command too; older firmware stores it as a register
+    write.
+    :param ports: The ports to probe. All USB serial ports are probed if None.
+    :param workers: Maximum number of ports probed at the same time. All ports are probed at once if None.
+    :param cache: Where to record the results. The results are not recorded if None.
+    :return: The ports, with their results.
+    """
+    if ports is None:
+        ports = list_candidate_ports()
+    if len(ports) == 0:
+        return ports
+    with ThreadPoolExecutor(max_workers=workers or len(ports)) as executor:
+        ports = list(executor.map(probe_port, ports))
+    if cache is not None:
+        cache.record(ports)
+    return ports
+
+
+def run_discover(args: argparse.Namespace) -> int:
+    """
+    Run the "discover" CLI command.
+    :param args: The parsed CLI args.
+    :return: Exit code of the program (1 if no board was found).
+    """
+    cache = DiscoveryCache()
+    if args.cached:
+        entries = cache.entries()
+        if args.json:
+            sys.stdout.write(json.dumps(entries, indent=1, sort_keys=True) + '\n')
+        else:
+            for serial_number, entry in sorted(entries.items()):
+                if entry.get('board'):
+                    sys.stdout.write('{} [{}]: BotBlox board ({}), seen {}\n'.format(
+                        entry.get('device'), serial_number, entry.get('switch') or 'unknown switch', entry.get('time')))
+        return 0
+
+    start = time.monotonic()
+    if args.framed_firmware:
+        ports = discover(workers=args.jobs, cache=cache)
+    else:
+        ports = list_candidate_ports()  # nothing is sent to the ports
+    found = [port for port in ports if port.found]
+    if args.json:
+        sys.stdout.write(json.dumps([port.as_dict() for port in ports], indent=1) + '\n')
+    else:
+        for port in ports:
+            sys.stdout.write(str(port) + '\n')
+    if not args.framed_firmware:
+        logging.info('Found {} USB serial port(s), pass --framed-firmware to probe them for boards'.format(len(ports)))
+        return 0 if len(ports) > 0 else 1
+    logging.info('Found {} board(s) on {} port(s) in {:.2f} s'.format(len(found), len(ports), time.monotonic() - start))
+    return 0 if len(found) > 0 else 1
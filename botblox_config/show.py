@@ -0,0 +1,61 @@
+"""Reading the live configuration of a switch."""
+
+import argparse
+import logging
+import sys
+
+from .switch import create_switch, probe_switch, SwitchChip
+
+
+def format_switch(switch: SwitchChip, raw: bool = False, changed_only: bool = False) -> str:
+    """
+    Describe the configuration held by the registers of the switch.
+    :param switch: The switch.
+    :param raw: If True, list the register values instead of the configuration fields.
+    :param changed_only: If True, list only fields (registers) that differ from their default value.
+    :return: The description, one field (register) per line.
+    """
+    lines = list()
+    if raw:
+        for register in switch.get_registers().values():
+            if not changed_only or not register.is_default():
+                address = register.address
+                lines.append('{}:{} 0x{:04x}'.format(address.phy, address.mii, register.as_number()))
+    else:
+        # is_default() of a port list only tells whether any port is set, so compare with a fresh chip instead
+        defaults = type(switch).create().fields
+        for name, field in switch.fields.items():
+            if not changed_only or str(field) != str(defaults[name]):
+                lines.append(str(field))
+    return ''.join([line + '\n' for line in lines])
+
+
+def run_show(args: argparse.Namespace) -> int:
+    """
+    Run the "show" CLI command.
+    :param args: The parsed CLI args.
+    :return: Exit code of the program.
+    """
+    if args.device is None:
+        logging.error('the following arguments are required: -D/--device')
+        return 2
+    if not args.framed_firmware:
+        logging.error('Reading needs firmware that supports the framed protocol, older firmware stores each read '
+                      'command as a register write with the next configuration. Pass --framed-firmware if the board '
+                      'runs such firmware')
+        return 2
+
+    switch = create_switch(args.switch)
+    try:
+        # ask for the capabilities first, so no read command is sent to a board that does not answer it
+        with switch.get_config_writer(args.device) as writer:
+            probe_switch(writer, args.switch)
+        reader = switch.get_config_reader(args.device)
+        with reader:
+            reader.read_switch(switch)
+    except (ValueError, OSError) as e:
+        logging.error('Cannot read the configuration of {}: {}'.format(args.device, e))
+        return 1
+
+    sys.stdout.write(format_switch(switch, raw=args.raw, changed_only=args.changed))
+    return 0
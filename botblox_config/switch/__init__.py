@@ -1,4 +1,4 @@
-from .all import create_switch, get_switch_class
+from .all import create_switch, get_switch_class, probe_switch
 from .port import Port
 from .switch import SwitchChip, SwitchFeature
 
@@ -7,5 +7,6 @@ __all__ = [
     SwitchFeature,
     Port,
     create_switch,
-    get_switch_class
+    get_switch_class,
+    probe_switch,
 ]
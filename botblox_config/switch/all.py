@@ -1,5 +1,6 @@
 from typing import Type
 
+from .config_writer import ConfigWriter
 from .switch import SwitchChip
 from .switchblox import Switchblox
 from .switchblox_nano import SwitchbloxNano
@@ -21,8 +22,21 @@ def get_switch_class(switch_type: str) -> Type[SwitchChip]:
 
 def create_switch(switch_type: str) -> SwitchChip:
     """
-    Return an instance of a switch based on its name.
+    Return an instance of a switch based on its name. The instance is copied from a cached default instance.
     :param switch_type: Name of the switch.
     :return: The switch instance.
     """
-    return get_switch_class(switch_type)()
+    return get_switch_class(switch_type).create()
+
+
+def probe_switch(writer: ConfigWriter, switch_type: str) -> None:
+    """
+    Check quickly that a switch answers on the device of the writer, and that it is of the expected type.
+    :param writer: Writer to the device.
+    :param switch_type: Name of the expected switch.
+    :raise TimeoutError: If the device does not answer.
+    :raise ValueError: If the device reports a different type of switch.
+    """
+    reported = writer.probe()
+    if reported is not None and get_switch_class(reported) is not get_switch_class(switch_type):
+        raise ValueError("Device is a {}, not a {}".format(reported, switch_type))
@@ -0,0 +1,78 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from ..cache import get_cache_file, load_json, save_json
+
+
+class BaudRateRegistry:
+    """
+    Baud rate that worked for each device in its last session.
+
+    A session starting at the default baud rate can switch straight to the recorded rate, instead of probing faster
+    rates that the line to the device could not carry before. The time of each record is kept, so that faster rates
+    can be tried again once the record is old. The registry is persisted as a JSON file in the cache directory, keyed
+    like the device state (USB serial number or port path).
+    """
+
+    FILE_NAME = 'baud_rates.json'
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        :param path: Path to the registry file. Defaults to baud_rates.json in the cache directory.
+        """
+        self._path = path if path is not None else get_cache_file(self.FILE_NAME)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        data = load_json(self._path, dict())
+        return data if isinstance(data, dict) else dict()
+
+    def get(self, device_key: str, max_age: Optional[float] = None) -> Optional[int]:
+        """
+        :param device_key: Key identifying the device.
+        :param max_age: Ignore a rate recorded more than this many seconds ago. Rates of any age are returned if None.
+        :return: The recorded baud rate, or None if the device is not known.
+        """
+        with self._lock:
+            entry = self._load().get(device_key)
+        if not isinstance(entry, dict) or not isinstance(entry.get('baudrate'), int):
+            return None
+        if max_age is not None and time.time() - entry.get('time', 0) > max_age:
+            return None
+        return entry['baudrate']
+
+    def record(self, device_key: str, baudrate: int, keep_time: bool = False) -> None:
+        """
+        Record the baud rate that worked for a device.
+        :param device_key: Key identifying the device.
+        :param baudrate: The baud rate.
+        :param keep_time: Keep the time of an existing record, so that the record gets old like the one it replaces.
+        """
+        with self._lock:
+            data = self._load()
+            entry = data.get(device_key)
+            recorded_at = time.time()
+            if keep_time and isinstance(entry, dict) and isinstance(entry.get('time'), (int, float)):
+                recorded_at = entry['time']
+            if entry == {'baudrate': baudrate, 'time': recorded_at}:
+                return
+            data[device_key] = {'baudrate': baudrate, 'time': recorded_at}
+            try:
+                save_json(self._path, data)
+            except OSError as e:
+                logging.warning('Cannot store baud rate in {}: {}'.format(self._path, e))
+
+    def forget(self, device_key: str) -> None:
+        """
+        Drop the recorded baud rate of a device.
+        :param device_key: Key identifying the device.
+        """
+        with self._lock:
+            data = self._load()
+            if data.pop(device_key, None) is not None:
+                try:
+                    save_json(self._path, data)
+                except OSError as e:
+                    logging.warning('Cannot store baud rates in {}: {}'.format(self._path, e))
@@ -0,0 +1,260 @@
+"""
+Declarative descriptions of switch chips.
+
+A chip is described by a JSON file in the descriptions directory listing its registers, configuration fields (with
+their defaults), features and board variants (name, ports and their bits, registers the board doesn't have). The
+description is compiled into an immutable ChipLayout for each variant. Compiled layouts are cached on disk next to the
+description (in __pycache__, like .pyc files) and in memory, so the JSON is parsed and checked only when it changes.
+"""
+
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+DESCRIPTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'descriptions')
+
+# bump when the compiled classes change so that stale on-disk caches are ignored
+LAYOUT_FORMAT_VERSION = 2
+
+FIELD_TYPES = ('bit', 'bits', 'byte', 'short', 'ports')
+
+
+class FieldSpec:
+    """
+    Compiled description of one configuration field.
+    """
+    __slots__ = ('name', 'type', 'register', 'offset', 'length', 'default', 'raw_default')
+
+    def __init__(self, name: str, field_type: str, register: Tuple[int, ...], offset: int, length: int,
+                 default: Any, raw_default: Optional[int] = None) -> None:
+        """
+        :param name: Name of the field.
+        :param field_type: One of FIELD_TYPES.
+        :param register: Address of the register holding the field.
+        :param offset: Bit index (bit, bits) or byte index (byte, short, ports) of the field in the register.
+        :param length: Number of bits of the field.
+        :param default: Default value of the field (for ports, whether all ports are set by default).
+        :param raw_default: For ports, default value of the bits holding the port list, if it is not implied by default
+                            (e.g. when bits not belonging to any port are set by default).
+        """
+        self.name = name
+        self.type = field_type
+        self.register = register
+        self.offset = offset
+        self.length = length
+        self.default = default
+        self.raw_default = raw_default
+
+
+class PortSpec:
+    """
+    Compiled description of one port.
+    """
+    __slots__ = ('name', 'bit')
+
+    def __init__(self, name: str, bit: int) -> None:
+        """
+        :param name: Name of the port used in the CLI.
+        :param bit: Bit of the port in port list registers (the port ID).
+        """
+        self.name = name
+        self.bit = bit
+
+
+class ChipLayout:
+    """
+    Compiled, immutable layout of one board variant of a chip.
+    """
+    __slots__ = ('chip', 'variant', 'name', 'register_size', 'features', 'ports', 'registers', 'register_index',
+                 'fields', 'field_index')
+
+    def __init__(self, chip: str, variant: str, name: str, register_size: int, features: Tuple[str, ...],
+                 ports: Tuple[PortSpec, ...], registers: Tuple[Tuple[int, ...], ...],
+                 fields: Tuple[FieldSpec, ...]) -> None:
+        self.chip = chip
+        self.variant = variant
+        self.name = name
+        self.register_size = register_size
+        self.features = features
+        self.ports = ports
+        self.registers = registers
+        self.fields = fields
+        self.register_index: Dict[Tuple[int, ...], int] = dict([(a, i) for i, a in enumerate(registers)])
+        self.field_index: Dict[str, int] = dict([(f.name, i) for i, f in enumerate(fields)])
+
+    def get_field(self, name: str) -> FieldSpec:
+        """
+        :param name: Name of the field.
+        :return: Description of the field.
+        :raise KeyError: If the field doesn't exist.
+        """
+        return self.fields[self.field_index[name]]
+
+
+def _compile_field(entry: Dict[str, Any], register_size: int) -> FieldSpec:
+    """
+    Check and compile one entry of the "fields" list of a description.
+    :raise ValueError: If the entry is invalid.
+    """
+    name = entry.get('name')
+    field_type = entry.get('type')
+    if not isinstance(name, str) or field_type not in FIELD_TYPES or 'register' not in entry:
+        raise ValueError('Field needs a "name", a "register" and a "type" from {}, got {}'.format(FIELD_TYPES, entry))
+    bits = 8 * register_size
+
+    if field_type == 'bit':
+        offset, length = entry['index'], 1
+    elif field_type == 'bits':
+        offset, length = entry['offset'], entry['length']
+    elif field_type == 'byte' or field_type == 'ports':
+        offset, length = entry['index'], 8
+    else:
+        offset, length = entry['offset'], 16
+
+    first_bit = offset if field_type in ('bit', 'bits') else 8 * offset
+    if length <= 0 or first_bit < 0 or first_bit + length > bits:
+        raise ValueError('Field {} does not fit into a {}-byte register'.format(name, register_size))
+
+    default = entry.get('default', False if field_type in ('bit', 'ports') else 0)
+    if field_type not in ('bit', 'ports') and not 0 <= default < (1 << length):
+        raise ValueError('Default value {} of field {} does not fit into {} bits'.format(default, name, length))
+    raw_default = entry.get('raw_default')
+    if raw_default is not None and (field_type != 'ports' or not 0 <= raw_default < (1 << length)):
+        raise ValueError('Field {} cannot have raw default {}'.format(name, raw_default))
+    return FieldSpec(name, field_type, tuple(entry['register']), offset, length, default, raw_default)
+
+
+def compile_description(description: Dict[str, Any]) -> Dict[str, ChipLayout]:
+    """
+    Check the given chip description and compile layouts of all its variants.
+    :param description: The parsed description.
+    :return: Layouts of the variants, indexed by variant name.
+    :raise ValueError: If the description is invalid.
+    """
+    try:
+        chip = description['chip']
+        register_size = description['register_size']
+        registers = tuple(tuple(r) for r in description['registers'])
+        fields = tuple(_compile_field(entry, register_size) for entry in description['fields'])
+        variants = description['variants']
+    except (KeyError, TypeError) as e:
+        raise ValueError('Invalid chip description: missing or wrong {}'.format(e))
+
+    if len(set(registers)) != len(registers):
+        raise ValueError('Chip description of {} lists a register twice'.format(chip))
+    names = [f.name for f in fields]
+    if len(set(names)) != len(names):
+        raise ValueError('Chip description of {} lists a field name twice'.format(chip))
+    for field in fields:
+        if field.register not in registers:
+            raise ValueError('Field {} uses unknown register {}'.format(field.name, list(field.register)))
+
+    layouts = dict()
+    for variant, variant_description in variants.items():
+        without = set(tuple(r) for r in variant_description.get('without_registers', list()))
+        ports = tuple(PortSpec(str(p['name']), p['bit']) for p in variant_description['ports'])
+        if any(not 0 <= p.bit < 8 for p in ports):
+            raise ValueError('Port bits of variant {} have to be in range 0-7'.format(variant))
+        layouts[variant] = ChipLayout(
+            chip=chip,
+            variant=variant,
+            name=variant_description.get('name', variant),
+            register_size=register_size,
+            features=tuple(description.get('features', list())),
+            ports=ports,
+            registers=tuple(r for r in registers if r not in without),
+            fields=tuple(f for f in fields if f.register not in without),
+        )
+    return layouts
+
+
+def _compiled_path(source_path: str) -> str:
+    """
+    :return: Path of the compiled cache of the given description file.
+    """
+    directory, file_name = os.path.split(source_path)
+    tag = sys.implementation.cache_tag or 'python'
+    return os.path.join(directory, '__pycache__', '{}.{}.pickle'.format(os.path.splitext(file_name)[0], tag))
+
+
+def _read_compiled(path: str, source_stat: os.stat_result) -> Optional[Dict[str, ChipLayout]]:
+    """
+    :return: The layouts cached in the given file, or None if the cache is missing or stale.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header, layouts = pickle.load(f)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+        return None
+    if header != (LAYOUT_FORMAT_VERSION, source_stat.st_mtime_ns, source_stat.st_size):
+        return None
+    return layouts
+
+
+def _write_compiled(path: str, source_stat: os.stat_result, layouts: Dict[str, ChipLayout]) -> None:
+    """
+    Store the compiled layouts. Failures (e.g. a read-only installation) are not fatal.
+    """
+    header = (LAYOUT_FORMAT_VERSION, source_stat.st_mtime_ns, source_stat.st_size)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((header, layouts), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logging.debug('Cannot cache compiled chip description in {}: {}'.format(path, e))
+
+
+_layouts: Dict[str, Dict[str, ChipLayout]] = dict()
+_layouts_lock = threading.Lock()
+
+
+def load_description_file(source_path: str) -> Dict[str, ChipLayout]:
+    """
+    Load compiled layouts of all variants described in the given file, compiling it only if needed.
+    :param source_path: Path to the JSON description.
+    :return: Layouts of the variants, indexed by variant name.
+    :raise ValueError: If the description is invalid.
+    :raise OSError: If the description cannot be read.
+    """
+    with _layouts_lock:
+        layouts = _layouts.get(source_path)
+        if layouts is not None:
+            return layouts
+
+        source_stat = os.stat(source_path)
+        compiled_path = _compiled_path(source_path)
+        layouts = _read_compiled(compiled_path, source_stat)
+        if layouts is None:
+            with open(source_path, 'rt') as f:
+                layouts = compile_description(json.load(f))
+            _write_compiled(compiled_path, source_stat, layouts)
+        _layouts[source_path] = layouts
+        return layouts
+
+
+def load_layout(chip: str, variant: str) -> ChipLayout:
+    """
+    Return the layout of a board variant of a chip described in the descriptions directory.
+    :param chip: Name of the description file without extension (e.g. "ip175g").
+    :param variant: Name of the variant (e.g. "nano").
+    :return: The layout.
+    :raise ValueError: If the chip or variant is unknown or its description is invalid.
+    """
+    path = os.path.join(DESCRIPTIONS_DIR, chip + '.json')
+    if not os.path.exists(path):
+        raise ValueError("Unknown chip description '{}'".format(chip))
+    layouts = load_description_file(path)
+    if variant not in layouts:
+        raise ValueError("Chip {} has no variant '{}'".format(chip, variant))
+    return layouts[variant]
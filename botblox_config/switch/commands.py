@@ -0,0 +1,170 @@
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Union
+
+# number of bytes of one command ([phy, mii, low byte, high byte])
+COMMAND_SIZE = 4
+
+CommandsLike = Union['CommandBuffer', bytes, bytearray, memoryview, Iterable[Sequence[int]]]
+
+
+class CommandBuffer:
+    """
+    A stream of firmware "commands" ([phy, mii, low byte, high byte]) stored in a single bytearray.
+
+    The buffer holds the commands exactly as they are sent to the device, so it can be written to a serial port without
+    conversion (see view()). Indexing and iterating return the commands as lists of ints, and the buffer compares equal
+    to a list of such lists, so it can be used where a List[List[int]] of commands was used before.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, commands: Optional[CommandsLike] = None) -> None:
+        """
+        :param commands: Initial commands: another buffer, the raw bytes of commands, or a sequence of commands.
+        :raise ValueError: If the commands are not valid (see extend()).
+        """
+        self._data = bytearray()
+        if commands is not None:
+            self.extend(commands)
+
+    def append(self, command: Sequence[int]) -> None:
+        """
+        :param command: The command to add at the end.
+        :raise ValueError: If the command doesn't have 4 byte values.
+        """
+        if len(command) != COMMAND_SIZE:
+            raise ValueError('Each command has to have {} bytes, got {}'.format(COMMAND_SIZE, list(command)))
+        self._data.extend(command)
+
+    def add(self, phy: int, mii: int, value: Union[bytes, bytearray, memoryview]) -> None:
+        """
+        Add a command writing a register.
+        :param phy: PHY address of the register.
+        :param mii: MII address of the register.
+        :param value: The 2 data bytes of the register (lowest byte first).
+        :raise ValueError: If the value doesn't have 2 bytes.
+        """
+        if len(value) != COMMAND_SIZE - 2:
+            raise ValueError('A register command needs {} data bytes, got {}'.format(COMMAND_SIZE - 2, len(value)))
+        self._data.append(phy)
+        self._data.append(mii)
+        self._data += value
+
+    def extend(self, commands: CommandsLike) -> None:
+        """
+        :param commands: Commands to add at the end: another buffer, the raw bytes of commands, or a sequence of
+                         commands.
+        :raise ValueError: If the raw bytes are not a whole number of commands or a command doesn't have 4 byte values.
+        """
+        if isinstance(commands, CommandBuffer):
+            self._data += commands._data
+        elif isinstance(commands, (bytes, bytearray, memoryview)):
+            if len(commands) % COMMAND_SIZE != 0:
+                raise ValueError('Commands have {} bytes, which is not a multiple of {}'.format(
+                    len(commands), COMMAND_SIZE))
+            self._data += commands
+        else:
+            for command in commands:
+                self.append(command)
+
+    def sort(self) -> None:
+        """
+        Sort the commands by register address (PHY, then MII). Commands for the same register keep their order.
+        """
+        data = bytes(self._data)
+        records = [data[i:i + COMMAND_SIZE] for i in range(0, len(data), COMMAND_SIZE)]
+        records.sort(key=lambda r: (r[0], r[1]))
+        self._data = bytearray(b''.join(records))
+
+    def dedup(self) -> None:
+        """
+        Keep only the last command for each register address, at the position of the first one.
+        """
+        data = bytes(self._data)
+        latest = dict()
+        for i in range(0, len(data), COMMAND_SIZE):
+            latest[data[i:i + 2]] = data[i:i + COMMAND_SIZE]
+        self._data = bytearray(b''.join(latest.values()))
+
+    def discard(self, phy: int) -> bool:
+        """
+        Remove all commands with the given first byte (e.g. all stop commands).
+        :param phy: The first byte (PHY address or special command code).
+        :return: Whether any command was removed.
+        """
+        data = bytes(self._data)
+        kept = [data[i:i + COMMAND_SIZE] for i in range(0, len(data), COMMAND_SIZE) if data[i] != phy]
+        if len(kept) == len(self):
+            return False
+        self._data = bytearray(b''.join(kept))
+        return True
+
+    def view(self) -> memoryview:
+        """
+        :return: View of the raw bytes of all commands (no copy). The buffer cannot grow while the view is alive.
+        """
+        return memoryview(self._data)
+
+    def tobytes(self) -> bytes:
+        """
+        :return: Copy of the raw bytes of all commands.
+        """
+        return bytes(self._data)
+
+    def tolist(self) -> List[List[int]]:
+        """
+        :return: The commands as a list of lists of ints (e.g. for logging).
+        """
+        return list(self)
+
+    def copy(self) -> 'CommandBuffer':
+        """
+        :return: A new buffer with the same commands.
+        """
+        return CommandBuffer(self)
+
+    def __len__(self) -> int:
+        return len(self._data) // COMMAND_SIZE
+
+    def __iter__(self) -> Iterator[List[int]]:
+        data = self._data
+        for i in range(0, len(data), COMMAND_SIZE):
+            yield list(data[i:i + COMMAND_SIZE])
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[List[int], 'CommandBuffer']:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return CommandBuffer(self._data[start * COMMAND_SIZE:max(start, stop) * COMMAND_SIZE])
+            return CommandBuffer([self[i] for i in range(start, stop, step)])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('command index out of range')
+        return list(self._data[index * COMMAND_SIZE:(index + 1) * COMMAND_SIZE])
+
+    def __add__(self, other: CommandsLike) -> 'CommandBuffer':
+        result = self.copy()
+        result.extend(other)
+        return result
+
+    def __radd__(self, other: CommandsLike) -> 'CommandBuffer':
+        result = CommandBuffer(other)
+        result.extend(self)
+        return result
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, CommandBuffer):
+            return self._data == other._data
+        if isinstance(other, (bytes, bytearray, memoryview)):
+            return self._data == other
+        try:
+            return self._data == CommandBuffer(other)._data
+        except (TypeError, ValueError):
+            return NotImplemented
+
+    __hash__ = None  # mutable
+
+    def __repr__(self) -> str:
+        return 'CommandBuffer({})'.format(self.tolist())
+
+    def __str__(self) -> str:
+        return str(self.tolist())
@@ -0,0 +1,156 @@
+from types import TracebackType
+from typing import Any, List, Optional, Sequence, Type, TYPE_CHECKING
+
+import serial
+
+from .config_writer import UARTSettings
+from .register import MIIRegister
+
+if TYPE_CHECKING:
+    from .switch import SwitchChip
+
+# [READ_COMMAND, phy, mii, 0] asks the board for the value of a register, which it sends back (lowest byte first)
+READ_COMMAND = 102
+
+
+class ConfigReader:
+    """
+    Reader of the live register values of a switch.
+
+    A reader can be used as a context manager. Inside the `with` block, the underlying communication channel is kept
+    open, so that multiple reads share a single session:
+
+        switch = create_switch("switchblox")
+        with switch.get_config_reader(device_name) as reader:
+            reader.read_switch(switch)
+        print(switch.fields["VLAN_CLS"])
+    """
+
+    def __init__(self, device_name: str) -> None:
+        pass
+
+    def __enter__(self) -> 'ConfigReader':
+        self.connect()
+        return self
+
+    def __exit__(self,
+                 exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.disconnect()
+
+    @classmethod
+    def device_description(cls: 'ConfigReader') -> str:
+        raise NotImplementedError()
+
+    def connect(self) -> None:
+        """
+        Open a session with the device. Reads issued until disconnect() is called share this session.
+        """
+        pass
+
+    def disconnect(self) -> None:
+        """
+        Close the session opened by connect(). Does nothing if no session is open.
+        """
+        pass
+
+    def read_registers(self, registers: Sequence[MIIRegister]) -> List[bytes]:
+        """
+        Read the values of the given registers from the device.
+        :param registers: The registers to read (they are not modified).
+        :return: Data bytes of each register (lowest byte first).
+        :raise TimeoutError: If the device does not answer.
+        """
+        raise NotImplementedError()
+
+    def read_switch(self, switch: 'SwitchChip') -> 'SwitchChip':
+        """
+        Overwrite all registers of the switch with the values read from the device. The fields of the switch then
+        decode the live configuration. The registers are not marked as touched.
+        :param switch: The switch chip connected to the device.
+        :return: The switch.
+        :raise TimeoutError: If the device does not answer.
+        """
+        registers = list(switch.get_registers().values())
+        for register, value in zip(registers, self.read_registers(registers)):
+            register.data[:] = value
+            register.mark_changed()
+        return switch
+
+
+class TestReader(ConfigReader):
+    """
+    Reader of the "test" device, which always holds the values the registers already have.
+    """
+    @classmethod
+    def device_description(cls: 'TestReader') -> str:
+        return "Test"
+
+    def read_registers(self, registers: Sequence[MIIRegister]) -> List[bytes]:
+        return [bytes(register.data) for register in registers]
+
+
+class UARTReader(ConfigReader):
+    """
+    Reader asking the STM32 MCU on the switch for register values via a USB-to-UART converter.
+
+    Registers are read one by one: the reader sends a read command and waits for the register value before sending the
+    next one, so the MCU is never flooded.
+    """
+
+    DEFAULT_REPLY_TIMEOUT = 1.0
+
+    def __init__(self, device_name: str, reply_timeout: float = DEFAULT_REPLY_TIMEOUT, **kwargs: Any) -> None:
+        """
+        :param device_name: The serial port the UART converter is connected to.
+        :param reply_timeout: How long to wait for the value of one register (in seconds).
+        :param kwargs: Further settings of the serial line, see UARTSettings.
+        """
+        super().__init__(device_name)
+        self.settings = UARTSettings(device_name, **kwargs)
+        self.reply_timeout = reply_timeout
+        self._serial: Optional[serial.Serial] = None
+
+    @classmethod
+    def device_description(cls: 'UARTReader') -> str:
+        return "USB-to-UART converter"
+
+    def is_connected(self) -> bool:
+        """
+        :return: Whether a serial session is open.
+        """
+        return self._serial is not None
+
+    def connect(self) -> None:
+        if self._serial is None:
+            self._serial = self.settings.open_serial(self.reply_timeout)
+
+    def disconnect(self) -> None:
+        if self._serial is None:
+            return
+        self._serial.close()
+        self._serial = None
+
+    def read_registers(self, registers: Sequence[MIIRegister]) -> List[bytes]:
+        """
+        Read the registers. If no session is open, a session is opened just for this read.
+        """
+        opened_here = not self.is_connected()
+        self.connect()
+        try:
+            ser = self._serial
+            ser.reset_input_buffer()  # drop anything left over from previous commands in this session
+            values = list()
+            for register in registers:
+                phy, mii = register.address.phy, register.address.mii
+                ser.write(bytes([READ_COMMAND, phy, mii, 0]))
+                value = ser.read(size=register.num_data_bytes)
+                if len(value) != register.num_data_bytes:
+                    raise TimeoutError('No value of register {}:{} received from board (does its firmware support '
+                                       'reading?)'.format(phy, mii))
+                values.append(value)
+            return values
+        finally:
+            if opened_here:
+                self.disconnect()
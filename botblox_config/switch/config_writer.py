@@ -1,14 +1,32 @@
 import logging
+import os
 import time
-from typing import Any, Generic, List, TypeVar
+from types import TracebackType
+from typing import Any, Dict, Generic, List, Optional, Type, TypeVar
 
 import serial
+from serial.tools import list_ports
+
+from .baud_registry import BaudRateRegistry
+from .commands import COMMAND_SIZE, CommandBuffer, CommandsLike
+from .device_state import ERASE_COMMAND, STOP_COMMAND
+from .protocol import BAUD_CONFIRM_TIMEOUT, Capabilities, CRC_SIZE, decode_frame, encode_baudrate, encode_write, \
+    Frame, FRAME_MAGIC, frame_size, FrameType, HEADER_SIZE, hello_command, PROTOCOL_VERSION, Status, write_frames
 
 
 CommandType = TypeVar('CommandType')
 
 
 class ConfigWriter(Generic[CommandType]):
+    """
+    Writer of configuration commands to a switch.
+
+    A writer can be used as a context manager. Inside the `with` block, the underlying communication channel is kept
+    open, so that multiple calls to write() share a single session:
+
+        with switch.get_config_writer(device_name) as writer:
+            writer.write(commands)
+    """
 
     def __init__(self, device_name: str) -> None:
         pass
@@ -16,10 +34,46 @@ class ConfigWriter(Generic[CommandType]):
     def __name__(self) -> str:
         return self.device_description()
 
+    def __enter__(self) -> 'ConfigWriter[CommandType]':
+        self.connect()
+        return self
+
+    def __exit__(self,
+                 exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.disconnect()
+
     @classmethod
     def device_description(cls: 'ConfigWriter') -> str:
         raise NotImplementedError()
 
+    def connect(self) -> None:
+        """
+        Open a session with the device. Writes issued until disconnect() is called share this session.
+        """
+        pass
+
+    def disconnect(self) -> None:
+        """
+        Close the session opened by connect(). Does nothing if no session is open.
+        """
+        pass
+
+    def device_key(self) -> Optional[str]:
+        """
+        :return: A key identifying the device across sessions, or None if the device cannot be identified.
+        """
+        return None
+
+    def probe(self) -> Optional[str]:
+        """
+        Check quickly that the device answers, before any configuration is streamed to it.
+        :return: Switch type reported by the device, or None if it does not report one.
+        :raise TimeoutError: If the device does not answer.
+        """
+        return None
+
     def write(self, data: CommandType) -> bool:
         raise NotImplementedError()
 
@@ -33,55 +87,744 @@ class TestWriter(ConfigWriter[Any]):
         return True
 
 
-class UARTWriter(ConfigWriter[List[Any]]):
+def find_device_key(device_name: str) -> str:
+    """
+    Return a key identifying the given serial device across sessions.
+    :param device_name: Path to the serial device.
+    :return: USB serial number of the converter if it has one, otherwise the device path.
+    """
+    device_path = os.path.realpath(device_name)
+    for port in list_ports.comports():
+        if os.path.realpath(port.device) == device_path and port.serial_number:
+            return "usb:" + port.serial_number
+    return device_name
 
-    def __init__(self, device_name: str) -> None:
-        super().__init__(device_name)
+
+def check_condition(condition: bytes) -> bool:
+    """
+    Interpret the condition byte sent by the board after the stop command.
+    :param condition: The received condition reply.
+    :return: Whether the configuration was successfully stored.
+    """
+    try:
+        condition = list(condition)[0]
+    except IndexError:
+        logging.error('Failed to read condition message from board')
+        return False
+    else:
+        if condition == 1:
+            logging.info('Success setting configuration in EEPROM')
+            return True
+        elif condition == 2:
+            logging.error('Failed saving configuration in EEPROM')
+            return False
+        elif condition == Status.CRC_ERROR:
+            logging.error('Board kept receiving corrupted frames')
+            return False
+        elif condition == Status.BAD_FRAME:
+            logging.error('Board rejected the frame')
+            return False
+        logging.error('Unknown condition message {} from board'.format(condition))
+        return False
+
+
+class UARTSettings:
+    """
+    Settings of the serial line to the STM32 MCU on the switch, and the pacing of commands sent over it.
+
+    Commands are streamed back-to-back. With hardware flow control (rtscts), pacing is left to the UART. Otherwise,
+    a pause is kept between commands to give the MCU time to process them, DEFAULT_COMMAND_GAP unless another pause
+    is requested. With adaptive_gap, the pause starts at FAST_COMMAND_GAP and grows up to MAX_COMMAND_GAP whenever the
+    board does not confirm a push, for the following pushes. Only use it with boards known to keep up: a board that
+    misses commands but still receives the stop command confirms the partial configuration. A push that is not
+    confirmed is never repeated automatically, the board may have stored it anyway.
+
+    Boards whose firmware supports the framed protocol (see the protocol module) receive all commands of a push in
+    frames instead, which need no pacing. Each frame is acknowledged, and as many frames as the board's window allows
+    are sent before waiting for the acknowledgements; only frames that are not acknowledged are sent again. The
+    protocol setting selects the format: 'legacy' (the default) and 'framed' force a format, 'auto' asks the board for
+    its capabilities and falls back to the legacy format if it does not answer. Only use 'auto' with boards known to
+    run framed firmware: legacy firmware takes the hello command for a register write and stores it in its EEPROM
+    with the configuration.
+
+    The session starts at the given baud rate. If the board supports frames and faster rates, the writer switches the
+    line to the fastest rate that works (see UARTWriter.negotiate()).
+    """
+
+    DEFAULT_BAUDRATE = 115200
+    DEFAULT_COMMAND_GAP = 0.1  # the pause used by the original implementation, known to work with all boards
+    FAST_COMMAND_GAP = 0.01  # first pause of the adaptive pacing
+    MAX_COMMAND_GAP = DEFAULT_COMMAND_GAP
+    COMMAND_GAP_BACKOFF = 4
+    PROTOCOLS = ('auto', 'legacy', 'framed')
+    HELLO_TIMEOUT = 0.1  # how long to wait for the capabilities of the board
+    ACK_TIMEOUT = 0.05  # how long the board may take to acknowledge a frame once it is transmitted
+
+    def __init__(self,
+                 device_name: str,
+                 baudrate: int = DEFAULT_BAUDRATE,
+                 timeout: float = 20,
+                 rtscts: bool = False,
+                 command_gap: Optional[float] = None,
+                 protocol: str = 'legacy',
+                 negotiate_baudrate: bool = True,
+                 adaptive_gap: bool = False) -> None:
+        """
+        :param device_name: The serial port the UART converter is connected to.
+        :param baudrate: Baud rate of the serial line.
+        :param timeout: How long to wait for the board to confirm the configuration (in seconds).
+        :param rtscts: Whether the converter and board use RTS/CTS hardware flow control.
+        :param command_gap: Fixed pause between commands (in seconds). DEFAULT_COMMAND_GAP if None.
+        :param protocol: Format of the commands sent to the board ('legacy', 'framed' or 'auto').
+        :param negotiate_baudrate: Whether to switch to a faster baud rate if the board supports it.
+        :param adaptive_gap: Whether to start with a short pause between commands and make it longer if the board does
+                             not confirm a push. Cannot be combined with command_gap.
+        :raise ValueError: If the device name is not a valid serial device, the protocol is unknown or both a fixed
+                           and an adaptive pause are requested.
+        """
         if not device_name.startswith("/dev/"):
             raise ValueError("Wrong UART communication device " + device_name)
-        self._device_name = device_name
+        if protocol not in self.PROTOCOLS:
+            raise ValueError("Unknown protocol '{}', choose from {}".format(protocol, ', '.join(self.PROTOCOLS)))
+        if adaptive_gap and command_gap is not None:
+            raise ValueError("A fixed command gap cannot be adaptive")
+        self.device_name = device_name
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.rtscts = rtscts
+        self.protocol = protocol
+        self.negotiate_baudrate = negotiate_baudrate
+        self._adaptive_gap = adaptive_gap
+        if adaptive_gap:
+            self._command_gap = self.FAST_COMMAND_GAP
+        else:
+            self._command_gap = self.DEFAULT_COMMAND_GAP if command_gap is None else command_gap
+
+    @property
+    def command_gap(self) -> float:
+        """
+        :return: The pause between two consecutive commands (in seconds) used for the next push.
+        """
+        return 0.0 if self.rtscts else self._command_gap
+
+    def slow_down(self) -> bool:
+        """
+        Make the pause between commands of the following pushes longer after the board failed to answer a push.
+        :return: Whether the pause was changed.
+        """
+        # compare the pause itself, command_gap is always 0 with flow control and would never reach the maximum
+        if not self._adaptive_gap or self._command_gap >= self.MAX_COMMAND_GAP:
+            return False
+        self._command_gap = min(self._command_gap * self.COMMAND_GAP_BACKOFF, self.MAX_COMMAND_GAP)
+        logging.warning('No reply from board, using {:.0f} ms pause between commands from now on'.format(
+            self._command_gap * 1000))
+        return True
+
+    def open_serial(self, timeout: Optional[float]) -> serial.Serial:
+        """
+        Open the serial port.
+        :param timeout: Read timeout of the port (None blocks forever, 0 is non-blocking).
+        :return: The open port.
+        """
+        return serial.Serial(
+            port=self.device_name,
+            baudrate=self.baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            timeout=timeout,
+            write_timeout=2,
+            rtscts=self.rtscts,
+        )
+
+
+def read_frame(ser: serial.Serial) -> Optional[Frame]:
+    """
+    Read one frame from the serial port, skipping bytes before its start.
+    :param ser: The open port. Its timeout limits the wait for each part of the frame.
+    :return: The frame, or None if none arrived in time or it was corrupted.
+    """
+    while True:
+        start = ser.read(size=1)
+        if len(start) == 0:
+            return None
+        if start[0] == FRAME_MAGIC:
+            break
+    header = start + ser.read(size=HEADER_SIZE - 1)
+    size = frame_size(header)
+    if size is None:
+        return None
+    data = header + ser.read(size=size - len(header))
+    try:
+        return decode_frame(data)
+    except ValueError as e:
+        logging.debug('Dropped frame from board: {}'.format(e))
+        return None
+
+
+class UARTWriter(ConfigWriter[CommandsLike]):
+    """
+    Writer sending commands to the STM32 MCU on the switch via a USB-to-UART converter.
+
+    The format of the commands is given by the protocol setting, and negotiated once per session if it is 'auto' (see
+    UARTSettings).
+    """
+
+    FRAME_RETRIES = 3  # how often a frame is repeated if the board did not acknowledge it
+    BAUDRATE_RECHECK_INTERVAL = 24 * 60 * 60  # how long rates above the recorded one are not tried again (in seconds)
+    PROBE_TIMEOUT = 0.05  # how long to wait for the answer to the probe
+    PROBE_ATTEMPTS = 3
+
+    def __init__(self, device_name: str, **kwargs: Any) -> None:
+        """
+        :param device_name: The serial port the UART converter is connected to.
+        :param kwargs: Further settings of the serial line, see UARTSettings.
+        """
+        super().__init__(device_name)
+        self.settings = UARTSettings(device_name, **kwargs)
+        self._serial: Optional[serial.Serial] = None
+        self._device_key: Optional[str] = None
+        self.baud_registry = BaudRateRegistry()
+        self._capabilities: Optional[Capabilities] = None
+        self._negotiated = False
+        self._baudrate = self.settings.baudrate
+        self._seq = 0
 
     @classmethod
     def device_description(cls: 'UARTWriter') -> str:
         return "USB-to-UART converter"
 
-    def write(self, data: List[Any]) -> bool:
+    @property
+    def command_gap(self) -> float:
         """
-        Write data commands to serial port.
+        :return: The pause between two consecutive commands (in seconds) used for the next push.
+        """
+        return self.settings.command_gap
 
-        Write data to serial port which the UART converter is connected to. The STM32 MCU
-        on the SwitchBlox will then be interrupted and carry out the commands
+    @property
+    def baudrate(self) -> int:
+        """
+        :return: The baud rate of the line in the current session (the initial one if no session is open).
+        """
+        return self._baudrate
 
-        :param List[List] data: Commands created to write to STM32 MCU
-        :return: Flag to indicate whether the write data to serial was successful or not
+    def is_connected(self) -> bool:
         """
+        :return: Whether a serial session is open.
+        """
+        return self._serial is not None
 
-        ser = serial.Serial(
-            port=self._device_name,
-            baudrate=115200,
-            bytesize=serial.EIGHTBITS,
-            parity=serial.PARITY_NONE,
-            timeout=20,
-            write_timeout=2,
-        )
+    def device_key(self) -> str:
+        if self._device_key is None:
+            self._device_key = find_device_key(self.settings.device_name)
+        return self._device_key
+
+    def connect(self) -> None:
+        if self._serial is None:
+            self._serial = self.settings.open_serial(self.settings.timeout)
 
-        for command in data:
-            x = bytes(command)
-            ser.write(x)
-            time.sleep(0.1)
+    def disconnect(self) -> None:
+        if self._serial is None:
+            return
+        try:
+            if self._baudrate != self.settings.baudrate:
+                # the next session (possibly of another program) starts at the initial rate
+                self._switch_baudrate(self.settings.baudrate)
+        except (OSError, serial.SerialException) as e:
+            logging.warning('Cannot restore the baud rate of the board: {}'.format(e))
+        finally:
+            self._serial.close()
+            self._serial = None
+            self._capabilities = None  # the board may be swapped before the next session
+            self._negotiated = False
+            self._baudrate = self.settings.baudrate
 
-        condition = ser.read(size=1)
-        ser.close()
+    def negotiate(self) -> Optional[Capabilities]:
+        """
+        Ask the board for its capabilities, unless this was done before in this session or the legacy format is
+        forced. If the board supports faster baud rates, switch to the fastest one that works. A session must be open.
+        :return: The capabilities, or None if the board only supports the legacy format.
+        """
+        if self.settings.protocol == 'legacy':
+            return None
+        if self._negotiated:
+            return self._capabilities
 
+        if self._capabilities is None:  # not probed yet
+            self._capabilities = self._find_board()
+        self._negotiated = True
+        if self._capabilities is None:
+            logging.info('Board does not support framed commands, using the legacy format')
+        elif self.settings.negotiate_baudrate:
+            self._speed_up()
+        return self._capabilities
+
+    def probe(self) -> Optional[str]:
+        """
+        Ask the board for its capabilities, waiting only PROBE_TIMEOUT for each of PROBE_ATTEMPTS answers. Only
+        boards whose firmware supports the framed protocol answer. If a session is open, the capabilities are kept
+        for the writes in this session.
+        :return: Switch type of the board, or None if the board type is unknown.
+        :raise TimeoutError: If the board does not answer.
+        """
+        opened_here = not self.is_connected()
+        self.connect()
         try:
-            condition = list(condition)[0]
-        except IndexError:
-            logging.error('Failed to read condition message from board')
-            return False
+            capabilities = self._capabilities
+            for _ in range(self.PROBE_ATTEMPTS):
+                if capabilities is not None:
+                    break
+                capabilities = self._find_board(self.PROBE_TIMEOUT)
+            self._capabilities = capabilities
+        finally:
+            if opened_here:
+                self.disconnect()
+        if capabilities is None:
+            raise TimeoutError('No board answers on {}'.format(self.settings.device_name))
+        return capabilities.switch_type
+
+    def _find_board(self, timeout: Optional[float] = None) -> Optional[Capabilities]:
+        """
+        Send the hello command at the current baud rate and, if the board does not answer, at the rate recorded for
+        the device. A board whose last session ended without switching back (e.g. because the program was killed) is
+        still at that rate; the session then goes on at it.
+        :param timeout: How long to wait for each answer (in seconds), HELLO_TIMEOUT by default.
+        :return: The capabilities, or None if the board did not answer with capabilities it is compatible with.
+        """
+        capabilities = self._hello(timeout)
+        recorded = self.baud_registry.get(self.device_key())
+        if capabilities is not None or recorded is None or recorded == self._baudrate:
+            return capabilities
+
+        self._serial.baudrate = recorded
+        capabilities = self._hello(timeout)
+        if capabilities is None:
+            self._serial.baudrate = self._baudrate
         else:
-            if condition == 1:
-                logging.info('Success setting configuration in EEPROM')
+            logging.info('Board is still at {} baud from an earlier session'.format(recorded))
+            self._baudrate = recorded
+        return capabilities
+
+    def _hello(self, timeout: Optional[float] = None) -> Optional[Capabilities]:
+        """
+        Send the hello command and wait shortly for the capabilities of the board.
+        :param timeout: How long to wait for the answer (in seconds), HELLO_TIMEOUT by default.
+        :return: The capabilities, or None if the board did not answer with capabilities it is compatible with.
+        """
+        frame = self._request(hello_command(), FrameType.CAPABILITIES, None,
+                              self.settings.HELLO_TIMEOUT if timeout is None else timeout)
+        self._serial.reset_input_buffer()  # anything a board with older firmware may have answered
+        if frame is None:
+            return None
+        try:
+            capabilities = Capabilities.decode(frame.payload)
+        except ValueError as e:
+            logging.warning('Ignoring capabilities of board: {}'.format(e))
+            return None
+        return capabilities if capabilities.version >= PROTOCOL_VERSION else None
+
+    def _request(self, data: bytes, reply_type: FrameType, seq: Optional[int],
+                 timeout: float = UARTSettings.HELLO_TIMEOUT) -> Optional[Frame]:
+        """
+        Send a command or frame and wait shortly for the frame answering it.
+        :param data: The command or frame.
+        :param reply_type: Type of the answer.
+        :param seq: Sequence number of the answer, or None to accept any.
+        :param timeout: How long to wait for the answer (in seconds).
+        :return: The answer, or None if it did not arrive in time.
+        """
+        ser = self._serial
+        ser.reset_input_buffer()
+        ser.write(data)
+        ser.flush()
+        ser.timeout = timeout
+        try:
+            reply = read_frame(ser)
+            while reply is not None and (reply.type != reply_type or (seq is not None and reply.seq != seq)):
+                reply = read_frame(ser)
+        finally:
+            ser.timeout = self.settings.timeout
+        return reply
+
+    def _speed_up(self) -> None:
+        """
+        Switch to the fastest baud rate supported by the board that works, and record it. Rates above the one recorded
+        for the device in the baud rate registry are tried again only once the record is older than
+        BAUDRATE_RECHECK_INTERVAL; sessions limited by the record keep its time, so it gets old even if the device is
+        used every day. If even the recorded rate does not work anymore, the record is dropped.
+        """
+        device_key = self.device_key()
+        candidates = sorted([rate for rate in self._capabilities.baudrates if rate > self._baudrate], reverse=True)
+        known = self.baud_registry.get(device_key, max_age=self.BAUDRATE_RECHECK_INTERVAL)
+        if known is not None:
+            candidates = [rate for rate in candidates if rate <= known]
+        for baudrate in candidates:
+            if self._switch_baudrate(baudrate):
+                self.baud_registry.record(device_key, baudrate, keep_time=known is not None)
+                return
+            if self._capabilities is None:
+                break  # the board is lost
+        if known in candidates:
+            self.baud_registry.forget(device_key)
+
+    def _switch_baudrate(self, baudrate: int) -> bool:
+        """
+        Switch the board and the serial port to another baud rate, and check that the line works at the new rate.
+        Falls back to the old rate if it does not.
+        :param baudrate: The new baud rate.
+        :return: Whether the baud rate was switched.
+        """
+        ser = self._serial
+        old_baudrate = self._baudrate
+        frame = Frame(FrameType.SET_BAUD, encode_baudrate(baudrate), self._seq)
+        self._seq = (self._seq + 1) & 0xFF
+        reply = self._request(frame.encode(), FrameType.STATUS, frame.seq)
+        if reply is not None and reply.payload[:1] != bytes([Status.OK]):
+            return False  # the board stays at the old rate
+
+        if reply is not None:
+            ser.baudrate = baudrate
+            if self._hello() is not None:
+                self._baudrate = baudrate
+                logging.info('Switched to {} baud'.format(baudrate))
                 return True
-            elif condition == 2:
-                logging.error('Failed saving configuration in EEPROM')
+            ser.baudrate = old_baudrate
+
+        logging.info('Line does not work at {} baud, staying at {} baud'.format(baudrate, old_baudrate))
+        time.sleep(BAUD_CONFIRM_TIMEOUT)  # until the board returns to the old rate
+        if self._hello() is None and self._hello() is None:
+            logging.warning('Board does not answer after falling back to {} baud'.format(old_baudrate))
+            self._capabilities = None
+        return False
+
+    def write(self, data: CommandsLike) -> bool:
+        """
+        Write data commands to serial port.
+
+        Write data to serial port which the UART converter is connected to. The STM32 MCU
+        on the SwitchBlox will then be interrupted and carry out the commands. If no session is open,
+        a session is opened just for this write.
+
+        :param CommandBuffer data: Commands created to write to STM32 MCU (a list of commands is accepted too)
+        :return: Flag to indicate whether the write data to serial was successful or not
+        """
+        commands = data if isinstance(data, CommandBuffer) else CommandBuffer(data)
+        opened_here = not self.is_connected()
+        self.connect()
+        try:
+            capabilities = self.negotiate()
+            if capabilities is None and self.settings.protocol == 'framed':
+                logging.error('Board does not support framed commands')
                 return False
+            if capabilities is None:
+                condition = self._push(commands)
+                if len(condition) == 0:
+                    self.settings.slow_down()
+            else:
+                condition = self._push_frames(commands)
+        finally:
+            if opened_here:
+                self.disconnect()
+
+        return check_condition(condition)
+
+    def _push(self, data: CommandBuffer) -> bytes:
+        """
+        Stream the commands to the open serial port and wait for the condition byte.
+        :param data: The commands to send.
+        :return: The condition reply (empty if the board did not answer in time).
+        """
+        ser = self._serial
+        ser.reset_input_buffer()  # drop anything left over from previous pushes in this session
+
+        gap = self.command_gap
+        with data.view() as view:
+            if gap > 0:
+                for i in range(0, len(view), COMMAND_SIZE):
+                    ser.write(view[i:i + COMMAND_SIZE])
+                    ser.flush()  # wait until the command has left the UART, then give the MCU time to process it
+                    time.sleep(gap)
+            else:
+                ser.write(view)
+        ser.flush()
+
+        return ser.read(size=1)
+
+    def _push_frames(self, data: CommandBuffer) -> bytes:
+        """
+        Send the commands to the open serial port in WRITE frames, keeping up to a window of frames unacknowledged,
+        and store them with a final frame once all of them are acknowledged.
+        :param data: The commands to send. Erase and stop commands are turned into the flags of the frames.
+        :return: The status of the last answered frame as condition reply (empty if the board did not answer in time).
+        """
+        self._serial.reset_input_buffer()
+
+        commands = data.copy()
+        erase = commands.discard(ERASE_COMMAND)
+        store = commands.discard(STOP_COMMAND)
+        frames = list()
+        if len(commands) > 0 or not store:
+            frames = write_frames(commands, erase, self._capabilities.max_payload, self._seq, store=False)
+        self._seq = (self._seq + len(frames)) & 0xFF
+        status = self._send_window(frames)
+
+        if status == Status.OK and store:
+            final = Frame(FrameType.WRITE, encode_write([], erase=erase and len(frames) == 0), self._seq)
+            self._seq = (self._seq + 1) & 0xFF
+            status = self._send_window([final], self.settings.timeout)  # storing in the EEPROM takes a while
+        return b'' if status is None else bytes([status])
+
+    def _send_window(self, frames: List[Frame], timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Send frames, keeping up to a window of them unacknowledged. A frame that is not acknowledged in time, or that
+        the board received corrupted, is sent again (up to FRAME_RETRIES times).
+        :param frames: The frames.
+        :param timeout: How long to wait for the answer to a frame (in seconds). By default, the transmission time of
+                        a full window plus ACK_TIMEOUT.
+        :return: Status.OK if all frames were acknowledged, the status of the first frame the board refused, or None if
+                 a frame was not answered.
+        """
+        ser = self._serial
+        window = self._capabilities.window
+        if timeout is None:
+            frame_time = 10 * (self._capabilities.max_payload + HEADER_SIZE + CRC_SIZE) / self._baudrate
+            timeout = self.settings.ACK_TIMEOUT + window * frame_time
+
+        unacknowledged: Dict[int, List] = dict()  # sequence number -> [encoded frame, deadline, number of retries]
+        next_frame = 0
+        while next_frame < len(frames) or len(unacknowledged) > 0:
+            while next_frame < len(frames) and len(unacknowledged) < window:
+                encoded = frames[next_frame].encode()
+                ser.write(encoded)
+                unacknowledged[frames[next_frame].seq] = [encoded, time.monotonic() + timeout, 0]
+                next_frame += 1
+            ser.flush()
+
+            reply = None
+            remaining = min(entry[1] for entry in unacknowledged.values()) - time.monotonic()
+            if remaining > 0:
+                ser.timeout = remaining
+                try:
+                    reply = read_frame(ser)
+                finally:
+                    ser.timeout = self.settings.timeout
+
+            if reply is not None:
+                if reply.type != FrameType.STATUS or reply.seq not in unacknowledged or len(reply.payload) == 0:
+                    continue  # a late answer to a frame that was sent again
+                status = reply.payload[0]
+                if status == Status.OK:
+                    del unacknowledged[reply.seq]
+                    continue
+                if status != Status.CRC_ERROR:
+                    return status
+                logging.warning('Board received a corrupted frame, sending it again')
+                resend = [reply.seq]
+            else:
+                now = time.monotonic()
+                resend = [seq for seq, entry in unacknowledged.items() if entry[1] <= now]
+                if len(resend) > 0:
+                    logging.info('No answer to {} frame(s), sending them again'.format(len(resend)))
+
+            for seq in resend:
+                entry = unacknowledged[seq]
+                entry[2] += 1
+                if entry[2] > self.FRAME_RETRIES:
+                    return None
+                ser.write(entry[0])
+                entry[1] = time.monotonic() + timeout
+        return Status.OK
+
+
+class AsyncConfigWriter(Generic[CommandType]):
+    """
+    Asynchronous counterpart of ConfigWriter for use in asyncio event loops.
+
+    Waiting for the device does not block the event loop, and a pending write can be cancelled or limited by
+    asyncio.wait_for(). Sessions are opened using `async with`:
+
+        async with switch.get_async_config_writer(device_name) as writer:
+            await writer.write(commands)
+    """
+
+    def __init__(self, device_name: str) -> None:
+        pass
+
+    async def __aenter__(self) -> 'AsyncConfigWriter[CommandType]':
+        await self.connect()
+        return self
+
+    async def __aexit__(self,
+                        exc_type: Optional[Type[BaseException]],
+                        exc_value: Optional[BaseException],
+                        traceback: Optional[TracebackType]) -> None:
+        await self.disconnect()
+
+    @classmethod
+    def device_description(cls: 'AsyncConfigWriter') -> str:
+        raise NotImplementedError()
+
+    async def connect(self) -> None:
+        """
+        Open a session with the device. Writes issued until disconnect() is called share this session.
+        """
+        pass
+
+    async def disconnect(self) -> None:
+        """
+        Close the session opened by connect(). Does nothing if no session is open.
+        """
+        pass
+
+    def device_key(self) -> Optional[str]:
+        """
+        :return: A key identifying the device across sessions, or None if the device cannot be identified.
+        """
+        return None
+
+    async def write(self, data: CommandType) -> bool:
+        raise NotImplementedError()
+
+
+class AsyncTestWriter(AsyncConfigWriter[Any]):
+    @classmethod
+    def device_description(cls: 'AsyncTestWriter') -> str:
+        return "Test"
+
+    async def write(self, data: CommandType) -> bool:
+        return True
+
+
+class AsyncUARTWriter(AsyncConfigWriter[CommandsLike]):
+    """
+    Asynchronous writer sending commands to the STM32 MCU on the switch via a USB-to-UART converter.
+
+    The serial port is used in non-blocking mode. Where the event loop supports it, the condition reply is awaited
+    using a reader callback on the port's file descriptor; otherwise the port is polled.
+
+    Commands are always sent in the legacy format, other protocols are not supported.
+    """
+
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, device_name: str, **kwargs: Any) -> None:
+        """
+        :param device_name: The serial port the UART converter is connected to.
+        :param kwargs: Further settings of the serial line, see UARTSettings.
+        :raise ValueError: If the settings are not valid, or a protocol other than 'legacy' is requested.
+        """
+        super().__init__(device_name)
+        self.settings = UARTSettings(device_name, **kwargs)
+        if self.settings.protocol != 'legacy':
+            raise ValueError("AsyncUARTWriter supports only the 'legacy' protocol, not '{}'".format(
+                self.settings.protocol))
+        self._serial: Optional[serial.Serial] = None
+        self._device_key: Optional[str] = None
+
+    @classmethod
+    def device_description(cls: 'AsyncUARTWriter') -> str:
+        return UARTWriter.device_description()
+
+    @property
+    def command_gap(self) -> float:
+        """
+        :return: The pause between two consecutive commands (in seconds) used for the next push.
+        """
+        return self.settings.command_gap
+
+    def is_connected(self) -> bool:
+        """
+        :return: Whether a serial session is open.
+        """
+        return self._serial is not None
+
+    def device_key(self) -> str:
+        if self._device_key is None:
+            self._device_key = find_device_key(self.settings.device_name)
+        return self._device_key
+
+    async def connect(self) -> None:
+        if self._serial is None:
+            self._serial = self.settings.open_serial(timeout=0)
+
+    async def disconnect(self) -> None:
+        if self._serial is None:
+            return
+        self._serial.close()
+        self._serial = None
+
+    async def write(self, data: CommandsLike) -> bool:
+        """
+        Write data commands to serial port without blocking the event loop.
+
+        :param CommandBuffer data: Commands created to write to STM32 MCU (a list of commands is accepted too)
+        :return: Flag to indicate whether the write data to serial was successful or not
+        """
+        commands = data if isinstance(data, CommandBuffer) else CommandBuffer(data)
+        opened_here = not self.is_connected()
+        await self.connect()
+        try:
+            condition = await self._push(commands)
+            if len(condition) == 0:
+                self.settings.slow_down()
+        finally:
+            if opened_here:
+                await self.disconnect()
+
+        return check_condition(condition)
+
+    async def _push(self, data: CommandBuffer) -> bytes:
+        """
+        Stream the commands to the open serial port and wait for the condition byte.
+        :param data: The commands to send.
+        :return: The condition reply (empty if the board did not answer in time).
+        """
+        import asyncio  # not imported at module level, it makes the CLI start noticeably slower
+
+        ser = self._serial
+        ser.reset_input_buffer()
+
+        gap = self.command_gap
+        with data.view() as view:
+            if gap > 0:
+                for i in range(0, len(view), COMMAND_SIZE):
+                    ser.write(view[i:i + COMMAND_SIZE])
+                    # the pause is longer than the transmission of one command, so there is no need to drain the UART
+                    await asyncio.sleep(gap)
+            else:
+                ser.write(view)
+
+        try:
+            return await asyncio.wait_for(self._read_byte(), self.settings.timeout)
+        except asyncio.TimeoutError:
+            return b''
+
+    async def _read_byte(self) -> bytes:
+        """
+        Wait until a byte arrives on the serial port.
+        :return: The byte.
+        """
+        import asyncio
+
+        ser = self._serial
+        loop = asyncio.get_event_loop()
+        while True:
+            data = ser.read(size=1)
+            if len(data) > 0:
+                return data
+
+            readable = loop.create_future()
+
+            def on_readable() -> None:
+                if not readable.done():
+                    readable.set_result(None)
+
+            try:
+                loop.add_reader(ser.fileno(), on_readable)
+            except (AttributeError, NotImplementedError, OSError, ValueError):
+                # the port has no file descriptor (e.g. on Windows) or the loop cannot watch it
+                await asyncio.sleep(self.POLL_INTERVAL)
+                continue
+            try:
+                await readable
+            finally:
+                loop.remove_reader(ser.fileno())
@@ -0,0 +1,101 @@
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from .commands import CommandBuffer, CommandsLike
+from ..cache import get_cache_file, load_json, save_json
+
+
+STOP_COMMAND = 100
+ERASE_COMMAND = 101
+
+
+class DeviceStateStore:
+    """
+    Last known register image of each configured device.
+
+    After every successful push, the written register values are recorded under a key identifying the device (its USB
+    serial number or port path). The next push to the same device can then be reduced to the registers whose value
+    differs from the recorded one. The store is persisted as a JSON file in the cache directory.
+    """
+
+    FILE_NAME = 'device_state.json'
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        :param path: Path to the store file. Defaults to device_state.json in the cache directory.
+        """
+        self._path = path if path is not None else get_cache_file(self.FILE_NAME)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _register_key(command: List[int]) -> str:
+        return "{}:{}".format(command[0], command[1])
+
+    def _load(self) -> Dict[str, Dict]:
+        data = load_json(self._path, dict())
+        return data if isinstance(data, dict) else dict()
+
+    def get_image(self, device_key: str, switch_name: str) -> Dict[str, List[int]]:
+        """
+        Return the last known register image of the given device.
+        :param device_key: Key identifying the device.
+        :param switch_name: Name of the switch chip. State recorded for a different chip is ignored.
+        :return: Mapping of "phy:mii" register keys to the register data bytes.
+        """
+        with self._lock:
+            state = self._load().get(device_key)
+        if state is None or state.get('switch') != switch_name:
+            return dict()
+        return state.get('registers', dict())
+
+    def diff(self, device_key: str, switch_name: str, commands: CommandsLike) -> CommandBuffer:
+        """
+        Leave out commands that would write a register with the value the device already holds.
+        :param device_key: Key identifying the device.
+        :param switch_name: Name of the switch chip.
+        :param commands: The commands to send (without the stop command).
+        :return: The commands the device needs to receive.
+        """
+        commands = CommandBuffer(commands)
+        if any(command[0] == ERASE_COMMAND for command in commands):
+            return commands
+        image = self.get_image(device_key, switch_name)
+        return CommandBuffer([command for command in commands
+                              if image.get(self._register_key(command)) != command[2:]])
+
+    def record(self, device_key: str, switch_name: str, commands: CommandsLike) -> None:
+        """
+        Record commands that were successfully written to the device.
+        :param device_key: Key identifying the device.
+        :param switch_name: Name of the switch chip.
+        :param commands: The written commands.
+        """
+        with self._lock:
+            data = self._load()
+            state = data.get(device_key)
+            if state is None or state.get('switch') != switch_name:
+                state = {'switch': switch_name, 'registers': dict()}
+            registers = state['registers']
+            for command in commands:
+                if command[0] == STOP_COMMAND:
+                    continue
+                elif command[0] == ERASE_COMMAND:
+                    registers.clear()
+                else:
+                    registers[self._register_key(command)] = list(command[2:])
+            data[device_key] = state
+            try:
+                save_json(self._path, data)
+            except OSError as e:
+                logging.warning('Cannot store device state in {}: {}'.format(self._path, e))
+
+    def forget(self, device_key: str) -> None:
+        """
+        Drop all recorded state of the given device.
+        :param device_key: Key identifying the device.
+        """
+        with self._lock:
+            data = self._load()
+            if data.pop(device_key, None) is not None:
+                save_json(self._path, data)
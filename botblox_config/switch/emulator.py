@@ -0,0 +1,409 @@
+"""
+Software model of a switch board (the STM32 firmware and the switch chip behind it) for testing without hardware.
+
+SwitchEmulator implements the protocol. EmulatedDevice serves it on a pseudo-terminal, so the real serial writers
+and readers can talk to it like to a board connected via a USB-to-UART converter:
+
+    with EmulatedDevice("switchblox") as device:
+        UARTWriter(device.device_name).write(commands)
+        assert device.emulator.num_stores == 1
+"""
+
+import collections
+import os
+import select
+import threading
+import time
+from types import TracebackType
+from typing import Deque, Dict, Iterator, Optional, Set, Tuple, Type
+
+from .all import create_switch
+from .commands import COMMAND_SIZE, CommandBuffer
+from .config_reader import READ_COMMAND
+from .device_state import ERASE_COMMAND, STOP_COMMAND
+from .protocol import BAUD_CONFIRM_TIMEOUT, board_type, Capabilities, decode_baudrate, decode_frame, decode_write, \
+    FLAG_ERASE, FLAG_STORE, Frame, FRAME_MAGIC, frame_size, FrameType, HELLO_COMMAND, PROTOCOL_VERSION, Status
+
+# condition bytes answering the stop command
+CONDITION_SUCCESS = 1
+CONDITION_EEPROM_FAILURE = 2
+
+
+class SwitchEmulator:
+    """
+    Emulation of the firmware protocol spoken on the UART of a switch.
+
+    The board receives 4-byte commands [phy, mii, low byte, high byte]. Register writes are collected until the stop
+    command, which applies them to the chip, stores them in the EEPROM and is answered with a condition byte (1 on
+    success, 2 if the EEPROM could not be written). The erase command clears the EEPROM.
+
+    Unless the emulated firmware is legacy (framed=False), the board also answers the read command [102, phy, mii, 0]
+    with the data bytes of the register, and speaks the framed protocol (see the protocol module): it answers the
+    hello command with its capabilities and each WRITE frame with a STATUS frame, and it can switch to a faster baud
+    rate. Legacy firmware knows only the stop and erase commands, so it takes read and hello commands for register
+    writes, which are stored with the next stop command. Bytes received at a different baud rate than the board's, or
+    at a rate above max_reliable_baudrate, are lost like on a line that cannot carry them.
+
+    Bytes received from the UART are passed to feed(), which returns the bytes the board sends back.
+    """
+
+    DEFAULT_MAX_PAYLOAD = 256
+    DEFAULT_WINDOW = 8
+    DEFAULT_BAUDRATE = 115200
+    BAUDRATES = (115200, 230400, 460800, 921600)
+
+    def __init__(self, switch_type: str = "switchblox", framed: bool = True,
+                 max_payload: int = DEFAULT_MAX_PAYLOAD, window: int = DEFAULT_WINDOW) -> None:
+        """
+        :param switch_type: Type of the emulated switch. Its registers start with their default values.
+        :param framed: Whether the firmware supports the framed protocol (and the read command).
+        :param max_payload: Maximum payload of a frame accepted by the board.
+        :param window: Number of WRITE frames the board can receive before it answers them.
+        """
+        self.capabilities = Capabilities(PROTOCOL_VERSION, board_type(switch_type), max_payload, self.BAUDRATES,
+                                         window)
+        self.framed = framed
+        self.baudrate = self.DEFAULT_BAUDRATE
+        self.max_reliable_baudrate: Optional[int] = None  # bytes sent faster than this are lost
+        self._previous_baudrate: Optional[int] = None  # the rate to return to until the new one is confirmed
+        switch = create_switch(switch_type)
+        registers = switch.get_registers().values()
+        self._defaults: Dict[Tuple[int, int], bytes] = dict(
+            [((r.address.phy, r.address.mii), bytes(r.data)) for r in registers])
+        self._register_size = max([r.num_data_bytes for r in registers])
+        self.registers: Dict[Tuple[int, int], bytes] = dict(self._defaults)
+        self.eeprom: Dict[Tuple[int, int], bytes] = dict()
+        self._pending: Dict[Tuple[int, int], bytes] = dict()
+        self._chunks: Dict[int, CommandBuffer] = dict()  # writes of WRITE frames by sequence number
+        self._partial = bytearray()
+
+        self.fail_store = False  # answer the stop command with an EEPROM failure
+        self.num_commands = 0
+        self.num_frames = 0
+        self.num_crc_errors = 0
+        self.num_lost_bytes = 0
+        self.num_stores = 0
+
+    def feed(self, data: bytes) -> bytes:
+        """
+        Process bytes received from the UART. Incomplete commands are kept until the rest arrives.
+        :param data: The received bytes.
+        :return: The bytes the board answers.
+        """
+        self.receive(data)
+        reply = bytearray()
+        for message in self.messages():
+            reply += self.handle(message)
+        return bytes(reply)
+
+    def receive(self, data: bytes, line_baudrate: Optional[int] = None) -> None:
+        """
+        Buffer bytes received from the UART without processing them (see messages()).
+        :param data: The received bytes.
+        :param line_baudrate: Baud rate the bytes were sent with, if known.
+        """
+        if (line_baudrate is not None and line_baudrate != self.baudrate) or \
+                (self.max_reliable_baudrate is not None and self.baudrate > self.max_reliable_baudrate):
+            self.num_lost_bytes += len(data)
+            return
+        self._partial += data
+
+    @property
+    def baudrate_confirmed(self) -> bool:
+        """
+        :return: Whether the board received the hello command since it switched the baud rate.
+        """
+        return self._previous_baudrate is None
+
+    def revert_baudrate(self) -> None:
+        """
+        Return to the previous baud rate because the new one was not confirmed in time (see BAUD_CONFIRM_TIMEOUT).
+        """
+        if self._previous_baudrate is not None:
+            self.baudrate, self._previous_baudrate = self._previous_baudrate, None
+            self._partial.clear()
+
+    def messages(self) -> Iterator[bytes]:
+        """
+        Take the complete messages (commands and frames) out of the received bytes.
+        :return: Iterator over the messages, to be passed to handle().
+        """
+        while True:
+            if self.framed and len(self._partial) > 0 and self._partial[0] == FRAME_MAGIC:
+                size = frame_size(self._partial)
+            else:
+                size = COMMAND_SIZE
+            if size is None or len(self._partial) < size:
+                return
+            message = bytes(self._partial[:size])
+            del self._partial[:size]
+            yield message
+
+    def handle(self, message: bytes) -> bytes:
+        """
+        Process one message.
+        :param message: The 4 command bytes, or a frame.
+        :return: The bytes the board answers.
+        """
+        if self.framed and message[0] == FRAME_MAGIC:
+            return self._handle_frame(message)
+
+        self.num_commands += 1
+        code = message[0]
+        if code == STOP_COMMAND:
+            return bytes([self._store()])
+        elif code == ERASE_COMMAND:
+            self.eeprom.clear()
+        elif code == READ_COMMAND and self.framed:
+            return self.registers.get((message[1], message[2]), bytes(self._register_size))
+        elif code == HELLO_COMMAND and self.framed:
+            self._previous_baudrate = None
+            return Frame(FrameType.CAPABILITIES, self.capabilities.encode()).encode()
+        else:
+            self._pending[(message[0], message[1])] = bytes(message[2:])
+        return b''
+
+    def _handle_frame(self, data: bytes) -> bytes:
+        """
+        Process one frame.
+        :param data: The frame.
+        :return: The STATUS frame answering it.
+        """
+        self.num_frames += 1
+        try:
+            frame = decode_frame(data)
+        except ValueError:
+            self.num_crc_errors += 1
+            return Frame(FrameType.STATUS, bytes([Status.CRC_ERROR]), data[3]).encode()
+
+        if frame.type == FrameType.SET_BAUD and frame.version <= PROTOCOL_VERSION:
+            return self._set_baudrate(frame)
+        try:
+            if frame.type != FrameType.WRITE or frame.version > PROTOCOL_VERSION \
+                    or len(frame.payload) > self.capabilities.max_payload:
+                raise ValueError('Unsupported frame')
+            flags, commands = decode_write(frame.payload)
+        except ValueError:
+            return Frame(FrameType.STATUS, bytes([Status.BAD_FRAME]), frame.seq).encode()
+
+        if flags & FLAG_ERASE:
+            self.eeprom.clear()
+        self.num_commands += len(commands)
+        self._chunks[frame.seq] = commands
+        status = Status.OK
+        if flags & FLAG_STORE:
+            # apply the frames in sequence order, ending with this one
+            for seq in sorted(self._chunks, key=lambda s: (s - frame.seq - 1) & 0xFF):
+                for command in self._chunks[seq]:
+                    self._pending[(command[0], command[1])] = bytes(command[2:])
+            self._chunks.clear()
+            status = self._store()
+        return Frame(FrameType.STATUS, bytes([status]), frame.seq).encode()
+
+    def _set_baudrate(self, frame: Frame) -> bytes:
+        """
+        Switch to the baud rate requested by a SET_BAUD frame. The reply is still sent at the old rate.
+        :param frame: The frame.
+        :return: The STATUS frame answering it.
+        """
+        try:
+            baudrate = decode_baudrate(frame.payload)
+        except ValueError:
+            baudrate = None
+        if baudrate not in self.capabilities.baudrates:
+            return Frame(FrameType.STATUS, bytes([Status.BAD_FRAME]), frame.seq).encode()
+        if baudrate != self.baudrate:
+            self._previous_baudrate, self.baudrate = self.baudrate, baudrate
+        return Frame(FrameType.STATUS, bytes([Status.OK]), frame.seq).encode()
+
+    def _store(self) -> int:
+        """
+        Apply the pending register writes and store them in the EEPROM.
+        :return: The condition byte.
+        """
+        pending, self._pending = self._pending, dict()
+        self.registers.update(pending)
+        if self.fail_store:
+            return CONDITION_EEPROM_FAILURE
+        self.eeprom.update(pending)
+        self.num_stores += 1
+        return CONDITION_SUCCESS
+
+    def power_cycle(self) -> None:
+        """
+        Restart the board: the chip starts with the default registers and the firmware loads the EEPROM into it.
+        """
+        self.registers = dict(self._defaults)
+        self.registers.update(self.eeprom)
+        self.baudrate = self.DEFAULT_BAUDRATE
+        self._previous_baudrate = None
+        self._pending.clear()
+        self._chunks.clear()
+        self._partial.clear()
+
+
+class EmulatedDevice:
+    """
+    A SwitchEmulator served on a pseudo-terminal (POSIX only).
+
+    The slave side of the pty is a serial device (device_name) that can be opened by pyserial. A background thread
+    passes everything written to it to the emulator and sends the replies back. Timing and faults can be injected to
+    test the host side of the protocol:
+
+    - command_time: Time the MCU needs to process one command (in seconds). Commands are read only after the previous
+      ones are processed, so a slow board pushes back on the writer through the pty buffer.
+    - latency: Delay until each reply arrives (in seconds). The board goes on processing commands meanwhile.
+    - drop_replies: Number of following replies to stop commands and WRITE frames that are not sent (the writer sees
+      a timeout).
+    - drop_frames: Numbers of the WRITE frames (counted from 0 since the start) that are lost on the way to the board.
+
+    num_write_frames counts the WRITE frames that reached the board, and max_frames_in_flight the most WRITE frames that
+    were sent but not answered yet (the frame just received and those whose replies are still on their way).
+    - emulator.fail_store: Answer the stop command with an EEPROM failure.
+    - emulator.max_reliable_baudrate: Fastest baud rate the line can carry.
+
+    The baud rate the writer set on the pty is compared with the one of the emulated board, so bytes sent at the wrong
+    rate are lost.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, switch_type: str = "switchblox", command_time: float = 0.0, latency: float = 0.0,
+                 framed: bool = True) -> None:
+        """
+        :param switch_type: Type of the emulated switch.
+        :param command_time: Processing time of one command (in seconds).
+        :param latency: Delay until each reply arrives (in seconds).
+        :param framed: Whether the firmware supports the framed protocol (and the read command).
+        """
+        self.emulator = SwitchEmulator(switch_type, framed)
+        self.command_time = command_time
+        self.latency = latency
+        self.drop_replies = 0
+        self.drop_frames: Set[int] = set()
+        self.num_write_frames = 0
+        self.max_frames_in_flight = 0
+        self.device_name: Optional[str] = None
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._baudrate_deadline: Optional[float] = None
+        # replies, when they arrive and whether they answer a WRITE frame
+        self._outgoing: Deque[Tuple[float, bytes, bool]] = collections.deque()
+
+    def __enter__(self) -> 'EmulatedDevice':
+        self.start()
+        return self
+
+    def __exit__(self,
+                 exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.stop()
+
+    def start(self) -> str:
+        """
+        Create the pty and start serving the emulator on it.
+        :return: Path of the serial device.
+        :raise OSError: If no pty can be created (e.g. on Windows).
+        """
+        import tty  # POSIX only
+
+        if self._thread is not None:
+            return self.device_name
+        if not hasattr(os, 'openpty'):
+            raise OSError('Pseudo-terminals are not supported on this platform')
+        self._master, self._slave = os.openpty()
+        # no echo and no line editing until pyserial configures the port (the slave is kept open between sessions)
+        tty.setraw(self._slave)
+        self.device_name = os.ttyname(self._slave)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._serve, name='emulated ' + self.device_name, daemon=True)
+        self._thread.start()
+        return self.device_name
+
+    def stop(self) -> None:
+        """
+        Stop serving and remove the pty. Does nothing if the device is not started.
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self._outgoing.clear()
+        os.close(self._master)
+        os.close(self._slave)
+        self._master = self._slave = None
+
+    def _line_baudrate(self) -> Optional[int]:
+        """
+        :return: The baud rate set on the pty, or None if it is not known.
+        """
+        import termios  # POSIX only
+
+        speed = termios.tcgetattr(self._slave)[5]
+        for name in dir(termios):
+            if name.startswith('B') and name[1:].isdigit() and getattr(termios, name) == speed:
+                return int(name[1:])
+        return None
+
+    def _serve(self) -> None:
+        while not self._stopping.is_set():
+            self._check_baudrate()
+            self._send_due_replies()
+            poll_interval = self.POLL_INTERVAL
+            if len(self._outgoing) > 0:
+                poll_interval = min(max(self._outgoing[0][0] - time.monotonic(), 0.0), poll_interval)
+            readable, _, _ = select.select([self._master], [], [], poll_interval)
+            if len(readable) == 0:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:  # no open slave
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            self.emulator.receive(data, self._line_baudrate())
+            for message in self.emulator.messages():
+                self._reply(message)
+
+    def _send_due_replies(self) -> None:
+        now = time.monotonic()
+        while len(self._outgoing) > 0 and self._outgoing[0][0] <= now:
+            os.write(self._master, self._outgoing.popleft()[1])
+
+    def _check_baudrate(self) -> None:
+        """
+        Return to the previous baud rate if a new one was not confirmed in time, like the firmware.
+        """
+        if self.emulator.baudrate_confirmed:
+            self._baudrate_deadline = None
+        elif self._baudrate_deadline is None:
+            self._baudrate_deadline = time.monotonic() + BAUD_CONFIRM_TIMEOUT
+        elif time.monotonic() > self._baudrate_deadline:
+            self.emulator.revert_baudrate()
+            self._baudrate_deadline = None
+
+    def _reply(self, message: bytes) -> None:
+        is_write_frame = message[0] == FRAME_MAGIC and message[2] == FrameType.WRITE
+        if is_write_frame:
+            self.num_write_frames += 1
+            if self.num_write_frames - 1 in self.drop_frames:
+                return
+            in_flight = 1 + sum(1 for _, _, answers_frame in self._outgoing if answers_frame)
+            self.max_frames_in_flight = max(self.max_frames_in_flight, in_flight)
+        if self.command_time > 0:
+            time.sleep(self.command_time * max(len(message) // COMMAND_SIZE, 1))
+        reply = self.emulator.handle(message)
+        if len(reply) == 0:
+            return
+        confirms_write = message[0] == STOP_COMMAND or is_write_frame
+        if confirms_write and self.drop_replies > 0:
+            self.drop_replies -= 1
+            return
+        if self.latency > 0:
+            # the reply is on its way while the board processes the next messages
+            self._outgoing.append((time.monotonic() + self.latency, reply, is_write_frame))
+        else:
+            os.write(self._master, reply)
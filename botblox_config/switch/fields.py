@@ -1,8 +1,8 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from . import register
 from .port import Port
-from .utils import get_bit, set_bit
+from .utils import get_bit, set_bit, shallow_copy
 
 
 class ConfigField:
@@ -44,6 +44,35 @@ class ConfigField:
         """
         return self._touched
 
+    def _mark_written(self, touch: bool) -> None:
+        """
+        Update the touched flag after the field has been written and let the register know its status changed.
+        :param touch: Whether to set the touched flag.
+        """
+        if touch:
+            self._touched = True
+        self._register.mark_changed()
+
+    def clone(self, memo: Dict[int, object]) -> 'ConfigField':
+        """
+        Create a copy of this field for a copy of its switch chip. The copy is attached to the copy of its register.
+        :param memo: Maps ids of the original registers and fields to their copies. The new copy is added to it.
+        :return: The copy.
+        """
+        other = shallow_copy(self)
+        other._register = memo[id(self._register)]
+        other._register._fields.append(other)
+        memo[id(self)] = other
+        return other
+
+    def _relink(self, memo: Dict[int, object]) -> None:
+        """
+        Replace references to other fields of the original switch chip with their copies. Called on the copy once all
+        fields of the chip have been cloned.
+        :param memo: Maps ids of the original registers and fields to their copies.
+        """
+        pass
+
     def __str__(self) -> str:
         return self.get_name()
 
@@ -90,17 +119,24 @@ class BitField(DirectValueField):
     A field holding a single bit.
     """
     def __init__(self, register: 'register.Register', index: int, default: bool, name: str) -> None:
+        register.check_bit_index(index)
         super().__init__(register, default, name)
         self._index = index
+        # the layout was checked above, so accessors work directly on the register data
+        self._position = register.byte_position(index // 8)
+        self._mask = 1 << (index % 8)
         self.set_value(default, touch=False)
 
     def get_value(self) -> bool:
-        return self._register.get_bit(self._index)
+        return bool(self._register.data[self._position] & self._mask)
 
     def set_value(self, value: bool, touch: bool = True) -> None:
-        self._register.set_bit(self._index, value)
-        if touch:
-            self._touched = True
+        data = self._register.data
+        if value:
+            data[self._position] |= self._mask
+        else:
+            data[self._position] &= ~self._mask
+        self._mark_written(touch)
 
     def __str__(self) -> str:
         return self.get_name() + "=1b'" + ("1" if self.get_value() else "0")
@@ -111,18 +147,37 @@ class BitsField(DirectValueField):
     A field holding a sequence of bits.
     """
     def __init__(self, register: 'register.Register', offset: int, length: int, default: int, name: str) -> None:
+        register.check_bits_spec(offset, length)
         super().__init__(register, default, name)
         self._offset = offset
         self._length = length
+        # the layout was checked above, so accessors work directly on the register data using these precomputed
+        # (byte position, byte mask, shift of the byte data relative to the field value) triples
+        mask = ((1 << length) - 1) << offset
+        self._segments: Tuple[Tuple[int, int, int], ...] = tuple(
+            (register.byte_position(byte_index), (mask >> (8 * byte_index)) & 0xFF, offset - 8 * byte_index)
+            for byte_index in range(offset // 8, (offset + length - 1) // 8 + 1)
+        )
         self.set_value(default, touch=False)
 
     def get_value(self) -> int:
-        return self._register.get_bits(self._offset, self._length)
+        data = self._register.data
+        value = 0
+        for position, byte_mask, shift in self._segments:
+            if shift >= 0:
+                value |= (data[position] & byte_mask) >> shift
+            else:
+                value |= (data[position] & byte_mask) << -shift
+        return value
 
     def set_value(self, value: int, touch: bool = True) -> None:
-        self._register.set_bits(self._offset, self._length, value)
-        if touch:
-            self._touched = True
+        if value >> self._length:
+            raise ValueError("Value {} doesn't fit into a {}-bit field".format(value, self._length))
+        data = self._register.data
+        for position, byte_mask, shift in self._segments:
+            byte_value = (value << shift) if shift >= 0 else (value >> -shift)
+            data[position] = (data[position] & ~byte_mask) | (byte_value & byte_mask)
+        self._mark_written(touch)
 
     def get_bit(self, index: int) -> bool:
         return get_bit(self.get_value(), index)
@@ -139,17 +194,19 @@ class ByteField(DirectValueField):
     A field holding one byte.
     """
     def __init__(self, register: 'register.Register', index: int, default: int, name: str) -> None:
+        register.check_byte_index(index)
         super().__init__(register, default, name)
         self._index = index
         self.set_value(default, touch=False)
 
     def get_value(self) -> int:
-        return self._register.get_byte(self._index)
+        return self._register.data[self._index]
 
     def set_value(self, value: int, touch: bool = True) -> None:
-        self._register.set_byte(self._index, value)
-        if touch:
-            self._touched = True
+        if not 0 <= value <= 255:
+            raise ValueError("Invalid byte value " + str(value))
+        self._register.data[self._index] = value
+        self._mark_written(touch)
 
     def __str__(self) -> str:
         return self.get_name() + "=8h'{0:02X}({0})".format(self.get_value())
@@ -162,18 +219,22 @@ class ShortField(DirectValueField):
     def __init__(self, register: 'register.Register', byte_offset: int, default: int, name: str) -> None:
         if register.num_data_bytes <= 1:
             raise RuntimeError("Register {} cannot hold 16-bit values.".format(register))
+        register.check_byte_index(byte_offset + 1)
         super().__init__(register, default, name)
         self._byte_offset = byte_offset
         self.set_value(default, touch=False)
 
     def get_value(self) -> int:
-        return self._register.get_byte(self._byte_offset) + (self._register.get_byte(self._byte_offset + 1) * 256)
+        data = self._register.data
+        return data[self._byte_offset] | (data[self._byte_offset + 1] << 8)
 
     def set_value(self, value: int, touch: bool = True) -> None:
-        self._register.set_byte(self._byte_offset, value % 256)
-        self._register.set_byte(self._byte_offset + 1, value // 256)
-        if touch:
-            self._touched = True
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError("Value {} doesn't fit into a 16-bit field".format(value))
+        data = self._register.data
+        data[self._byte_offset] = value & 0xFF
+        data[self._byte_offset + 1] = value >> 8
+        self._mark_written(touch)
 
     def __str__(self) -> str:
         return self.get_name() + "=16h'{0:04X}({0})".format(self.get_value())
@@ -197,14 +258,19 @@ class PortListField(ConfigField):
         if ports_default:
             self._ports = dict([(p.id, p) for p in self._all_ports])
 
+    def clone(self, memo: Dict[int, object]) -> 'PortListField':
+        other = super().clone(memo)
+        other._ports = dict(self._ports)
+        return other
+
     def add_port(self, port: Port, touch: bool = True) -> None:
         """
         Add the given port to the list.
         :param port: The port to add.
         :param touch: Whether to set the touched flag.
         """
-        self._touched |= touch
-        if port.id in self._ports:
+        self._mark_written(touch)
+        if self.is_port_set(port):
             return
         self._ports[port.id] = port
         self._add_port(port, touch)
@@ -221,11 +287,11 @@ class PortListField(ConfigField):
         :param port: The port to remove.
         :param touch: Whether to set the touched flag.
         """
-        self._touched |= touch
-        if port.id not in self._ports:
+        self._mark_written(touch)
+        if not self.is_port_set(port):
             return
-        del self._ports[port.id]
-        self._remove_port(port)
+        self._ports.pop(port.id, None)
+        self._remove_port(port, touch)
 
     def _remove_port(self, port: Port, touch: bool = True) -> None:
         """
@@ -250,7 +316,7 @@ class PortListField(ConfigField):
         Remove all ports from the list.
         :param touch: Whether to set the touched flag.
         """
-        self._touched |= touch
+        self._mark_written(touch)
         self._ports.clear()
         self._clear(touch)
 
@@ -278,14 +344,14 @@ class PortListField(ConfigField):
         """
         :return: Whether this field has its default value.
         """
-        return (len(self._ports) > 0) == self._ports_default
+        return (len(self.get_ports()) > 0) == self._ports_default
 
     def set_default(self, touch: bool = True) -> None:
         """
         Set this field to its default value.
         :param touch: Whether to set the touched flag.
         """
-        self._touched |= touch
+        self._mark_written(touch)
         if self._ports_default:
             self._ports = dict([(p.id, p) for p in self._all_ports])
             for p in self._all_ports:
@@ -296,4 +362,4 @@ class PortListField(ConfigField):
                 self._remove_port(p, touch)
 
     def __str__(self) -> str:
-        return self.get_name() + "=Ports[{}]".format(",".join([p.name for p in self._ports.values()]))
+        return self.get_name() + "=Ports[{}]".format(",".join([p.name for p in self.get_ports()]))
@@ -1,72 +1,47 @@
-from typing import List, Optional, Type
+from typing import Dict, List, Optional, Type
 
-from .config_writer import ConfigWriter, UARTWriter
-from .fields import BitField, BitsField, ByteField, PortListField, ShortField
+from .chip_description import load_layout
+from .commands import CommandBuffer
+from .config_reader import ConfigReader, UARTReader
+from .config_writer import AsyncConfigWriter, AsyncUARTWriter, ConfigWriter, UARTWriter
+from .fields import ByteField, PortListField
 from .port import Port
 from .register import MIIRegister, MIIRegisterAddress
 from .switch import SwitchChip, SwitchFeature
 
 
-class IP175G(SwitchChip[MIIRegisterAddress, MIIRegister, List[List[int]]]):
+class IP175G(SwitchChip[MIIRegisterAddress, MIIRegister, CommandBuffer]):
     """The Microchip IP175G chip used in Switchblox and Switchblox Nano."""
 
     def __init__(self, nano: bool = False) -> None:
-        self._nano = nano
+        self._layout = load_layout("ip175g", "nano" if nano else "switchblox")
         super().__init__()
 
     def name(self) -> str:
-        return "Switchblox Nano" if self._nano else "Switchblox"
+        return self._layout.name
 
     def _get_config_writer_type(self) -> Type[ConfigWriter]:
         return UARTWriter
 
+    def _get_config_reader_type(self) -> Type[ConfigReader]:
+        return UARTReader
+
+    def _get_async_config_writer_type(self) -> Type[AsyncConfigWriter]:
+        return AsyncUARTWriter
+
     def _init_features(self) -> None:
-        self._features = {
-            SwitchFeature.TAGGED_VLAN,
-            SwitchFeature.VLAN_TABLE,
-            SwitchFeature.VLAN_MODE_OPTIONAL,
-            SwitchFeature.VLAN_MODE_ENABLE,
-            SwitchFeature.VLAN_MODE_STRICT,
-            SwitchFeature.VLAN_FORCE,
-            SwitchFeature.PER_PORT_VLAN_MODE,
-            SwitchFeature.PER_PORT_VLAN_MODE_DISABLE,
-            SwitchFeature.PER_PORT_VLAN_MODE_OPTIONAL,
-            SwitchFeature.PER_PORT_VLAN_MODE_ENABLE,
-            SwitchFeature.PER_PORT_VLAN_MODE_STRICT,
-            SwitchFeature.PER_PORT_VLAN_FORCE,
-            SwitchFeature.PER_PORT_VLAN_HEADER_ACTION,
-        }
+        self._features = set([SwitchFeature[feature] for feature in self._layout.features])
 
     def _init_ports(self) -> None:
-        self._ports.append(Port("1", 2))
-        self._ports.append(Port("2", 3))
-        self._ports.append(Port("3", 4))
-        if not self._nano:
-            self._ports.append(Port("4", 6))
-            self._ports.append(Port("5", 7))
+        self._ports = [Port(port.name, port.bit) for port in self._layout.ports]
 
     def _init_registers(self) -> None:
-        self._add_register(MIIRegister(23, 0))
-        self._add_register(MIIRegister(23, 1))
-        self._add_register(MIIRegister(23, 2))
-
-        self._add_register(MIIRegister(23, 7))
-        self._add_register(MIIRegister(23, 8))
-        self._add_register(MIIRegister(23, 9))
-        if not self._nano:
-            self._add_register(MIIRegister(23, 11))
-            self._add_register(MIIRegister(23, 12))
-
-        self._add_register(MIIRegister(23, 13))
-        self._add_register(MIIRegister(23, 14))
-
-        self._add_register(MIIRegister(23, 19))
-
-        for i in range(25):
-            self._add_register(MIIRegister(24, i))
+        for phy, mii in self._layout.registers:
+            self._add_register(MIIRegister(phy, mii))
 
     def _init_fields(self) -> None:
-        # Example values of the VLAN-related registries
+        # The registers and fields are described in descriptions/ip175g.json. Example values of the VLAN-related
+        # registries:
         # [23, 0, 0, 0],  # [-, VLAN_TABLE_CLR=128|UNVID_MODE=32]  # !UNVID_MODE=VLAN mode->enabled
         # [23, 1, 255, 0],  # [TAG_VLAN_EN=0, VLAN_CLS=0]  # VLAN_CLS=Force VLAN ID
         # [23, 2, 255, 0b00000100],  # [VLAN_INGRESS_FILTER=FF, 0b000, RSVD_VID=0b001, ACCEPTABLE_FRM_TYPE=0b00]
@@ -80,50 +55,26 @@ class IP175G(SwitchChip[MIIRegisterAddress, MIIRegister, List[List[int]]]):
         # [24, 2, 1, 0],  # VID_1=2
         # [24, 17, 0b10001000, 255],  # [VLAN_MEMBER_0=FF, VLAN_MEMBER_1=FF]
 
-        Addr = MIIRegisterAddress  # noqa: N806
-
-        self._add_field(BitField(self._registers[Addr(23, 0)], 13, False, 'UNVID_MODE'))
-        self._add_field(BitField(self._registers[Addr(23, 0)], 15, False, 'VLAN_TABLE_CLR'))
-
-        self._add_field(self._create_port_list_field(self._registers[Addr(23, 1)], 1, False, 'VLAN_CLS'))
-        self._add_field(self._create_port_list_field(self._registers[Addr(23, 1)], 0, False, "TAG_VLAN_EN"))
-
-        self._add_field(BitField(self._registers[Addr(23, 2)], 13, False, 'VLAN_DROP_CFI'))
-        self._add_field(BitField(self._registers[Addr(23, 2)], 12, False, 'RSVD_VID_2'))
-        self._add_field(BitField(self._registers[Addr(23, 2)], 11, False, 'RSVD_VID_1'))
-        self._add_field(BitField(self._registers[Addr(23, 2)], 10, True, 'RSVD_VID_0'))
-        self._add_field(BitsField(self._registers[Addr(23, 2)], 8, 2, 0, 'ACCEPTABLE_FRM_TYPE'))
-        self._add_field(self._create_port_list_field(self._registers[Addr(23, 2)], 0, True, "VLAN_INGRESS_FILTER"))
+        for spec in self._layout.fields:
+            register = self._registers[MIIRegisterAddress(*spec.register)]
+            self._add_field(self._create_field(register, spec))
 
-        self._add_field(ShortField(self._registers[Addr(23, 7)], 0, 1, 'VLAN_INFO_0'))
-        self._add_field(ShortField(self._registers[Addr(23, 8)], 0, 1, 'VLAN_INFO_1'))
-        self._add_field(ShortField(self._registers[Addr(23, 9)], 0, 1, 'VLAN_INFO_2'))
-        if not self._nano:
-            self._add_field(ShortField(self._registers[Addr(23, 11)], 0, 1, 'VLAN_INFO_3'))
-            self._add_field(ShortField(self._registers[Addr(23, 12)], 0, 1, 'VLAN_INFO_4'))
-
-        self._add_field(self._create_port_list_field(self._registers[Addr(23, 13)], 0, False, "ADD_TAG"))
-        self._add_field(self._create_port_list_field(self._registers[Addr(23, 14)], 0, False, "REMOVE_TAG"))
-
-        self._add_field(BitField(self._registers[Addr(23, 19)], 2, False, 'LEAKY_VLAN_2'))
-        self._add_field(BitField(self._registers[Addr(23, 19)], 1, False, 'LEAKY_VLAN_1'))
-        self._add_field(BitField(self._registers[Addr(23, 19)], 0, False, 'LEAKY_VLAN_0'))
-
-        self._add_field(BitsField(self._registers[Addr(24, 0)], 0, 16, 0, 'VLAN_VALID'))
+    class IP175GPortListField(PortListField):
+        def __init__(self, register: MIIRegister, index: int, ports: List[Port], ports_default: bool, name: str,
+                     raw_default: Optional[int] = None) -> None:
+            super().__init__(register, ports, ports_default, name)
+            if raw_default is None:
+                raw_default = 255 if ports_default else 0
+            self._base_field = ByteField(register, index, raw_default, name)
 
-        for i in range(16):
-            self._add_field(BitsField(self._registers[Addr(24, i + 1)], 0, 12, i + 1, 'VID_{:1X}'.format(i)))
+        def _relink(self, memo: Dict[int, object]) -> None:
+            self._base_field = memo[id(self._base_field)]
 
-        for i in range(16):
-            self._add_field(self._create_port_list_field(self._registers[Addr(24, 17 + (i // 2))], i % 2, True,
-                                                         "VLAN_MEMBER_{:1X}".format(i)))
+        def is_port_set(self, port: Port) -> bool:
+            return bool(self._base_field.get_value() & (1 << port.id))
 
-    class IP175GPortListField(PortListField):
-        def __init__(self, register: MIIRegister, index: int, ports: List[Port], ports_default: bool, name: str) \
-                -> None:
-            super().__init__(register, ports, ports_default, name)
-            self._base_field = ByteField(register, index, 255 if ports_default else 0, name)
-            self._ports = ports if ports_default else list()
+        def get_ports(self) -> List[Port]:
+            return [p for p in self._all_ports if self.is_port_set(p)]
 
         def _add_port(self, port: Port, touch: bool = True) -> None:
             value = self._base_field.get_value()
@@ -138,9 +89,14 @@ class IP175G(SwitchChip[MIIRegisterAddress, MIIRegister, List[List[int]]]):
         def _clear(self, touch: bool = True) -> None:
             self._base_field.set_value(0, touch)
 
-    def _create_port_list_field(self, register: MIIRegister, index: int, ports_default: bool, name: str) \
-            -> PortListField:
-        return IP175G.IP175GPortListField(register, index, self._ports, ports_default, name)
+        def set_default(self, touch: bool = True) -> None:
+            # restores also the bits that don't belong to any port
+            self._mark_written(touch)
+            self._base_field.set_default(touch)
+
+    def _create_port_list_field(self, register: MIIRegister, index: int, ports_default: bool, name: str,
+                                raw_default: Optional[int] = None) -> PortListField:
+        return IP175G.IP175GPortListField(register, index, self._ports, ports_default, name, raw_default)
 
     def register_to_command(self, register: MIIRegister, leave_out_default: bool = True) -> Optional[List[int]]:
         """
@@ -153,11 +109,9 @@ class IP175G(SwitchChip[MIIRegisterAddress, MIIRegister, List[List[int]]]):
             return None
         return [register.address.phy, register.address.mii] + register.as_bytes()
 
-    def get_commands(self, leave_out_default: bool = True, only_touched: bool = False) -> List[List[int]]:
-        result = list()
-        for r in self._registers.values():
-            cmd = self.register_to_command(r, leave_out_default)
-            if cmd is not None and (not only_touched or r.is_touched()):
-                result.append(cmd)
+    def get_commands(self, leave_out_default: bool = True, only_touched: bool = False) -> CommandBuffer:
+        result = CommandBuffer()
+        for register in self.select_registers(leave_out_default, only_touched):
+            result.add(register.address.phy, register.address.mii, register.data)
         result.sort()
         return result
@@ -0,0 +1,340 @@
+"""
+Framed protocol spoken with boards whose firmware supports it.
+
+The original protocol streams bare 4-byte commands [phy, mii, low byte, high byte], terminated by the stop command,
+which the board answers with a single condition byte. Since the board cannot tell where a command stream ends before
+the stop command arrives and has no way to detect corrupted bytes, the host has to pace the commands.
+
+A frame carries many register writes at once and is protected by a CRC:
+
+    magic (0xB5) | version | type | sequence | payload length (2 bytes) | payload | CRC-16 (2 bytes)
+
+Multi-byte numbers are little-endian. The CRC (CRC-16/CCITT-FALSE) covers everything between the magic byte and the
+CRC. The magic byte is not a valid PHY address nor a command code, so frames and legacy commands can be mixed on the
+same line.
+
+Capabilities are negotiated with the hello command [HELLO_COMMAND, version, 0, 0], sent in the legacy format. A board
+supporting frames answers with a CAPABILITIES frame; a board with older firmware does not answer, and the host falls
+back to the legacy format.
+
+A push is sent as WRITE frames carrying the register writes, followed by a WRITE frame with the store flag once all of
+them are acknowledged. Each WRITE frame is answered by a STATUS frame with the same sequence number. The host may send
+as many frames as the window in the capabilities of the board before it waits for their answers, and repeats only the
+frames that were not acknowledged. The board collects the writes of the frames by sequence number (a repeated frame
+replaces the first copy) and applies them in sequence order when it stores them.
+
+The capabilities also list the baud rates the board supports. The host can switch the line to one of them for the
+rest of the session with a SET_BAUD frame, which the board confirms at the old rate before it switches. The host then
+switches too and sends the hello command at the new rate. If the board does not receive it within
+BAUD_CONFIRM_TIMEOUT, it returns to the old rate, so that both ends can fall back when the line is not reliable at
+the new rate.
+"""
+
+import binascii
+import struct
+from enum import IntEnum
+from typing import List, Optional, Sequence, Tuple
+
+from .commands import COMMAND_SIZE, CommandBuffer, CommandsLike
+
+PROTOCOL_VERSION = 1
+
+FRAME_MAGIC = 0xB5
+HEADER_SIZE = 6  # magic, version, type, sequence, payload length
+CRC_SIZE = 2
+MAX_PAYLOAD = 0xFFFF
+MAX_WINDOW = 64  # well below half of the sequence numbers, so that late answers cannot be mistaken for new ones
+
+# [HELLO_COMMAND, version, 0, 0] asks the board for its capabilities
+HELLO_COMMAND = 103
+
+# how long the board waits for the hello command at a new baud rate before it returns to the old one (in seconds)
+BAUD_CONFIRM_TIMEOUT = 0.2
+
+# flags of a WRITE frame
+FLAG_ERASE = 0x01  # erase the EEPROM before the writes of the frame
+FLAG_STORE = 0x02  # apply all writes received so far and store them in the EEPROM (like the stop command)
+
+# board types reported in the capabilities
+BOARD_TYPES = {
+    1: 'switchblox',
+    2: 'switchblox_nano',
+}
+
+
+class FrameType(IntEnum):
+    CAPABILITIES = 1  # board -> host, answers the hello command
+    WRITE = 2  # host -> board, flags byte followed by register write commands
+    STATUS = 3  # board -> host, answers a WRITE or SET_BAUD frame
+    SET_BAUD = 4  # host -> board, the new baud rate (4 bytes)
+
+
+class Status(IntEnum):
+    """
+    Status answering a WRITE frame. The first two values are the condition bytes of the legacy protocol.
+    """
+    OK = 1
+    EEPROM_FAILURE = 2
+    CRC_ERROR = 3
+    BAD_FRAME = 4
+
+
+def crc16(data: bytes) -> int:
+    """
+    :param data: The data.
+    :return: CRC-16/CCITT-FALSE of the data.
+    """
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+class Frame:
+    """
+    A decoded frame.
+    """
+    __slots__ = ('type', 'seq', 'payload', 'version')
+
+    def __init__(self, frame_type: int, payload: bytes = b'', seq: int = 0, version: int = PROTOCOL_VERSION) -> None:
+        """
+        :param frame_type: Type of the frame (FrameType, unknown types are kept as ints).
+        :param payload: The payload.
+        :param seq: Sequence number (0-255).
+        :param version: Protocol version the frame was encoded with.
+        """
+        self.type = frame_type
+        self.payload = bytes(payload)
+        self.seq = seq
+        self.version = version
+
+    def encode(self) -> bytes:
+        """
+        :return: The frame as it is sent over the line.
+        :raise ValueError: If the payload is too long.
+        """
+        if len(self.payload) > MAX_PAYLOAD:
+            raise ValueError('Frame payload has {} bytes, maximum is {}'.format(len(self.payload), MAX_PAYLOAD))
+        body = struct.pack('<BBBH', self.version, self.type, self.seq & 0xFF, len(self.payload)) + self.payload
+        return bytes([FRAME_MAGIC]) + body + struct.pack('<H', crc16(body))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Frame):
+            return NotImplemented
+        return (self.type, self.seq, self.payload, self.version) == (other.type, other.seq, other.payload,
+                                                                     other.version)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return 'Frame(type={}, seq={}, payload={!r})'.format(self.type, self.seq, self.payload)
+
+
+def frame_size(header: bytes) -> Optional[int]:
+    """
+    :param header: The first bytes of a frame.
+    :return: Size of the whole frame, or None if the header is not complete.
+    """
+    if len(header) < HEADER_SIZE:
+        return None
+    return HEADER_SIZE + struct.unpack_from('<H', header, 4)[0] + CRC_SIZE
+
+
+def decode_frame(data: bytes) -> Frame:
+    """
+    :param data: One complete frame.
+    :return: The decoded frame.
+    :raise ValueError: If the data is not a frame or its CRC does not match.
+    """
+    size = frame_size(data)
+    if len(data) == 0 or data[0] != FRAME_MAGIC or size is None or size != len(data):
+        raise ValueError('Not a frame: {}'.format(bytes(data[:HEADER_SIZE]).hex()))
+    body = bytes(data[1:-CRC_SIZE])
+    if crc16(body) != struct.unpack_from('<H', data, len(data) - CRC_SIZE)[0]:
+        raise ValueError('CRC of frame does not match')
+    version, frame_type, seq, _ = struct.unpack_from('<BBBH', body)
+    return Frame(frame_type, body[HEADER_SIZE - 1:], seq, version)
+
+
+class FrameDecoder:
+    """
+    Incremental decoder of frames received from a byte stream. Bytes that are not part of a frame are skipped, and
+    frames with a wrong CRC are dropped (and counted).
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self.num_crc_errors = 0
+
+    def feed(self, data: bytes) -> List[Frame]:
+        """
+        :param data: Received bytes.
+        :return: Frames completed by the bytes.
+        """
+        self._buffer += data
+        frames = list()
+        while True:
+            start = self._buffer.find(FRAME_MAGIC)
+            if start < 0:
+                self._buffer.clear()
+                break
+            del self._buffer[:start]
+            size = frame_size(self._buffer)
+            if size is None or len(self._buffer) < size:
+                break
+            try:
+                frames.append(decode_frame(bytes(self._buffer[:size])))
+            except ValueError:
+                # a corrupted frame, or a magic byte that is not the start of a frame: resynchronize after it
+                self.num_crc_errors += 1
+                del self._buffer[:1]
+                continue
+            del self._buffer[:size]
+        return frames
+
+
+class Capabilities:
+    """
+    What the firmware of a board supports, as reported in its CAPABILITIES frame.
+    """
+    _FORMAT = '<BBH'  # followed by the number of baud rates, the rates (4 bytes each) and the window
+
+    def __init__(self, version: int, board: int, max_payload: int, baudrates: Sequence[int] = (),
+                 window: int = 1) -> None:
+        """
+        :param version: Highest protocol version supported by the board.
+        :param board: Type of the board (see BOARD_TYPES).
+        :param max_payload: Maximum payload of a frame the board accepts.
+        :param baudrates: Baud rates the board can switch to.
+        :param window: Number of WRITE frames the board can receive before it answers them (1 to MAX_WINDOW).
+        """
+        self.version = version
+        self.board = board
+        self.max_payload = max_payload
+        self.baudrates = tuple(baudrates)
+        self.window = min(max(window, 1), MAX_WINDOW)
+
+    @property
+    def switch_type(self) -> Optional[str]:
+        """
+        :return: Switch type of the board, or None if the board type is unknown.
+        """
+        return BOARD_TYPES.get(self.board)
+
+    def encode(self) -> bytes:
+        """
+        :return: Payload of the CAPABILITIES frame.
+        """
+        return struct.pack(self._FORMAT, self.version, self.board, self.max_payload) + bytes([len(self.baudrates)]) \
+            + b''.join(struct.pack('<I', rate) for rate in self.baudrates) + bytes([self.window])
+
+    @classmethod
+    def decode(cls: 'Capabilities', payload: bytes) -> 'Capabilities':
+        """
+        :param payload: Payload of a CAPABILITIES frame. Bytes added by newer firmware are ignored.
+        :return: The capabilities.
+        :raise ValueError: If the payload is too short.
+        """
+        size = struct.calcsize(cls._FORMAT)
+        if len(payload) < size:
+            raise ValueError('Capabilities have {} bytes, expected at least {}'.format(len(payload), size))
+        baudrates: Tuple[int, ...] = ()
+        window = 1
+        if len(payload) > size:  # added in firmware supporting baud rate negotiation
+            count = payload[size]
+            size += 1 + 4 * count
+            if len(payload) < size:
+                raise ValueError('Capabilities list {} baud rates, but do not contain them'.format(count))
+            baudrates = struct.unpack_from('<{}I'.format(count), payload, size - 4 * count)
+        if len(payload) > size:  # added in firmware supporting windowed writes
+            window = payload[size]
+        return cls(*struct.unpack_from(cls._FORMAT, payload), baudrates=baudrates, window=window)
+
+    def __repr__(self) -> str:
+        return 'Capabilities(version={}, board={}, max_payload={}, baudrates={}, window={})'.format(
+            self.version, self.board, self.max_payload, list(self.baudrates), self.window)
+
+
+def board_type(switch_type: str) -> int:
+    """
+    :param switch_type: Type of the switch.
+    :return: The board type reported by boards with this switch (see BOARD_TYPES).
+    :raise ValueError: If the switch type is unknown.
+    """
+    from .all import get_switch_class  # the switch classes import the writers, which import this module
+
+    switch_class = get_switch_class(switch_type)
+    for board, name in BOARD_TYPES.items():
+        if get_switch_class(name) is switch_class:
+            return board
+    raise ValueError("Switch type '{}' has no board type".format(switch_type))
+
+
+def hello_command() -> bytes:
+    """
+    :return: The hello command asking the board for its capabilities.
+    """
+    return bytes([HELLO_COMMAND, PROTOCOL_VERSION, 0, 0])
+
+
+def encode_baudrate(baudrate: int) -> bytes:
+    """
+    :param baudrate: The new baud rate.
+    :return: Payload of a SET_BAUD frame.
+    """
+    return struct.pack('<I', baudrate)
+
+
+def decode_baudrate(payload: bytes) -> int:
+    """
+    :param payload: Payload of a SET_BAUD frame.
+    :return: The new baud rate.
+    :raise ValueError: If the payload is not a baud rate.
+    """
+    if len(payload) != 4:
+        raise ValueError('SET_BAUD frame has {} bytes, expected 4'.format(len(payload)))
+    return struct.unpack('<I', payload)[0]
+
+
+def encode_write(commands: CommandsLike, erase: bool = False, store: bool = True) -> bytes:
+    """
+    :param commands: Register write commands (without stop and erase commands).
+    :param erase: Whether the board should erase its EEPROM first.
+    :param store: Whether the board should apply and store the writes.
+    :return: Payload of a WRITE frame.
+    """
+    commands = commands if isinstance(commands, CommandBuffer) else CommandBuffer(commands)
+    return bytes([(FLAG_ERASE if erase else 0) | (FLAG_STORE if store else 0)]) + commands.tobytes()
+
+
+def decode_write(payload: bytes) -> Tuple[int, CommandBuffer]:
+    """
+    :param payload: Payload of a WRITE frame.
+    :return: The flags and the register write commands.
+    :raise ValueError: If the payload is not a flags byte followed by whole commands.
+    """
+    if len(payload) == 0:
+        raise ValueError('WRITE frame without flags')
+    return payload[0], CommandBuffer(payload[1:])
+
+
+def write_frames(commands: CommandsLike, erase: bool, max_payload: int, seq: int = 0,
+                 store: bool = True) -> List[Frame]:
+    """
+    Split register writes into WRITE frames of at most max_payload bytes. Only the last frame stores the writes.
+    :param commands: Register write commands (without stop and erase commands).
+    :param erase: Whether the board should erase its EEPROM first.
+    :param max_payload: Maximum payload of a frame accepted by the board.
+    :param seq: Sequence number of the first frame.
+    :param store: Whether the last frame stores the writes.
+    :return: The frames.
+    :raise ValueError: If not even one command fits into a frame.
+    """
+    commands = commands if isinstance(commands, CommandBuffer) else CommandBuffer(commands)
+    per_frame = (min(max_payload, MAX_PAYLOAD) - 1) // COMMAND_SIZE
+    if per_frame < 1:
+        raise ValueError('Frames of {} bytes cannot carry any command'.format(max_payload))
+    frames = list()
+    for start in range(0, max(len(commands), 1), per_frame):
+        chunk = commands[start:start + per_frame]
+        last = start + per_frame >= len(commands)
+        payload = encode_write(chunk, erase=erase and start == 0, store=store and last)
+        frames.append(Frame(FrameType.WRITE, payload, (seq + len(frames)) & 0xFF))
+    return frames
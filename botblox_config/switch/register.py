@@ -1,8 +1,8 @@
 from enum import Enum
-from typing import Generic, List, TypeVar
+from typing import Callable, Generic, List, Optional, TypeVar, Union
 
 from . import fields
-from .utils import get_bit, set_bit
+from .utils import get_bit, set_bit, shallow_copy
 
 
 class RegisterAddress:
@@ -66,8 +66,44 @@ class Register(Generic[AddressType]):
         self.address = address
         self.num_data_bytes = num_data_bytes
         self.byte_order = byte_order
-        self.data: bytearray = bytearray(num_data_bytes)  # lowest byte first
+        self.data: Union[bytearray, memoryview] = bytearray(num_data_bytes)  # lowest byte first
         self._fields = list()
+        # cached default/touched status of the fields, recomputed lazily after a change
+        self._status_valid = True
+        self._default = True
+        self._touched = False
+        self._change_listener: Optional[Callable[['Register'], None]] = None
+
+    def bind(self, buffer: memoryview) -> None:
+        """
+        Make the register a view into the given buffer (e.g. the register image of the whole switch chip).
+        The current value of the register is copied into the buffer.
+        :param buffer: The buffer. It has to be exactly num_data_bytes long.
+        :raise ValueError: If the buffer has a wrong size.
+        """
+        if len(buffer) != self.num_data_bytes:
+            raise ValueError("Register needs a {}-byte buffer, got {} bytes".format(self.num_data_bytes, len(buffer)))
+        buffer[:] = self.data
+        self.data = buffer
+
+    def clone(self, buffer: memoryview) -> 'Register':
+        """
+        Create a copy of this register without any fields attached, backed by the given buffer.
+        :param buffer: Buffer of the copy. It has to hold the same data as this register already.
+        :return: The copy.
+        """
+        other = shallow_copy(self)
+        other.data = buffer
+        other._fields = list()
+        other._change_listener = None
+        return other
+
+    def byte_position(self, index: int) -> int:
+        """
+        :param index: Index of a byte counted from the least significant byte.
+        :return: Position of the byte in self.data.
+        """
+        return index if self.byte_order == ByteOrder.LITTLE_ENDIAN else self.num_data_bytes - 1 - index
 
     def check_byte_index(self, index: int) -> None:
         """
@@ -131,6 +167,7 @@ class Register(Generic[AddressType]):
         if value > 255:
             raise ValueError("Invalid byte value " + str(value))
         self.data[index] = value
+        self.mark_changed()
 
     def get_bit(self, index: int) -> bool:
         """
@@ -153,6 +190,7 @@ class Register(Generic[AddressType]):
         byte_index = index // 8
         bit_offset = index % 8
         self.data[byte_index] = set_bit(self.data[byte_index], bit_offset, value)
+        self.mark_changed()
 
     def get_bits(self, offset: int, length: int) -> int:
         """
@@ -162,9 +200,7 @@ class Register(Generic[AddressType]):
         :return: Value of the bits.
         """
         self.check_bits_spec(offset, length)
-        num = self.as_number()
-        mask = (pow(2, length) - 1) << offset
-        return (num & mask) >> offset
+        return (self.as_number() >> offset) & ((1 << length) - 1)
 
     def set_bits(self, offset: int, length: int, value: int) -> None:
         """
@@ -175,13 +211,17 @@ class Register(Generic[AddressType]):
         :raise ValueError: If value is too big to fit into length bits.
         """
         self.check_bits_spec(offset, length)
-        if value >= pow(2, length):
+        if value >> length:
             raise ValueError("Value {} doesn't fit into a {}-bit field".format(value, length))
-        num = self.as_number(signed=False)
-        mask = (pow(2, length) - 1) << offset
-        num &= ~mask  # zero out bits
-        num += (value << offset)
-        self.data = bytearray(num.to_bytes(len(self.data), byteorder=self.byte_order.value, signed=False))
+        mask = ((1 << length) - 1) << offset
+        value <<= offset
+        # update only the affected bytes, in place
+        for byte_index in range(offset // 8, (offset + length - 1) // 8 + 1):
+            shift = 8 * byte_index
+            byte_mask = (mask >> shift) & 0xFF
+            position = self.byte_position(byte_index)
+            self.data[position] = (self.data[position] & ~byte_mask) | ((value >> shift) & byte_mask)
+        self.mark_changed()
 
     def add_field(self, field: 'fields.ConfigField') -> None:
         """
@@ -189,24 +229,46 @@ class Register(Generic[AddressType]):
         :param field: The field to add.
         """
         self._fields.append(field)
+        self.mark_changed()
+
+    def set_change_listener(self, listener: Optional[Callable[['Register'], None]]) -> None:
+        """
+        Set the function to call when the register (or any of its fields) is changed after its status was computed.
+        :param listener: The function, it gets this register as argument.
+        """
+        self._change_listener = listener
+
+    def mark_changed(self) -> None:
+        """
+        Invalidate the cached default/touched status. Has to be called after the register data or a field changed.
+        """
+        if self._status_valid:
+            self._status_valid = False
+            if self._change_listener is not None:
+                self._change_listener(self)
+
+    def _update_status(self) -> None:
+        """
+        Recompute the cached default/touched status if it is not valid.
+        """
+        if not self._status_valid:
+            self._default = all([field.is_default() for field in self._fields])
+            self._touched = any([field.is_touched() for field in self._fields])
+            self._status_valid = True
 
     def is_default(self) -> bool:
         """
         :return: Whether the register has its default value.
         """
-        for field in self._fields:
-            if not field.is_default():
-                return False
-        return True
+        self._update_status()
+        return self._default
 
     def is_touched(self) -> bool:
         """
         :return: Whether any bit in this register has been touched.
         """
-        for field in self._fields:
-            if field.is_touched():
-                return True
-        return False
+        self._update_status()
+        return self._touched
 
 
 class MIIRegister(Register[MIIRegisterAddress]):
@@ -1,10 +1,15 @@
+import hashlib
+import threading
 from enum import Enum
-from typing import AnyStr, Dict, Generic, Iterable, List, Set, Type, TypeVar
+from typing import Any, AnyStr, Dict, Generic, Iterable, List, Optional, Set, Type, TypeVar, Union
 
-from .config_writer import ConfigWriter, TestWriter
-from .fields import ConfigField
+from .chip_description import FieldSpec
+from .config_reader import ConfigReader, TestReader
+from .config_writer import AsyncConfigWriter, AsyncTestWriter, ConfigWriter, TestWriter
+from .fields import BitField, BitsField, ByteField, ConfigField, ShortField
 from .port import Port
 from .register import Register, RegisterAddress
+from .utils import shallow_copy
 
 
 class SwitchFeature(Enum):
@@ -23,11 +28,18 @@ class SwitchFeature(Enum):
     PER_PORT_VLAN_FORCE = "per-port force VLAN ID"
     PER_PORT_VLAN_HEADER_ACTION = "per-port VLAN header action"
     PER_VLAN_HEADER_ACTION = "VLAN header action per port and VLAN"
+    PORT_BASED_VLAN = "port-based VLAN"
+    PORT_MIRROR = "port mirroring"
 
 
 RegisterAddressType = TypeVar('RegisterAddressType', bound=RegisterAddress)
 RegisterType = TypeVar('RegisterType', bound=Register)
 CommandType = TypeVar('CommandType')
+SwitchChipType = TypeVar('SwitchChipType', bound='SwitchChip')
+
+# default-state instance of each switch class, used as the template for create()
+_templates: Dict[type, 'SwitchChip'] = dict()
+_templates_lock = threading.Lock()
 
 
 class SwitchChip(Generic[RegisterAddressType, RegisterType, CommandType]):
@@ -38,16 +50,76 @@ class SwitchChip(Generic[RegisterAddressType, RegisterType, CommandType]):
         self._features: Set[SwitchFeature] = set()
         self._ports: List[Port] = list()
         self._registers: Dict[RegisterAddressType, RegisterType] = dict()
+        self._register_offsets: Dict[RegisterAddressType, int] = dict()
+        self._image = bytearray()
         self.fields: Dict[str, ConfigField] = dict()
 
+        # incrementally maintained default/touched status of registers
+        self._changed_registers: Set[RegisterAddressType] = set()
+        self._touched_registers: Set[RegisterAddressType] = set()
+        self._non_default_registers: Set[RegisterAddressType] = set()
+
         self._init_features()
         self._init_ports()
         self._init_registers()
+        self._init_image()
         self._init_fields()
 
         for field in self.fields.values():
             field.set_default(touch=False)
 
+    @classmethod
+    def create(cls: Type[SwitchChipType]) -> SwitchChipType:
+        """
+        Return a new instance of the switch in its default state.
+
+        The ports, registers and fields are built only once per class. Every call copies the register image of that
+        template instead of running the whole initialization again.
+        :return: The switch instance.
+        """
+        template = _templates.get(cls)
+        if template is None:
+            with _templates_lock:
+                template = _templates.get(cls)
+                if template is None:
+                    template = cls()
+                    template.select_registers()  # compute the register status once, the copies inherit it
+                    _templates[cls] = template
+        return template.clone()
+
+    def clone(self: SwitchChipType) -> SwitchChipType:
+        """
+        Create an independent copy of this switch including the values and touched flags of all fields.
+
+        Features, ports and the register layout are immutable after initialization and are shared with the copy.
+        :return: The copy.
+        """
+        other = shallow_copy(self)
+        other._image = bytearray(self._image)
+        view = memoryview(other._image)
+
+        memo: Dict[int, object] = dict()
+        other._registers = dict()
+        for address, register in self._registers.items():
+            offset = self._register_offsets[address]
+            register_copy = register.clone(view[offset:offset + register.num_data_bytes])
+            register_copy.set_change_listener(other._on_register_changed)
+            other._registers[address] = register_copy
+            memo[id(register)] = register_copy
+
+        field_copies = list()
+        for register in self._registers.values():
+            for field in register._fields:
+                field_copies.append(field.clone(memo))
+        for field in field_copies:
+            field._relink(memo)
+        other.fields = dict([(name, memo[id(field)]) for name, field in self.fields.items()])
+
+        other._changed_registers = set(self._changed_registers)
+        other._touched_registers = set(self._touched_registers)
+        other._non_default_registers = set(self._non_default_registers)
+        return other
+
     def name(self) -> str:
         """
         Return a user-friendly name of the chip.
@@ -118,16 +190,52 @@ class SwitchChip(Generic[RegisterAddressType, RegisterType, CommandType]):
         """
         raise NotImplementedError()
 
-    def get_config_writer(self, device_name: str) -> ConfigWriter:
+    def get_config_writer(self, device_name: str, **settings: Any) -> ConfigWriter:
         """
         Return an instance of config writer for this switch.
         :param device_name: Name of the config writer device to use.
+        :param settings: Settings of the config writer (e.g. those of UARTSettings). Ignored by the "test" device.
         :return: The config writer.
-        :raises ValueError: If the passed device is not valid.
+        :raises ValueError: If the passed device or settings are not valid.
         """
         if device_name == "test":
             return TestWriter(device_name)
-        return self._get_config_writer_type()(device_name)
+        return self._get_config_writer_type()(device_name, **settings)
+
+    def _get_config_reader_type(self) -> Type[ConfigReader]:
+        """
+        :return: Type of the config reader.
+        """
+        raise NotImplementedError()
+
+    def get_config_reader(self, device_name: str) -> ConfigReader:
+        """
+        Return an instance of config reader for this switch.
+        :param device_name: Name of the device to read the configuration from.
+        :return: The config reader.
+        :raises ValueError: If the passed device is not valid.
+        """
+        if device_name == "test":
+            return TestReader(device_name)
+        return self._get_config_reader_type()(device_name)
+
+    def _get_async_config_writer_type(self) -> Type[AsyncConfigWriter]:
+        """
+        :return: Type of the asynchronous config writer.
+        """
+        raise NotImplementedError()
+
+    def get_async_config_writer(self, device_name: str, **settings: Any) -> AsyncConfigWriter:
+        """
+        Return an instance of asynchronous config writer for this switch.
+        :param device_name: Name of the config writer device to use.
+        :param settings: Settings of the config writer (e.g. those of UARTSettings). Ignored by the "test" device.
+        :return: The config writer.
+        :raises ValueError: If the passed device or settings are not valid.
+        """
+        if device_name == "test":
+            return AsyncTestWriter(device_name)
+        return self._get_async_config_writer_type()(device_name, **settings)
 
     def _init_features(self) -> None:
         """
@@ -153,6 +261,103 @@ class SwitchChip(Generic[RegisterAddressType, RegisterType, CommandType]):
         """
         raise NotImplementedError()
 
+    def _init_image(self) -> None:
+        """
+        Allocate one buffer holding the data of all registers and turn the registers into views of this buffer.
+        """
+        size = sum([r.num_data_bytes for r in self._registers.values()])
+        self._image = bytearray(size)
+        view = memoryview(self._image)
+        offset = 0
+        for address, register in self._registers.items():
+            self._register_offsets[address] = offset
+            register.bind(view[offset:offset + register.num_data_bytes])
+            register.set_change_listener(self._on_register_changed)
+            register.mark_changed()
+            offset += register.num_data_bytes
+
+    def get_image(self) -> bytes:
+        """
+        :return: Copy of the data of all registers (in the order of registration).
+        """
+        return bytes(self._image)
+
+    def set_image(self, image: bytes) -> None:
+        """
+        Overwrite data of all registers.
+        :param image: The data, e.g. from get_image() of another instance of the same switch.
+        :raise ValueError: If the image has wrong size.
+        """
+        if len(image) != len(self._image):
+            raise ValueError("Register image of {} has {} bytes, got {} bytes".format(
+                self.name(), len(self._image), len(image)))
+        self._image[:] = image
+        for register in self._registers.values():
+            register.mark_changed()
+
+    def image_digest(self) -> str:
+        """
+        :return: Hash of the register image. Equal for switches with equal register values.
+        """
+        return hashlib.sha1(self._image).hexdigest()
+
+    def diff_registers(self, other: Union['SwitchChip', bytes]) -> List[RegisterType]:
+        """
+        Find registers whose values differ from the given switch or register image.
+        :param other: The other switch (of the same type) or its register image.
+        :return: The registers with different values.
+        :raise ValueError: If the image has wrong size.
+        """
+        image = other.get_image() if isinstance(other, SwitchChip) else other
+        if len(image) != len(self._image):
+            raise ValueError("Register image of {} has {} bytes, got {} bytes".format(
+                self.name(), len(self._image), len(image)))
+        if image == self._image:
+            return list()
+        result = list()
+        for address, register in self._registers.items():
+            offset = self._register_offsets[address]
+            if image[offset:offset + register.num_data_bytes] != register.data:
+                result.append(register)
+        return result
+
+    def _on_register_changed(self, register: RegisterType) -> None:
+        """
+        Called by registers whose default/touched status needs to be recomputed.
+        :param register: The changed register.
+        """
+        self._changed_registers.add(register.address)
+
+    def select_registers(self, leave_out_default: bool = True, only_touched: bool = False) -> List[RegisterType]:
+        """
+        Return registers based on their status. The cost depends on the number of registers changed since the last
+        call, not on the number of all registers and fields.
+        :param leave_out_default: If true, returns only the registers with value different from their default.
+        :param only_touched: If true, returns only registers that were touched.
+        :return: The selected registers (in no particular order).
+        """
+        for address in self._changed_registers:
+            register = self._registers[address]
+            if register.is_touched():
+                self._touched_registers.add(address)
+            else:
+                self._touched_registers.discard(address)
+            if register.is_default():
+                self._non_default_registers.discard(address)
+            else:
+                self._non_default_registers.add(address)
+        self._changed_registers.clear()
+
+        if only_touched and leave_out_default:
+            addresses = self._touched_registers.intersection(self._non_default_registers)
+        elif only_touched:
+            addresses = self._touched_registers
+        elif leave_out_default:
+            addresses = self._non_default_registers
+        else:
+            addresses = self._registers.keys()
+        return [self._registers[address] for address in addresses]
+
     def get_registers(self) -> Dict[RegisterAddressType, RegisterType]:
         """
         :return: All registers of the switch.
@@ -161,7 +366,7 @@ class SwitchChip(Generic[RegisterAddressType, RegisterType, CommandType]):
 
     def _add_register(self, register: RegisterType) -> None:
         """
-        Add the given register to this switch. This method should only be called during initialization.
+        Add the given register to this switch. This method should only be called from _init_registers().
         :param register: The register to add.
         """
         self._registers[register.address] = register
@@ -173,14 +378,34 @@ class SwitchChip(Generic[RegisterAddressType, RegisterType, CommandType]):
         """
         self.fields[field.get_name()] = field
 
-    def _create_port_list_field(self, register: RegisterType, index: int, ports_default: bool, name: str) \
-            -> ConfigField:
+    def _create_field(self, register: RegisterType, spec: FieldSpec) -> ConfigField:
+        """
+        Create a field from its compiled chip description.
+        :param register: The register that holds the field.
+        :param spec: Description of the field.
+        :return: The field.
+        """
+        if spec.type == 'bit':
+            return BitField(register, spec.offset, spec.default, spec.name)
+        elif spec.type == 'bits':
+            return BitsField(register, spec.offset, spec.length, spec.default, spec.name)
+        elif spec.type == 'byte':
+            return ByteField(register, spec.offset, spec.default, spec.name)
+        elif spec.type == 'short':
+            return ShortField(register, spec.offset, spec.default, spec.name)
+        elif spec.type == 'ports':
+            return self._create_port_list_field(register, spec.offset, spec.default, spec.name, spec.raw_default)
+        raise ValueError("Unknown type '{}' of field {}".format(spec.type, spec.name))
+
+    def _create_port_list_field(self, register: RegisterType, index: int, ports_default: bool, name: str,
+                                raw_default: Optional[int] = None) -> ConfigField:
         """
         Create a field that represents a bitmask (or other representation) of a set/list of ports.
         :param register: The register that backs this list.
         :param index: Index in the register (implementation-specific).
         :param ports_default: Whether all ports should be set by default or not.
         :param name: Name of the field.
+        :param raw_default: Default value of the underlying register bits, if not implied by ports_default.
         :return: The field.
         """
         raise NotImplementedError()
@@ -35,6 +35,7 @@ setup(
     ],
     packages=find_packages(include=['botblox_config', 'botblox_config.*']),
     include_package_data=True,
+    package_data={'botblox_config.switch': ['descriptions/*.json']},
     install_requires=[
         'pyserial>=3.5',
         'typing-extensions>=3.7.4.3',
@@ -51,6 +52,12 @@ setup(
             'pre-commit>=2.12.1',
             'pytest>=6.2.3',
         ],
+        'yaml': [
+            'PyYAML>=5.1',
+        ],
+        'toml': [
+            'tomli>=1.1.0; python_version < "3.11"',
+        ],
     },
     entry_points={
         'console_scripts': [
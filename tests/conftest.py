@@ -1,10 +1,20 @@
 import argparse
-import subprocess
 import sys
 from functools import reduce
 from typing import Any, List, Tuple
 
-from botblox_config.switch import SwitchChip
+import pytest
+from botblox_config.cli import run
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> str:
+    """
+    Keep the caches of each test (e.g. compiled commands) out of the user's cache directory and other tests.
+    """
+    path = str(tmp_path / 'cache')
+    monkeypatch.setenv('BOTBLOX_CACHE_DIR', path)
+    return path
 
 
 def assert_ip175g_command_is_correct_type(
@@ -20,19 +30,23 @@ def assert_ip175g_command_is_correct_type(
 
 def get_data_from_cli_args(
     *,
-    parser: Tuple[argparse.ArgumentParser, SwitchChip],
+    parser: argparse.ArgumentParser,
     args: List[str],
 ) -> List[List[int]]:
-    parsed_args = parser[0].parse_args(args)
+    parsed_args = parser.parse_args(args)
     config = parsed_args.execute(parsed_args)
-    return config.create_configuration()
+    return config.create_configuration().tolist()
 
 
 def run_command_to_error(
     *args: Tuple[List[str], ...],
 ) -> None:
-    if len(args) > 0 and len(args[0]) > 0 and args[0][0] == "botblox":
-        args = ([sys.executable, "-m", "botblox_config"],) + args[1:]
+    """
+    Run the botblox CLI in-process and check that it fails. Its messages are printed, so that tests can check them.
+    """
     command: List[str] = reduce(lambda comm, arg: comm + arg, args)
-    cli_status_code: int = subprocess.call(command)
-    assert cli_status_code > 0, 'The command did not exit with an error code'
+    assert command[0] == "botblox"
+    result = run(command[1:])
+    sys.stdout.write(result.output)
+    sys.stderr.write(result.errors)
+    assert result.exit_code > 0, 'The command did not exit with an error code'
@@ -18,8 +18,8 @@ class TestSetReset:
         self,
     ) -> None:
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=self.base_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=self.base_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 1, 224], [20, 3, 1, 0]]
+        expected_result = [[20, 3, 1, 0], [20, 4, 1, 224]]
         assert data == expected_result
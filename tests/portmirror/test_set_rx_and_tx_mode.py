@@ -28,10 +28,10 @@ class TestSetRxAndTxMode:
             '3',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=test_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=test_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 8, 64], [20, 3, 16, 192]]
+        expected_result = [[20, 3, 16, 192], [20, 4, 8, 64]]
         assert data == expected_result
 
     def test_same_tx_and_rx_port(
@@ -46,10 +46,10 @@ class TestSetRxAndTxMode:
             '2',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=test_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=test_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 8, 64], [20, 3, 8, 192]]
+        expected_result = [[20, 3, 8, 192], [20, 4, 8, 64]]
         assert data == expected_result
 
     def test_rx_port_non_existent(
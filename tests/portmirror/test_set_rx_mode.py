@@ -30,10 +30,10 @@ class TestSetRxMode:
             '2',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 1, 64], [20, 3, 8, 128]]
+        expected_result = [[20, 3, 8, 128], [20, 4, 1, 64]]
         assert data == expected_result
 
     def test_multiple_rx_port(
@@ -49,10 +49,10 @@ class TestSetRxMode:
             '5',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 1, 64], [20, 3, 216, 128]]
+        expected_result = [[20, 3, 216, 128], [20, 4, 1, 64]]
         assert data == expected_result
 
     def test_no_rx_port(
@@ -85,10 +85,10 @@ class TestSetRxMode:
             '4',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 1, 224], [20, 3, 92, 128]]
+        expected_result = [[20, 3, 92, 128], [20, 4, 1, 224]]
         assert data == expected_result
 
     def test_single_tx_port(
@@ -134,3 +134,17 @@ class TestSetRxMode:
         actual_stderr: str = captured.err
 
         assert actual_stderr.find(expected_stderr_message) > -1
+
+    def test_nano_default_mirror_port(
+        self,
+    ) -> None:
+        args = ['--switch', 'nano'] + self.base_args + [
+            '--rx-port',
+            '1',
+        ]
+
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
+        assert_ip175g_command_is_correct_type(data=data)
+
+        expected_result = [[20, 3, 4, 128], [20, 4, 1, 128]]
+        assert data == expected_result
@@ -28,10 +28,10 @@ class TestSetRxOrTxMode:
             '3',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=test_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=test_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 8, 64], [20, 3, 16, 224]]
+        expected_result = [[20, 3, 16, 224], [20, 4, 8, 64]]
         assert data == expected_result
 
     def test_same_tx_and_rx_port(
@@ -46,10 +46,10 @@ class TestSetRxOrTxMode:
             '2',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=test_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=test_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 8, 64], [20, 3, 8, 224]]
+        expected_result = [[20, 3, 8, 224], [20, 4, 8, 64]]
         assert data == expected_result
 
     def test_rx_port_non_existent(
@@ -63,7 +63,7 @@ class TestSetRxOrTxMode:
             '2',
         ]
 
-        run_command_to_error(self.package, self.base_args, test_args)
+        run_command_to_error(self.package, test_args)
 
         captured: CaptureFixture[AnyStr] = capfd.readouterr()
         assert captured.out == ''
@@ -84,7 +84,7 @@ class TestSetRxOrTxMode:
             '2',
         ]
 
-        run_command_to_error(self.package, self.base_args, test_args)
+        run_command_to_error(self.package, test_args)
 
         captured: CaptureFixture[AnyStr] = capfd.readouterr()
         assert captured.out == ''
@@ -103,7 +103,7 @@ class TestSetRxOrTxMode:
             '1',
         ]
 
-        run_command_to_error(self.package, self.base_args, test_args)
+        run_command_to_error(self.package, test_args)
 
         captured: CaptureFixture[AnyStr] = capfd.readouterr()
         assert captured.out == ''
@@ -30,10 +30,10 @@ class TestSetTxMode:
             '2',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=test_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=test_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 8, 64], [20, 3, 1, 160]]
+        expected_result = [[20, 3, 1, 160], [20, 4, 8, 64]]
         assert data == expected_result
 
     def test_multiple_tx_port(
@@ -48,10 +48,10 @@ class TestSetTxMode:
             '4',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=test_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=test_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 88, 64], [20, 3, 1, 160]]
+        expected_result = [[20, 3, 1, 160], [20, 4, 88, 64]]
         assert data == expected_result
 
     def test_no_tx_port(
@@ -84,10 +84,10 @@ class TestSetTxMode:
             '4',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(self.base_args), args=test_args)
+        data = get_data_from_cli_args(parser=create_parser(), args=test_args)
         assert_ip175g_command_is_correct_type(data=data)
 
-        expected_result = [[20, 4, 92, 224], [20, 3, 1, 160]]
+        expected_result = [[20, 3, 1, 160], [20, 4, 92, 224]]
         assert data == expected_result
 
     def test_single_rx_port(
@@ -0,0 +1,60 @@
+import json
+import os
+import time
+
+from botblox_config.switch.baud_registry import BaudRateRegistry
+
+
+class TestBaudRateRegistry:
+    def test_record_and_forget(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "baud_rates.json")
+        registry = BaudRateRegistry(path)
+        assert registry.get("usb:A1") is None
+        registry.record("usb:A1", 460800)
+        registry.record("/dev/ttyUSB1", 115200)
+
+        registry = BaudRateRegistry(path)  # a new registry reads the persisted rates
+        assert registry.get("usb:A1") == 460800
+        registry.forget("usb:A1")
+        assert registry.get("usb:A1") is None
+        assert registry.get("/dev/ttyUSB1") == 115200
+
+    def test_max_age(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "baud_rates.json")
+        registry = BaudRateRegistry(path)
+        registry.record("usb:A1", 460800)
+        assert registry.get("usb:A1", max_age=60) == 460800
+        assert registry.get("usb:A1", max_age=-1) is None
+        assert registry.get("usb:A1") == 460800
+
+        with open(path, "rt") as f:
+            entry = json.load(f)["usb:A1"]
+        assert entry["baudrate"] == 460800 and entry["time"] <= time.time()
+
+    def test_keep_time(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "baud_rates.json")
+        registry = BaudRateRegistry(path)
+        registry.record("usb:A1", 460800)
+        with open(path, "rt") as f:
+            recorded_at = json.load(f)["usb:A1"]["time"]
+
+        time.sleep(0.01)
+        registry.record("usb:A1", 230400, keep_time=True)
+        with open(path, "rt") as f:
+            assert json.load(f)["usb:A1"] == {"baudrate": 230400, "time": recorded_at}
+        registry.record("usb:A1", 230400)
+        with open(path, "rt") as f:
+            assert json.load(f)["usb:A1"]["time"] > recorded_at
+
+        registry.record("usb:B2", 115200, keep_time=True)  # nothing to keep
+        assert registry.get("usb:B2", max_age=60) == 115200
+
+    def test_corrupt_file(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "baud_rates.json")
+        with open(path, "wt") as f:
+            f.write("[1, 2")
+        assert BaudRateRegistry(path).get("usb:A1") is None
+
+    def test_default_path(self, cache_dir: str) -> None:
+        BaudRateRegistry().record("usb:A1", 230400)
+        assert os.path.exists(os.path.join(cache_dir, BaudRateRegistry.FILE_NAME))
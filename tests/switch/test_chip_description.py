@@ -0,0 +1,105 @@
+import json
+import os
+from typing import Any, Dict
+
+import pytest
+from botblox_config.switch import chip_description, create_switch
+from botblox_config.switch.chip_description import compile_description, load_description_file, load_layout
+
+
+def minimal_description() -> Dict[str, Any]:
+    return {
+        "chip": "TEST",
+        "register_size": 2,
+        "features": ["TAGGED_VLAN"],
+        "registers": [[1, 0], [1, 1]],
+        "fields": [
+            {"name": "FLAG", "type": "bit", "register": [1, 0], "index": 15, "default": True},
+            {"name": "MEMBERS", "type": "ports", "register": [1, 1], "index": 1, "default": True},
+        ],
+        "variants": {
+            "full": {"name": "Full", "ports": [{"name": "1", "bit": 0}, {"name": "2", "bit": 1}]},
+            "small": {"ports": [{"name": "1", "bit": 0}], "without_registers": [[1, 1]]},
+        },
+    }
+
+
+class TestChipDescription:
+    def test_layout_matches_switch(self) -> None:
+        layout = load_layout("ip175g", "switchblox")
+        switch = create_switch("switchblox")
+        assert layout.name == switch.name()
+        assert [(a.phy, a.mii) for a in switch.get_registers()] == list(layout.registers)
+        assert list(switch.fields.keys()) == [f.name for f in layout.fields]
+        assert [(p.name, p.id) for p in switch.ports()] == [(p.name, p.bit) for p in layout.ports]
+
+        nano = load_layout("ip175g", "nano")
+        assert "VLAN_INFO_4" in layout.field_index
+        assert "VLAN_INFO_4" not in nano.field_index
+        assert (23, 12) not in nano.register_index
+        assert nano.get_field("VID_0").length == 12
+
+    def test_unknown_chip_or_variant(self) -> None:
+        with pytest.raises(ValueError):
+            load_layout("unknown", "switchblox")
+        with pytest.raises(ValueError):
+            load_layout("ip175g", "unknown")
+
+    def test_compile_variants(self) -> None:
+        layouts = compile_description(minimal_description())
+        assert layouts["full"].name == "Full"
+        assert layouts["full"].registers == ((1, 0), (1, 1))
+        assert layouts["small"].name == "small"
+        assert layouts["small"].registers == ((1, 0),)
+        assert [f.name for f in layouts["small"].fields] == ["FLAG"]
+
+    @pytest.mark.parametrize("field", [
+        {"name": "X", "type": "bit", "register": [1, 0], "index": 16},
+        {"name": "X", "type": "bits", "register": [1, 0], "offset": 12, "length": 5},
+        {"name": "X", "type": "bits", "register": [1, 0], "offset": 0, "length": 2, "default": 4},
+        {"name": "X", "type": "short", "register": [1, 0], "offset": 1},
+        {"name": "X", "type": "float", "register": [1, 0]},
+        {"name": "X", "type": "bit", "register": [2, 0], "index": 0},
+        {"name": "FLAG", "type": "bit", "register": [1, 0], "index": 0},
+        {"type": "bit", "register": [1, 0], "index": 0},
+    ])
+    def test_invalid_field(self, field: Dict[str, Any]) -> None:
+        description = minimal_description()
+        description["fields"].append(field)
+        with pytest.raises(ValueError):
+            compile_description(description)
+
+    def test_compiled_cache(self, tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        path = os.path.join(tmp_path, "test.json")
+        with open(path, "wt") as f:
+            json.dump(minimal_description(), f)
+
+        layouts = load_description_file(path)
+        compiled_path = chip_description._compiled_path(path)
+        assert os.path.exists(compiled_path)
+        assert load_description_file(path) is layouts
+
+        # a new process loads the compiled layouts without parsing the description
+        monkeypatch.setattr(chip_description, "_layouts", dict())
+        monkeypatch.setattr(chip_description, "compile_description", None)
+        assert load_description_file(path)["full"].field_index == {"FLAG": 0, "MEMBERS": 1}
+
+        # a changed description invalidates the compiled cache
+        monkeypatch.setattr(chip_description, "_layouts", dict())
+        monkeypatch.setattr(chip_description, "compile_description", compile_description)
+        description = minimal_description()
+        description["variants"]["full"]["name"] = "Changed name"
+        with open(path, "wt") as f:
+            json.dump(description, f)
+        assert load_description_file(path)["full"].name == "Changed name"
+
+    def test_read_only_directory(self, tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        path = os.path.join(tmp_path, "test.json")
+        with open(path, "wt") as f:
+            json.dump(minimal_description(), f)
+
+        def read_only(*args: Any, **kwargs: Any) -> None:
+            raise PermissionError("read-only file system")
+
+        monkeypatch.setattr(chip_description.tempfile, "mkstemp", read_only)
+        assert load_description_file(path)["small"].registers == ((1, 0),)
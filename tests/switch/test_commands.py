@@ -0,0 +1,54 @@
+import pytest
+from botblox_config.switch.commands import CommandBuffer
+
+
+class TestCommandBuffer:
+    def test_append_and_render(self) -> None:
+        commands = CommandBuffer()
+        commands.append([23, 16, 12, 12])
+        commands.add(20, 3, b'\x10\x80')
+        commands.extend([[100, 0, 0, 0]])
+        assert len(commands) == 3
+        assert commands.tolist() == [[23, 16, 12, 12], [20, 3, 16, 128], [100, 0, 0, 0]]
+        assert commands == [[23, 16, 12, 12], [20, 3, 16, 128], [100, 0, 0, 0]]
+        assert commands.tobytes() == bytes([23, 16, 12, 12, 20, 3, 16, 128, 100, 0, 0, 0])
+        assert str(commands) == '[[23, 16, 12, 12], [20, 3, 16, 128], [100, 0, 0, 0]]'
+        assert commands[1] == [20, 3, 16, 128]
+        assert commands[-1] == [100, 0, 0, 0]
+        assert commands[1:] == [[20, 3, 16, 128], [100, 0, 0, 0]]
+        assert [[101, 0, 0, 0]] + commands[:1] == [[101, 0, 0, 0], [23, 16, 12, 12]]
+        assert commands != [[23, 16, 12, 12]]
+
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError):
+            CommandBuffer([[23, 16, 12]])
+        with pytest.raises(ValueError):
+            CommandBuffer([[23, 16, 12, 256]])
+        with pytest.raises(ValueError):
+            CommandBuffer(b'\x17\x10')
+        with pytest.raises(ValueError):
+            CommandBuffer().add(23, 16, b'\x01')
+        with pytest.raises(IndexError):
+            CommandBuffer()[0]
+
+    def test_sort_and_dedup(self) -> None:
+        commands = CommandBuffer([[24, 1, 0, 0], [23, 16, 1, 0], [24, 0, 5, 0], [23, 16, 2, 0], [20, 3, 0, 0]])
+        commands.dedup()
+        assert commands == [[24, 1, 0, 0], [23, 16, 2, 0], [24, 0, 5, 0], [20, 3, 0, 0]]
+        commands.sort()
+        assert commands == [[20, 3, 0, 0], [23, 16, 2, 0], [24, 0, 5, 0], [24, 1, 0, 0]]
+
+    def test_view_is_not_a_copy(self) -> None:
+        commands = CommandBuffer([[23, 16, 1, 0]])
+        with commands.view() as view:
+            assert view.tobytes() == bytes([23, 16, 1, 0])
+            with pytest.raises(BufferError):
+                commands.append([23, 17, 0, 0])
+        commands.append([23, 17, 0, 0])
+        assert len(commands) == 2
+
+    def test_discard(self) -> None:
+        commands = CommandBuffer([[101, 0, 0, 0], [23, 16, 1, 0], [100, 0, 0, 0]])
+        assert commands.discard(101)
+        assert not commands.discard(101)
+        assert commands == [[23, 16, 1, 0], [100, 0, 0, 0]]
@@ -0,0 +1,129 @@
+import argparse
+from typing import Any, cast, List
+
+import pytest
+from botblox_config.data_manager.transaction import ConfigTransaction
+from botblox_config.data_manager.vlan import VlanConfig
+from botblox_config.show import format_switch, run_show
+from botblox_config.switch import config_reader, config_writer, create_switch
+from botblox_config.switch.config_reader import READ_COMMAND, UARTReader
+from botblox_config.switch.device_state import STOP_COMMAND
+from botblox_config.switch.emulator import SwitchEmulator
+from botblox_config.switch.fields import PortListField
+
+
+class EmulatedSerial:
+    """
+    Stand-in for serial.Serial connected to an emulated board.
+    """
+    emulator = SwitchEmulator()
+    instances: List['EmulatedSerial'] = list()
+
+    def __init__(self, **kwargs: Any) -> None:
+        self.kwargs = kwargs
+        self.replies = bytearray()
+        self.closed = False
+        EmulatedSerial.instances.append(self)
+
+    def reset_input_buffer(self) -> None:
+        self.replies.clear()
+
+    def write(self, data: bytes) -> int:
+        self.replies += EmulatedSerial.emulator.feed(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self.replies[:size])
+        del self.replies[:size]
+        return data
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def emulator(monkeypatch: pytest.MonkeyPatch) -> SwitchEmulator:
+    EmulatedSerial.emulator = SwitchEmulator("switchblox")
+    EmulatedSerial.instances = list()
+    monkeypatch.setattr(config_writer.serial, "Serial", EmulatedSerial)
+    return EmulatedSerial.emulator
+
+
+def configure_vlan(switch_type: str = "switchblox") -> ConfigTransaction:
+    switch = create_switch(switch_type)
+    vlan = VlanConfig(switch)
+    vlan.add_group([switch.get_port("1"), switch.get_port("2")])
+    return ConfigTransaction(switch).add(vlan)
+
+
+class TestConfigReader:
+    def test_read_back_written_configuration(self, emulator: SwitchEmulator) -> None:
+        transaction = configure_vlan()
+        assert transaction.write(config_writer.UARTWriter("/dev/ttyUSB0", rtscts=True))
+
+        switch = create_switch("switchblox")
+        with switch.get_config_reader("/dev/ttyUSB0") as reader:
+            assert isinstance(reader, UARTReader)
+            reader.read_switch(switch)
+        assert len(EmulatedSerial.instances) == 2
+        assert EmulatedSerial.instances[1].kwargs["timeout"] == UARTReader.DEFAULT_REPLY_TIMEOUT
+        assert EmulatedSerial.instances[1].closed
+
+        member = cast(PortListField, switch.fields["PBV_MEMBER_P0"])
+        assert [p.name for p in member.get_ports()] == ["1", "2"]
+        assert not member.is_touched()
+        assert switch.get_commands(leave_out_default=True) == [[23, 16, 12, 12]]
+
+    def test_no_reply(self, emulator: SwitchEmulator, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(EmulatedSerial, "read", lambda self, size=1: b'')
+        switch = create_switch("switchblox")
+        with pytest.raises(TimeoutError):
+            switch.get_config_reader("/dev/ttyUSB0").read_switch(switch)
+        assert EmulatedSerial.instances[0].closed
+
+    def test_test_device(self) -> None:
+        switch = create_switch("nano")
+        image = switch.get_image()
+        reader = switch.get_config_reader("test")
+        assert isinstance(reader, config_reader.TestReader)
+        assert reader.read_switch(switch).get_image() == image
+
+
+class TestShow:
+    def args(self, *argv: str) -> argparse.Namespace:
+        return argparse.Namespace(switch="switchblox", device="/dev/ttyUSB0", raw="--raw" in argv,
+                                  changed="--changed" in argv, framed_firmware="--legacy" not in argv)
+
+    def test_show_changed_fields(self, emulator: SwitchEmulator, capsys: pytest.CaptureFixture) -> None:
+        configure_vlan().write(config_writer.UARTWriter("/dev/ttyUSB0", rtscts=True))
+        assert run_show(self.args("--changed")) == 0
+        assert capsys.readouterr().out == (
+            "PBV_MEMBER_P0=Ports[1,2]\n"
+            "PBV_MEMBER_P1=Ports[1,2]\n"
+        )
+        assert run_show(self.args("--changed", "--raw")) == 0
+        assert capsys.readouterr().out == "23:16 0x0c0c\n"
+
+    def test_show_all_fields(self) -> None:
+        switch = create_switch("switchblox")
+        assert len(format_switch(switch).splitlines()) == len(switch.fields)
+        assert len(format_switch(switch, raw=True).splitlines()) == len(switch.get_registers())
+
+    def test_show_unreachable_device(self, emulator: SwitchEmulator, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(EmulatedSerial, "read", lambda self, size=1: b'')
+        assert run_show(self.args()) == 1
+        assert run_show(argparse.Namespace(switch="switchblox", device="COM1", raw=False, changed=False,
+                                           framed_firmware=True)) == 1
+
+    def test_show_needs_framed_firmware(self, emulator: SwitchEmulator) -> None:
+        EmulatedSerial.emulator = SwitchEmulator("switchblox", framed=False)
+        assert run_show(self.args("--legacy")) == 2
+        assert EmulatedSerial.instances == []  # the port was not even opened
+
+        # a board with older firmware answers neither the probe nor any read command
+        assert run_show(self.args()) == 1
+        EmulatedSerial.emulator.feed(bytes([STOP_COMMAND, 0, 0, 0]))
+        assert all(address[0] != READ_COMMAND for address in EmulatedSerial.emulator.eeprom)
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import sys
+from typing import Any, Coroutine, List
+
+import pytest
+from botblox_config.switch import config_writer, create_switch
+from botblox_config.switch.commands import CommandBuffer
+from botblox_config.switch.config_writer import AsyncUARTWriter, UARTSettings, UARTWriter
+
+
+class FakeSerial:
+    """
+    Stand-in for serial.Serial that records the traffic and replies with scripted condition bytes.
+    """
+    instances: List['FakeSerial'] = list()
+    replies: List[bytes] = list()
+
+    def __init__(self, **kwargs: Any) -> None:
+        self.kwargs = kwargs
+        self.written: List[bytes] = list()
+        self.closed = False
+        FakeSerial.instances.append(self)
+
+    def reset_input_buffer(self) -> None:
+        pass
+
+    def write(self, data: bytes) -> int:
+        self.written.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def read(self, size: int = 1) -> bytes:
+        return FakeSerial.replies.pop(0) if len(FakeSerial.replies) > 0 else b''
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def fake_serial(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    FakeSerial.instances = list()
+    FakeSerial.replies = list()
+    sleeps: List[float] = list()
+    monkeypatch.setattr(config_writer.serial, "Serial", FakeSerial)
+    monkeypatch.setattr(config_writer.time, "sleep", sleeps.append)
+    return sleeps
+
+
+class TestUARTWriter:
+    commands = [[23, 0, 0, 160], [24, 0, 0, 0], [100, 0, 0, 0]]
+
+    def test_wrong_device(self) -> None:
+        with pytest.raises(ValueError):
+            UARTWriter("COM1")
+
+    def test_single_write_opens_and_closes(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'\x01']
+        writer = UARTWriter("/dev/ttyUSB0", protocol="legacy")
+        assert writer.write(self.commands)
+        assert len(FakeSerial.instances) == 1
+        assert FakeSerial.instances[0].closed
+        assert not writer.is_connected()
+        assert FakeSerial.instances[0].written == [bytes(c) for c in self.commands]
+        assert fake_serial == [UARTSettings.DEFAULT_COMMAND_GAP] * len(self.commands)
+
+    def test_session_keeps_port_open(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'\x01', b'\x01', b'\x02']
+        with UARTWriter("/dev/ttyUSB0", protocol="legacy") as writer:
+            assert writer.write(self.commands)
+            assert writer.write(self.commands)
+            assert not writer.write(self.commands)
+            assert not FakeSerial.instances[0].closed
+        assert len(FakeSerial.instances) == 1
+        assert FakeSerial.instances[0].closed
+        assert len(FakeSerial.instances[0].written) == 3 * len(self.commands)
+
+    def test_flow_control_has_no_gap(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'\x01']
+        writer = UARTWriter("/dev/ttyUSB0", protocol="legacy", rtscts=True)
+        assert writer.write(self.commands)
+        assert FakeSerial.instances[0].kwargs["rtscts"]
+        assert fake_serial == []
+        assert FakeSerial.instances[0].written == [b''.join(bytes(c) for c in self.commands)]
+
+    def test_write_command_buffer(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'\x01', b'\x01']
+        commands = CommandBuffer(self.commands)
+        with UARTWriter("/dev/ttyUSB0", protocol="legacy") as writer:
+            assert writer.write(commands)
+            writer.settings.rtscts = True
+            assert writer.write(commands)
+        assert FakeSerial.instances[0].written == [bytes(c) for c in self.commands] + [commands.tobytes()]
+        commands.append([100, 0, 0, 0])  # the buffer is not locked by a view after the write
+
+    def test_gap_adapts_on_missing_reply(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'', b'\x01']
+        with UARTWriter("/dev/ttyUSB0", protocol="legacy", adaptive_gap=True) as writer:
+            assert writer.command_gap == UARTSettings.FAST_COMMAND_GAP
+            assert not writer.write(self.commands)  # the push is not repeated, the board may have stored it
+            expected_gap = UARTSettings.FAST_COMMAND_GAP * UARTSettings.COMMAND_GAP_BACKOFF
+            assert writer.command_gap == pytest.approx(expected_gap)
+            assert writer.write(self.commands)
+        assert len(FakeSerial.instances[0].written) == 2 * len(self.commands)
+        assert fake_serial == [UARTSettings.FAST_COMMAND_GAP] * len(self.commands) + [expected_gap] * len(self.commands)
+
+    def test_gap_stops_at_max(self, fake_serial: List[float]) -> None:
+        writer = UARTWriter("/dev/ttyUSB0", protocol="legacy", adaptive_gap=True)
+        for _ in range(5):
+            assert not writer.write(self.commands)
+        assert writer.command_gap == UARTSettings.MAX_COMMAND_GAP
+
+    def test_missing_reply_is_not_repeated(self, fake_serial: List[float]) -> None:
+        writer = UARTWriter("/dev/ttyUSB0", protocol="legacy")
+        assert not writer.write(self.commands)
+        assert len(FakeSerial.instances[0].written) == len(self.commands)
+        assert writer.command_gap == UARTSettings.DEFAULT_COMMAND_GAP
+
+    def test_flow_control_gives_up(self, fake_serial: List[float]) -> None:
+        writer = UARTWriter("/dev/ttyUSB0", rtscts=True, protocol="legacy", adaptive_gap=True)
+        assert not writer.write(self.commands)
+        assert len(FakeSerial.instances[0].written) == 1
+
+    def test_fixed_gap_cannot_adapt(self) -> None:
+        with pytest.raises(ValueError):
+            UARTWriter("/dev/ttyUSB0", command_gap=0.05, adaptive_gap=True)
+
+    def test_unknown_protocol(self) -> None:
+        with pytest.raises(ValueError):
+            UARTWriter("/dev/ttyUSB0", protocol="v2")
+
+    def test_framed_without_answer(self, fake_serial: List[float]) -> None:
+        writer = UARTWriter("/dev/ttyUSB0", protocol="framed")
+        assert not writer.write(self.commands)
+        assert FakeSerial.instances[0].written == [bytes([103, 1, 0, 0])]
+
+    def test_auto_falls_back_to_legacy(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'', b'\x01']
+        writer = UARTWriter("/dev/ttyUSB0", protocol="auto", rtscts=True)
+        assert writer.write(self.commands)
+        assert FakeSerial.instances[0].written == [bytes([103, 1, 0, 0]), b''.join(bytes(c) for c in self.commands)]
+
+    def test_legacy_by_default(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'\x01']
+        writer = UARTWriter("/dev/ttyUSB0", rtscts=True)
+        assert writer.settings.protocol == "legacy"
+        assert writer.write(self.commands)
+        assert FakeSerial.instances[0].written == [b''.join(bytes(c) for c in self.commands)]
+
+    def test_fixed_gap(self, fake_serial: List[float]) -> None:
+        writer = UARTWriter("/dev/ttyUSB0", protocol="legacy", command_gap=0.05)
+        assert not writer.write(self.commands)
+        assert len(FakeSerial.instances[0].written) == len(self.commands)
+        assert fake_serial == [0.05] * len(self.commands)
+        assert writer.command_gap == 0.05
+
+    def test_device_key_falls_back_to_path(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(config_writer.list_ports, "comports", lambda: [])
+        assert UARTWriter("/dev/ttyUSB0").device_key() == "/dev/ttyUSB0"
+
+
+def run_async(coroutine: Coroutine) -> Any:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncUARTWriter:
+    commands = [[23, 0, 0, 160], [24, 0, 0, 0], [100, 0, 0, 0]]
+
+    def test_wrong_device(self) -> None:
+        with pytest.raises(ValueError):
+            AsyncUARTWriter("COM1")
+
+    def test_only_legacy_protocol(self) -> None:
+        assert AsyncUARTWriter("/dev/ttyUSB0", protocol="legacy").settings.protocol == "legacy"
+        for protocol in ("framed", "auto"):
+            with pytest.raises(ValueError):
+                AsyncUARTWriter("/dev/ttyUSB0", protocol=protocol)
+
+    def test_switch_creates_async_writer(self) -> None:
+        switch = create_switch("switchblox")
+        assert isinstance(switch.get_async_config_writer("/dev/ttyUSB0"), AsyncUARTWriter)
+        assert run_async(switch.get_async_config_writer("test").write(self.commands))
+
+    def test_polled_write(self, fake_serial: List[float]) -> None:
+        FakeSerial.replies = [b'', b'', b'\x01']
+
+        async def push() -> bool:
+            async with AsyncUARTWriter("/dev/ttyUSB0") as writer:
+                return await writer.write(self.commands)
+
+        assert run_async(push())
+        assert len(FakeSerial.instances) == 1
+        assert FakeSerial.instances[0].kwargs["timeout"] == 0
+        assert FakeSerial.instances[0].written == [bytes(c) for c in self.commands]
+        assert FakeSerial.instances[0].closed
+
+    def test_timeout(self, fake_serial: List[float]) -> None:
+        writer = AsyncUARTWriter("/dev/ttyUSB0", timeout=0.05, command_gap=0)
+        assert not run_async(writer.write(self.commands))
+        assert not writer.is_connected()
+
+    def test_cancel(self, fake_serial: List[float]) -> None:
+        writer = AsyncUARTWriter("/dev/ttyUSB0", command_gap=0)
+
+        async def push() -> None:
+            await asyncio.wait_for(writer.write(self.commands), 0.05)
+
+        with pytest.raises(asyncio.TimeoutError):
+            run_async(push())
+        assert not writer.is_connected()
+        assert FakeSerial.instances[0].closed
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="requires a pseudo-terminal")
+    def test_pty_write(self) -> None:
+        master, slave = os.openpty()
+        os.set_blocking(master, False)
+        received = bytearray()
+
+        async def board() -> None:
+            while len(received) < 4 * len(self.commands):
+                await asyncio.sleep(0.001)
+                try:
+                    received.extend(os.read(master, 1024))
+                except BlockingIOError:
+                    pass
+            os.write(master, b'\x01')
+
+        async def push() -> bool:
+            writer = AsyncUARTWriter(os.ttyname(slave), timeout=5, command_gap=0)
+            results = await asyncio.gather(writer.write(self.commands), board())
+            return results[0]
+
+        try:
+            assert run_async(push())
+        finally:
+            os.close(master)
+            os.close(slave)
+        assert bytes(received) == b''.join(bytes(c) for c in self.commands)
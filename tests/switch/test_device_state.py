@@ -0,0 +1,47 @@
+import os
+
+from botblox_config.switch.device_state import DeviceStateStore
+
+
+class TestDeviceStateStore:
+    commands = [[23, 0, 0, 160], [23, 1, 0, 0], [24, 0, 0, 0]]
+
+    def test_unknown_device_gets_everything(self, tmp_path: str) -> None:
+        store = DeviceStateStore(os.path.join(tmp_path, "state.json"))
+        assert store.diff("/dev/ttyUSB0", "Switchblox", self.commands) == self.commands
+        assert store.get_image("/dev/ttyUSB0", "Switchblox") == dict()
+
+    def test_unchanged_push_is_empty(self, tmp_path: str) -> None:
+        store = DeviceStateStore(os.path.join(tmp_path, "state.json"))
+        store.record("/dev/ttyUSB0", "Switchblox", self.commands + [[100, 0, 0, 0]])
+        assert store.diff("/dev/ttyUSB0", "Switchblox", self.commands) == []
+
+        # a new store instance reads the persisted state
+        store = DeviceStateStore(os.path.join(tmp_path, "state.json"))
+        assert store.diff("/dev/ttyUSB0", "Switchblox", self.commands) == []
+        assert store.get_image("/dev/ttyUSB0", "Switchblox")["23:0"] == [0, 160]
+
+    def test_only_changed_registers(self, tmp_path: str) -> None:
+        store = DeviceStateStore(os.path.join(tmp_path, "state.json"))
+        store.record("/dev/ttyUSB0", "Switchblox", self.commands)
+        new_commands = [[23, 0, 0, 160], [23, 1, 4, 0], [24, 0, 0, 0], [24, 1, 2, 0]]
+        assert store.diff("/dev/ttyUSB0", "Switchblox", new_commands) == [[23, 1, 4, 0], [24, 1, 2, 0]]
+        assert store.diff("/dev/ttyUSB1", "Switchblox", new_commands) == new_commands
+
+    def test_other_switch_type_is_ignored(self, tmp_path: str) -> None:
+        store = DeviceStateStore(os.path.join(tmp_path, "state.json"))
+        store.record("/dev/ttyUSB0", "Switchblox", self.commands)
+        assert store.diff("/dev/ttyUSB0", "Switchblox Nano", self.commands) == self.commands
+
+    def test_erase_clears_state(self, tmp_path: str) -> None:
+        store = DeviceStateStore(os.path.join(tmp_path, "state.json"))
+        store.record("/dev/ttyUSB0", "Switchblox", self.commands)
+        assert store.diff("/dev/ttyUSB0", "Switchblox", [[101, 0, 0, 0]]) == [[101, 0, 0, 0]]
+        store.record("/dev/ttyUSB0", "Switchblox", [[101, 0, 0, 0], [100, 0, 0, 0]])
+        assert store.diff("/dev/ttyUSB0", "Switchblox", self.commands) == self.commands
+
+    def test_forget(self, tmp_path: str) -> None:
+        store = DeviceStateStore(os.path.join(tmp_path, "state.json"))
+        store.record("/dev/ttyUSB0", "Switchblox", self.commands)
+        store.forget("/dev/ttyUSB0")
+        assert store.diff("/dev/ttyUSB0", "Switchblox", self.commands) == self.commands
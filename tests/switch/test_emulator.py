@@ -0,0 +1,304 @@
+import json
+import os
+import time
+
+import pytest
+from botblox_config.batch import BatchJob, provision
+from botblox_config.cache import get_cache_file
+from botblox_config.switch import create_switch
+from botblox_config.switch.baud_registry import BaudRateRegistry
+from botblox_config.switch.config_reader import UARTReader
+from botblox_config.switch.config_writer import UARTSettings, UARTWriter
+from botblox_config.switch.device_state import STOP_COMMAND
+from botblox_config.switch.emulator import EmulatedDevice, SwitchEmulator
+from botblox_config.switch.protocol import Capabilities, decode_frame, encode_baudrate, Frame, FrameType, \
+    hello_command, Status, write_frames
+
+
+class TestSwitchEmulator:
+    def test_writes_are_applied_on_stop(self) -> None:
+        emulator = SwitchEmulator("switchblox")
+        assert emulator.feed(bytes([23, 16, 12])) == b''
+        assert emulator.feed(bytes([12, 102, 23, 16, 0])) == bytes([255, 255])  # not applied yet
+        assert emulator.feed(bytes([100, 0, 0, 0])) == b'\x01'
+        assert emulator.registers[(23, 16)] == bytes([12, 12])
+        assert emulator.eeprom == {(23, 16): bytes([12, 12])}
+        assert emulator.feed(bytes([102, 23, 16, 0])) == bytes([12, 12])
+        assert emulator.num_commands == 4
+        assert emulator.num_stores == 1
+
+    def test_erase_and_power_cycle(self) -> None:
+        emulator = SwitchEmulator("nano")
+        emulator.feed(bytes([23, 16, 12, 12, 100, 0, 0, 0]))
+        emulator.power_cycle()
+        assert emulator.registers[(23, 16)] == bytes([12, 12])
+
+        assert emulator.feed(bytes([101, 0, 0, 0, 100, 0, 0, 0])) == b'\x01'
+        assert emulator.eeprom == {}
+        emulator.power_cycle()
+        assert emulator.registers[(23, 16)] == bytes([255, 255])
+
+    def test_eeprom_failure(self) -> None:
+        emulator = SwitchEmulator()
+        emulator.fail_store = True
+        assert emulator.feed(bytes([23, 16, 12, 12, 100, 0, 0, 0])) == b'\x02'
+        assert emulator.eeprom == {}
+        assert emulator.registers[(23, 16)] == bytes([12, 12])
+
+    def test_capabilities(self) -> None:
+        reply = decode_frame(SwitchEmulator("nano", max_payload=64).feed(hello_command()))
+        assert reply.type == FrameType.CAPABILITIES
+        capabilities = Capabilities.decode(reply.payload)
+        assert (capabilities.switch_type, capabilities.max_payload) == ("switchblox_nano", 64)
+
+    def test_legacy_firmware_takes_unknown_commands_for_writes(self) -> None:
+        emulator = SwitchEmulator(framed=False)
+        assert emulator.feed(hello_command()) == b''
+        assert emulator.feed(bytes([102, 23, 16, 0])) == b''
+        assert emulator.feed(bytes([100, 0, 0, 0])) == b'\x01'
+        assert emulator.eeprom == {(103, 1): bytes([0, 0]), (102, 23): bytes([16, 0])}
+
+    def test_write_frames(self) -> None:
+        emulator = SwitchEmulator()
+        frames = write_frames([[23, 16, 12, 12], [24, 16, 3, 0]], erase=True, max_payload=5, seq=3)
+        replies = [decode_frame(emulator.feed(frame.encode())) for frame in frames]
+        assert replies == [Frame(FrameType.STATUS, bytes([Status.OK]), seq) for seq in (3, 4)]
+        assert emulator.eeprom == {(23, 16): bytes([12, 12]), (24, 16): bytes([3, 0])}
+        assert emulator.num_frames == 2
+        assert emulator.num_stores == 1
+
+    def test_switch_baudrate(self) -> None:
+        emulator = SwitchEmulator()
+        reply = emulator.feed(Frame(FrameType.SET_BAUD, encode_baudrate(460800), 5).encode())
+        assert decode_frame(reply) == Frame(FrameType.STATUS, bytes([Status.OK]), 5)
+        assert emulator.baudrate == 460800
+        assert not emulator.baudrate_confirmed
+
+        emulator.receive(hello_command(), line_baudrate=115200)  # sent at the wrong rate
+        assert list(emulator.messages()) == []
+        emulator.revert_baudrate()
+        assert emulator.baudrate == 115200
+
+        emulator.feed(Frame(FrameType.SET_BAUD, encode_baudrate(921600)).encode())
+        emulator.receive(hello_command(), line_baudrate=921600)
+        assert [emulator.handle(message)[:1] for message in emulator.messages()] == [b'\xb5']
+        assert emulator.baudrate_confirmed
+        emulator.revert_baudrate()
+        assert emulator.baudrate == 921600
+        emulator.power_cycle()
+        assert emulator.baudrate == 115200
+
+        unsupported = emulator.feed(Frame(FrameType.SET_BAUD, encode_baudrate(1000000)).encode())
+        assert decode_frame(unsupported).payload == bytes([Status.BAD_FRAME])
+
+    def test_bad_frames(self) -> None:
+        emulator = SwitchEmulator(max_payload=8)
+        corrupted = bytearray(write_frames([[23, 16, 12, 12]], erase=False, max_payload=8, seq=9)[0].encode())
+        corrupted[7] ^= 0x01
+        assert decode_frame(emulator.feed(bytes(corrupted))).payload == bytes([Status.CRC_ERROR])
+        too_long = write_frames([[23, 16, 12, 12]] * 3, erase=False, max_payload=64)[0]
+        assert decode_frame(emulator.feed(too_long.encode())).payload == bytes([Status.BAD_FRAME])
+        assert emulator.num_crc_errors == 1
+        assert emulator.eeprom == {}
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+class TestEmulatedDevice:
+    COMMANDS = [[23, 16, 12, 12], [STOP_COMMAND, 0, 0, 0]]
+
+    def test_write_and_read_back(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            assert UARTWriter(device.device_name, rtscts=True, timeout=1).write(self.COMMANDS)
+            assert device.emulator.eeprom == {(23, 16): bytes([12, 12])}
+
+            switch = create_switch("switchblox")
+            with UARTReader(device.device_name) as reader:
+                reader.read_switch(switch)
+            assert switch.get_commands() == [[23, 16, 12, 12]]
+
+    def test_dropped_reply_is_not_repeated(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            device.drop_replies = 1
+            with UARTWriter(device.device_name, protocol="legacy", adaptive_gap=True, timeout=0.2) as writer:
+                assert not writer.write(self.COMMANDS)
+                assert writer.command_gap > UARTSettings.FAST_COMMAND_GAP
+                assert device.emulator.num_stores == 1  # stored, although the board's reply was lost
+                assert writer.write(self.COMMANDS)
+            assert device.emulator.num_stores == 2
+
+    def test_framed_write(self) -> None:
+        commands = [[23, 16, 12, 12], [24, 16, 3, 0], [101, 0, 0, 0], [STOP_COMMAND, 0, 0, 0]]
+        with EmulatedDevice("switchblox") as device:
+            device.emulator.capabilities.max_payload = 5  # one command per frame
+            with UARTWriter(device.device_name, protocol="framed", negotiate_baudrate=False, timeout=1) as writer:
+                assert writer.write(commands)
+                assert writer.write(commands)
+            assert device.emulator.num_frames == 2 * 3  # two frames with writes and the store frame
+            assert device.emulator.num_stores == 2
+            assert device.emulator.eeprom == {(23, 16): bytes([12, 12]), (24, 16): bytes([3, 0])}
+
+    def test_only_lost_frames_are_repeated(self) -> None:
+        commands = [[23, i, i, 0] for i in range(20)] + [[23, 0, 7, 7], [STOP_COMMAND, 0, 0, 0]]
+        with EmulatedDevice("switchblox") as device:
+            device.emulator.capabilities.max_payload = 9  # two commands per frame
+            device.drop_frames = {1, 4}  # two frames with writes are lost
+            device.drop_replies = 1  # and the acknowledgement of the first one
+            writer = UARTWriter(device.device_name, protocol="framed", negotiate_baudrate=False, timeout=1)
+            assert writer.write(commands)
+            assert device.num_write_frames == 11 + 1 + 3  # frames with writes, the store frame and 3 repeated frames
+            assert device.emulator.num_stores == 1
+            # the frames are applied in order although they arrived out of order
+            assert device.emulator.eeprom[(23, 0)] == bytes([7, 7])
+            assert device.emulator.eeprom[(23, 19)] == bytes([19, 0])
+
+    def test_window_sizes(self) -> None:
+        commands = [[23, i % 32, i, 0] for i in range(64)] + [[STOP_COMMAND, 0, 0, 0]]
+        frames_in_flight = dict()
+        for window in (1, 8):
+            with EmulatedDevice("switchblox", latency=0.005) as device:
+                device.emulator.capabilities.max_payload = 17  # 16 frames with writes
+                device.emulator.capabilities.window = window
+                with UARTWriter(device.device_name, protocol="framed", negotiate_baudrate=False, timeout=1) as writer:
+                    assert writer.write(commands)
+                frames_in_flight[window] = device.max_frames_in_flight
+        # the writer does not wait for each reply while the window allows more frames
+        assert frames_in_flight[1] == 1
+        assert 1 < frames_in_flight[8] <= 8
+
+    def test_baudrate_negotiation(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 921600
+                assert device.emulator.baudrate == 921600
+            assert writer.baudrate == 115200
+            assert device.emulator.baudrate == 115200
+            assert writer.baud_registry.get(device.device_name) == 921600
+
+    def test_baudrate_fallback(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            device.emulator.max_reliable_baudrate = 230400
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 230400
+            assert device.emulator.num_lost_bytes > 0
+            assert writer.baud_registry.get(device.device_name) == 230400
+
+            # the next session switches to the recorded rate right away
+            device.emulator.num_lost_bytes = 0
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 230400
+            assert device.emulator.num_lost_bytes == 0
+            assert device.emulator.eeprom == {(23, 16): bytes([12, 12])}
+
+    def test_baudrate_not_recorded_if_no_faster_rate_works(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            device.emulator.max_reliable_baudrate = 115200
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 115200
+            assert writer.baud_registry.get(device.device_name) is None
+
+            # the line got better: faster rates are still tried
+            device.emulator.max_reliable_baudrate = None
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 921600
+
+    def test_old_baudrate_record(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        with EmulatedDevice("switchblox") as device:
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                writer.baud_registry.record(device.device_name, 230400)
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 230400
+
+            # sessions at the recorded rate do not make the record younger
+            with open(get_cache_file(BaudRateRegistry.FILE_NAME), "rt") as f:
+                recorded_at = json.load(f)[device.device_name]["time"]
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 230400
+            with open(get_cache_file(BaudRateRegistry.FILE_NAME), "rt") as f:
+                assert json.load(f)[device.device_name]["time"] == recorded_at
+
+            # faster rates are tried again once the record is old
+            monkeypatch.setattr(UARTWriter, "BAUDRATE_RECHECK_INTERVAL", -1)
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 921600
+            assert writer.baud_registry.get(device.device_name) == 921600
+
+    def test_recorded_baudrate_dropped_if_it_fails(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            device.emulator.max_reliable_baudrate = 115200
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                writer.baud_registry.record(device.device_name, 460800)
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 115200
+            assert writer.baud_registry.get(device.device_name) is None
+
+    def test_board_left_at_recorded_baudrate(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            writer = UARTWriter(device.device_name, protocol="auto", timeout=1)
+            writer.connect()
+            writer.negotiate()
+            assert device.emulator.baudrate == 921600
+            writer._serial.close()  # the program was killed without switching back
+
+            with UARTWriter(device.device_name, protocol="auto", timeout=1) as writer:
+                assert writer.write(self.COMMANDS)
+                assert writer.baudrate == 921600
+            assert device.emulator.baudrate == 115200
+            assert device.emulator.eeprom == {(23, 16): bytes([12, 12])}
+
+    def test_probe(self) -> None:
+        with EmulatedDevice("nano") as device:
+            with UARTWriter(device.device_name, timeout=1) as writer:
+                assert writer.probe() == "switchblox_nano"
+                assert writer.write(self.COMMANDS)
+            assert device.emulator.eeprom == {(23, 16): bytes([12, 12])}
+
+        with EmulatedDevice("nano", framed=False) as device:
+            writer = UARTWriter(device.device_name, timeout=1)
+            start = time.monotonic()
+            with pytest.raises(TimeoutError):
+                writer.probe()
+            assert time.monotonic() - start < UARTWriter.PROBE_ATTEMPTS * UARTWriter.PROBE_TIMEOUT + 0.1
+
+    def test_legacy_firmware(self) -> None:
+        with EmulatedDevice("switchblox", framed=False) as device:
+            assert UARTWriter(device.device_name, rtscts=True, timeout=1).write(self.COMMANDS)
+            assert device.emulator.num_frames == 0
+            assert device.emulator.eeprom == {(23, 16): bytes([12, 12])}
+            assert not UARTWriter(device.device_name, protocol="framed", timeout=1).write(self.COMMANDS)
+
+            # the hello of 'auto' is stored like a register write by the next stop command
+            device.emulator.eeprom.clear()
+            assert UARTWriter(device.device_name, protocol="auto", rtscts=True, timeout=1).write(self.COMMANDS)
+            assert (103, 1) in device.emulator.eeprom
+
+    def test_eeprom_failure(self) -> None:
+        with EmulatedDevice("nano", latency=0.01) as device:
+            device.emulator.fail_store = True
+            assert not UARTWriter(device.device_name, command_gap=0.001, timeout=1).write(self.COMMANDS)
+            assert device.emulator.eeprom == {}
+
+    def test_parallel_provisioning(self) -> None:
+        devices = [EmulatedDevice("switchblox", command_time=0.001) for _ in range(3)]
+        try:
+            jobs = [BatchJob(device.start(), "switchblox", ["vlan", "--group", "1", "2"]) for device in devices]
+            reports = provision(jobs, max_workers=3)
+        finally:
+            for device in devices:
+                device.stop()
+        assert [r.success for r in reports] == [True, True, True]
+        for device in devices:
+            assert device.emulator.registers[(23, 16)] == bytes([12, 12])
+
+    def test_framed_provisioning(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            jobs = [BatchJob(device.device_name, "switchblox", ["vlan", "--group", "1", "2"], {"protocol": "framed"})]
+            assert provision(jobs)[0].success
+            assert device.num_write_frames > 0
+            assert device.emulator.eeprom[(23, 16)] == bytes([12, 12])
@@ -199,6 +199,15 @@ class TestField:
         assert f.is_default()
         assert r.as_number() == 0
 
+        f.set_value(0x1234)
+        for value in (-1, 0x10000):
+            try:
+                f.set_value(value)
+                assert False
+            except ValueError:
+                pass
+            assert r.as_number() == 0x1234  # left untouched
+
     def test_port_list_field(self) -> None:
         switch = ChipStub()
         assert len(switch.ports()) == 3
@@ -244,3 +253,53 @@ class TestField:
         assert len(f2.get_ports()) == 3
         for port in switch.ports():
             assert f2.is_port_set(port)
+
+    def test_invalid_layout_is_rejected_on_construction(self) -> None:
+        r = MIIRegister(1, 2)
+        for create in (lambda: BitField(r, 16, False, "test"),
+                       lambda: BitsField(r, 14, 4, 0, "test"),
+                       lambda: ByteField(r, 2, 0, "test"),
+                       lambda: ShortField(r, 1, 0, "test")):
+            try:
+                create()
+                assert False
+            except ValueError:
+                pass
+
+    def test_value_out_of_range(self) -> None:
+        r = MIIRegister(1, 2)
+        fields = ((BitsField(r, 4, 3, 0, "bits"), 8), (ByteField(r, 1, 0, "byte"), 256))
+        for f, value in fields:
+            try:
+                f.set_value(value)
+                assert False
+            except ValueError:
+                pass
+        assert r.as_number() == 0
+
+        f = ShortField(r, 0, 0, "short")
+        try:
+            f.set_value(0x10000)
+            assert False
+        except ValueError:
+            pass
+
+    def test_register_status_follows_fields(self) -> None:
+        r = MIIRegister(1, 2)
+        f = BitsField(r, 0, 4, 3, "test")
+        f2 = BitField(r, 8, False, "test2")
+        assert r.is_default()
+        assert not r.is_touched()
+
+        f.set_value(5, touch=False)
+        assert not r.is_default()
+        assert not r.is_touched()
+
+        f.set_default()
+        assert r.is_default()
+        assert r.is_touched()
+
+        f2.set_value(True, touch=False)
+        assert not r.is_default()
+        r.set_bit(8, False)
+        assert r.is_default()
@@ -0,0 +1,93 @@
+import pytest
+from botblox_config.switch.commands import CommandBuffer
+from botblox_config.switch.protocol import board_type, BOARD_TYPES, Capabilities, crc16, decode_baudrate, \
+    decode_frame, decode_write, encode_baudrate, encode_write, FLAG_ERASE, FLAG_STORE, Frame, FrameDecoder, FrameType, \
+    write_frames
+
+
+class TestFrame:
+    def test_crc(self) -> None:
+        assert crc16(b'123456789') == 0x29B1  # check value of CRC-16/CCITT-FALSE
+
+    def test_round_trip(self) -> None:
+        frame = Frame(FrameType.WRITE, bytes([FLAG_STORE, 23, 16, 12, 12]), seq=7)
+        data = frame.encode()
+        assert data[:6] == bytes([0xB5, 1, FrameType.WRITE, 7, 5, 0])
+        assert len(data) == 6 + 5 + 2
+        assert decode_frame(data) == frame
+
+    def test_corrupted_frame(self) -> None:
+        data = bytearray(Frame(FrameType.STATUS, b'\x01').encode())
+        data[6] ^= 0x04
+        with pytest.raises(ValueError):
+            decode_frame(bytes(data))
+        with pytest.raises(ValueError):
+            decode_frame(bytes(data[:-1]))
+
+    def test_decoder_resynchronizes(self) -> None:
+        first = Frame(FrameType.STATUS, b'\x01', seq=1)
+        second = Frame(FrameType.STATUS, b'\x02', seq=2)
+        corrupted = bytearray(first.encode())
+        corrupted[-1] ^= 0xFF
+        data = b'\x00\x01' + bytes(corrupted) + first.encode() + second.encode()
+
+        decoder = FrameDecoder()
+        frames = [frame for i in range(len(data)) for frame in decoder.feed(data[i:i + 1])]
+        assert frames == [first, second]
+        assert decoder.num_crc_errors == 1
+
+
+class TestWrite:
+    commands = [[23, 16, 12, 12], [24, 0, 0, 160], [25, 1, 2, 3]]
+
+    def test_payload(self) -> None:
+        payload = encode_write(self.commands, erase=True)
+        assert payload[0] == FLAG_ERASE | FLAG_STORE
+        flags, commands = decode_write(payload)
+        assert flags == FLAG_ERASE | FLAG_STORE
+        assert commands == self.commands
+
+    def test_split_into_frames(self) -> None:
+        frames = write_frames(CommandBuffer(self.commands), erase=True, max_payload=9, seq=255)
+        assert [frame.seq for frame in frames] == [255, 0]
+        assert [decode_write(frame.payload)[0] for frame in frames] == [FLAG_ERASE, FLAG_STORE]
+        assert [decode_write(frame.payload)[1] for frame in frames] == [self.commands[:2], self.commands[2:]]
+
+    def test_empty_write(self) -> None:
+        frames = write_frames([], erase=True, max_payload=256)
+        assert [frame.payload for frame in frames] == [bytes([FLAG_ERASE | FLAG_STORE])]
+
+    def test_baudrate(self) -> None:
+        assert decode_baudrate(encode_baudrate(921600)) == 921600
+        with pytest.raises(ValueError):
+            decode_baudrate(b'\x00\x10')
+
+    def test_payload_too_small(self) -> None:
+        with pytest.raises(ValueError):
+            write_frames(self.commands, erase=False, max_payload=4)
+
+
+class TestCapabilities:
+    def test_round_trip(self) -> None:
+        # newer firmware may add bytes
+        capabilities = Capabilities.decode(Capabilities(1, 2, 512, [115200, 921600], 16).encode() + b'\xff')
+        assert (capabilities.version, capabilities.board, capabilities.max_payload) == (1, 2, 512)
+        assert capabilities.baudrates == (115200, 921600)
+        assert capabilities.window == 16
+        assert capabilities.switch_type == 'switchblox_nano'
+        with pytest.raises(ValueError):
+            Capabilities.decode(b'\x01\x02')
+        with pytest.raises(ValueError):
+            Capabilities.decode(Capabilities(1, 2, 512, [115200]).encode()[:-2])
+
+    def test_older_firmware(self) -> None:
+        capabilities = Capabilities.decode(bytes([1, 1, 0, 1]))
+        assert (capabilities.baudrates, capabilities.window) == ((), 1)
+        capabilities = Capabilities.decode(Capabilities(1, 1, 256, [115200], 8).encode()[:-1])
+        assert (capabilities.baudrates, capabilities.window) == ((115200,), 1)
+        assert Capabilities(1, 1, 256, window=1000).window == 64
+
+    def test_board_types(self) -> None:
+        for board, switch_type in BOARD_TYPES.items():
+            assert board_type(switch_type) == board
+        assert board_type('nano') == board_type('switchblox_nano')
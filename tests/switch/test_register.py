@@ -198,3 +198,20 @@ class TestRegister:
         assert r.get_bit(15) == 1
 
         assert r.as_number() == 0b1010_0101_1100_1111
+
+    def test_register_bind(self) -> None:
+        buffer = bytearray(4)
+        r = MIIRegister(3, 4)
+        r.set_byte(0, 0xAB)
+        r.bind(memoryview(buffer)[2:4])
+        assert buffer == bytearray([0, 0, 0xAB, 0])
+
+        r.set_bits(6, 4, 0b1010)
+        assert buffer == bytearray([0, 0, 0b1010_1011, 0b0000_0010])
+        assert r.as_number() == 0b0000_0010_1010_1011
+
+        try:
+            r.bind(memoryview(buffer)[0:1])
+            assert False
+        except ValueError:
+            pass
@@ -0,0 +1,42 @@
+from typing import cast, List, Tuple
+
+from botblox_config.switch import create_switch
+from botblox_config.switch.fields import BitField, BitsField, PortListField
+from botblox_config.switch.register import MIIRegister
+
+
+def addresses(registers: List[MIIRegister]) -> List[Tuple[int, int]]:
+    return sorted([(r.address.phy, r.address.mii) for r in registers])
+
+
+class TestSelectRegisters:
+    def test_fresh_switch(self) -> None:
+        switch = create_switch("switchblox")
+        assert switch.select_registers(leave_out_default=True) == []
+        assert switch.select_registers(leave_out_default=False, only_touched=True) == []
+        assert len(switch.select_registers(leave_out_default=False)) == len(switch.get_registers())
+
+    def test_status_is_updated_incrementally(self) -> None:
+        switch = create_switch("switchblox")
+        cast(BitField, switch.fields["VLAN_TABLE_CLR"]).set_value(True)
+        cast(BitsField, switch.fields["VID_0"]).set_value(1)  # the default value
+        cast(PortListField, switch.fields["ADD_TAG"]).add_port(switch.get_port("1"), touch=False)
+
+        assert addresses(switch.select_registers(leave_out_default=True)) == [(23, 0), (23, 13)]
+        assert addresses(switch.select_registers(leave_out_default=False, only_touched=True)) == [(23, 0), (24, 1)]
+        assert addresses(switch.select_registers(leave_out_default=True, only_touched=True)) == [(23, 0)]
+
+        cast(BitField, switch.fields["VLAN_TABLE_CLR"]).set_value(False)
+        cast(PortListField, switch.fields["ADD_TAG"]).clear(touch=False)
+        assert switch.select_registers(leave_out_default=True) == []
+        assert addresses(switch.select_registers(leave_out_default=False, only_touched=True)) == [(23, 0), (24, 1)]
+
+    def test_set_image_updates_status(self) -> None:
+        switch = create_switch("switchblox")
+        other = create_switch("switchblox")
+        cast(BitsField, other.fields["VLAN_VALID"]).set_value(3)
+
+        assert switch.select_registers(leave_out_default=True) == []
+        switch.set_image(other.get_image())
+        assert addresses(switch.select_registers(leave_out_default=True)) == [(24, 0)]
+        assert switch.get_commands() == [[24, 0, 3, 0]]
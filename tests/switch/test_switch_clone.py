@@ -0,0 +1,40 @@
+from typing import cast
+
+from botblox_config.switch import create_switch
+from botblox_config.switch.fields import BitsField, PortListField
+from botblox_config.switch.switchblox import Switchblox
+
+
+class TestSwitchClone:
+    def test_create_returns_independent_instances(self) -> None:
+        switch = Switchblox.create()
+        other = Switchblox.create()
+        assert isinstance(switch, Switchblox)
+        assert switch is not other
+        assert switch.get_image() == Switchblox().get_image()
+        assert switch.get_commands() == []
+
+        cast(BitsField, switch.fields["VID_0"]).set_value(42)
+        assert cast(BitsField, other.fields["VID_0"]).get_value() == 1
+        assert cast(BitsField, Switchblox.create().fields["VID_0"]).get_value() == 1
+        assert switch.get_commands() == [[24, 1, 42, 0]]
+        assert other.get_commands() == []
+
+    def test_clone_keeps_values_and_touched_flags(self) -> None:
+        switch = create_switch("switchblox")
+        cast(BitsField, switch.fields["VID_1"]).set_value(3)
+        member = cast(PortListField, switch.fields["VLAN_MEMBER_1"])
+        member.clear()
+        member.add_port(switch.get_port("2"))
+
+        copy = switch.clone()
+        assert copy.image_digest() == switch.image_digest()
+        assert copy.get_commands(only_touched=True) == switch.get_commands(only_touched=True)
+        copy_member = cast(PortListField, copy.fields["VLAN_MEMBER_1"])
+        assert [p.name for p in copy_member.get_ports()] == ["2"]
+
+        # port list fields of the copy write to the copy's registers only
+        copy_member.add_port(copy.get_port("3"))
+        assert [p.name for p in member.get_ports()] == ["2"]
+        assert [p.name for p in copy_member.get_ports()] == ["2", "3"]
+        assert switch.diff_registers(copy) != []
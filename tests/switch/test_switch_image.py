@@ -0,0 +1,48 @@
+from typing import cast
+
+import pytest
+from botblox_config.switch import create_switch
+from botblox_config.switch.fields import BitField, BitsField, PortListField
+from botblox_config.switch.register import MIIRegisterAddress
+
+
+class TestSwitchImage:
+    def test_registers_are_views_of_image(self) -> None:
+        switch = create_switch("switchblox")
+        image = switch.get_image()
+        assert len(image) == 2 * len(switch.get_registers())
+
+        cast(BitField, switch.fields["VLAN_TABLE_CLR"]).set_value(True)
+        register = switch.get_registers()[MIIRegisterAddress(23, 0)]
+        assert register.as_bytes() == [0, 128]
+        assert switch.get_image() != image
+        assert switch.get_image()[0:2] == b'\x00\x80'
+
+    def test_set_image(self) -> None:
+        switch = create_switch("switchblox")
+        cast(BitsField, switch.fields["VID_0"]).set_value(42)
+        cast(PortListField, switch.fields["VLAN_MEMBER_0"]).clear()
+        cast(PortListField, switch.fields["VLAN_MEMBER_0"]).add_port(switch.get_port("2"))
+
+        other = create_switch("switchblox")
+        assert other.image_digest() != switch.image_digest()
+        other.set_image(switch.get_image())
+        assert other.image_digest() == switch.image_digest()
+        assert cast(BitsField, other.fields["VID_0"]).get_value() == 42
+        assert [p.name for p in cast(PortListField, other.fields["VLAN_MEMBER_0"]).get_ports()] == ["2"]
+
+        with pytest.raises(ValueError):
+            other.set_image(b'\x00')
+
+    def test_diff_registers(self) -> None:
+        switch = create_switch("switchblox")
+        other = create_switch("switchblox")
+        assert switch.diff_registers(other) == []
+
+        cast(BitsField, switch.fields["VID_1"]).set_value(3)
+        cast(BitField, switch.fields["UNVID_MODE"]).set_value(True)
+        diff = switch.diff_registers(other.get_image())
+        assert sorted([(r.address.phy, r.address.mii) for r in diff]) == [(23, 0), (24, 2)]
+
+        with pytest.raises(ValueError):
+            switch.diff_registers(create_switch("nano"))
@@ -23,7 +23,7 @@ class TestSetGroups:
             '-v', '2', '1', '4'
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
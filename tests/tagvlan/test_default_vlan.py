@@ -20,7 +20,7 @@ class TestSetGroups:
             '20',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -39,7 +39,7 @@ class TestSetGroups:
             '20',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -56,7 +56,7 @@ class TestSetGroups:
             '21'
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -131,7 +131,7 @@ class TestSetGroups:
             '20',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -149,7 +149,7 @@ class TestSetGroups:
             '21',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -19,7 +19,7 @@ class TestSetGroups:
             '--force-vlan-id',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -33,7 +33,7 @@ class TestSetGroups:
             '2',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -48,7 +48,7 @@ class TestSetGroups:
             '5',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -20,7 +20,7 @@ class TestSetGroups:
             'KEEP',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -35,7 +35,7 @@ class TestSetGroups:
             'ADD',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -50,7 +50,7 @@ class TestSetGroups:
             'STRIP',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -104,7 +104,7 @@ class TestSetGroups:
             'KEEP',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -120,7 +120,7 @@ class TestSetGroups:
             'ADD',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -136,7 +136,7 @@ class TestSetGroups:
             'STRIP',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -255,7 +255,7 @@ class TestSetGroups:
             'STRIP'
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -274,7 +274,7 @@ class TestSetGroups:
             'ADD'
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -292,7 +292,7 @@ class TestSetGroups:
             'ADD'
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -20,7 +20,7 @@ class TestSetGroups:
             'DISABLED',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -35,7 +35,7 @@ class TestSetGroups:
             'OPTIONAL',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -50,7 +50,7 @@ class TestSetGroups:
             'ENABLED',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -66,7 +66,7 @@ class TestSetGroups:
             'STRICT',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -120,7 +120,7 @@ class TestSetGroups:
             'DISABLED',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -136,7 +136,7 @@ class TestSetGroups:
             'OPTIONAL',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -152,7 +152,7 @@ class TestSetGroups:
             'ENABLED',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -169,7 +169,7 @@ class TestSetGroups:
             'STRICT',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -289,7 +289,7 @@ class TestSetGroups:
             'ENABLED'
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -332,7 +332,7 @@ class TestSetGroups:
             'STRICT'
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [
@@ -0,0 +1,170 @@
+import json
+import os
+from typing import Any, List, Sequence
+
+import pytest
+from botblox_config import batch
+from botblox_config.batch import BatchJob, load_manifest, provision
+from botblox_config.compiler import CommandCache
+from botblox_config.switch.commands import CommandBuffer
+from botblox_config.switch.config_writer import UARTWriter
+from botblox_config.switch.device_state import DeviceStateStore
+
+
+class TestBatch:
+    def test_load_manifest(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "manifest.json")
+        with open(path, "wt") as f:
+            json.dump({
+                "configs": {"office": ["tag-vlan", "--vlan", "2", "1", "2"]},
+                "devices": [
+                    {"device": "/dev/ttyUSB0", "config": "office"},
+                    {"device": "/dev/ttyUSB1", "switch": "nano", "config": ["erase"]},
+                ],
+            }, f)
+
+        jobs = load_manifest(path)
+        assert len(jobs) == 2
+        assert jobs[0].device == "/dev/ttyUSB0"
+        assert jobs[0].switch_type == "switchblox"
+        assert jobs[0].config_args == ("tag-vlan", "--vlan", "2", "1", "2")
+        assert jobs[1].switch_type == "nano"
+        assert jobs[1].config_args == ("erase",)
+
+    def test_load_manifest_writer_settings(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "manifest.json")
+        with open(path, "wt") as f:
+            json.dump({"devices": [
+                {"device": "/dev/ttyUSB0", "config": ["erase"], "rtscts": True, "command_gap": 0.02,
+                 "protocol": "framed", "negotiate_baudrate": False},
+                {"device": "/dev/ttyUSB1", "config": ["erase"]},
+            ]}, f)
+
+        jobs = load_manifest(path)
+        assert jobs[0].writer_settings == {"rtscts": True, "command_gap": 0.02, "protocol": "framed",
+                                           "negotiate_baudrate": False}
+        assert jobs[1].writer_settings == {}
+
+        with open(path, "wt") as f:
+            json.dump({"devices": [{"device": "/dev/ttyUSB0", "config": ["erase"], "adaptive_gap": "yes"}]}, f)
+        with pytest.raises(ValueError):
+            load_manifest(path)
+
+    def test_writer_settings(self, tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        writers: List[UARTWriter] = list()
+        monkeypatch.setattr(UARTWriter, "connect", lambda self: None)
+        monkeypatch.setattr(UARTWriter, "disconnect", lambda self: None)
+        monkeypatch.setattr(UARTWriter, "write", lambda self, data: writers.append(self) or True)
+
+        jobs = [BatchJob("/dev/ttyUSB0", "switchblox", ["erase"], {"command_gap": 0.02}),
+                BatchJob("/dev/ttyUSB1", "switchblox", ["erase"]),
+                BatchJob("/dev/ttyUSB2", "switchblox", ["erase"], {"rtscts": True})]
+        reports = provision(jobs, max_workers=1, state_store=DeviceStateStore(os.path.join(tmp_path, "s.json")),
+                            writer_settings={"command_gap": 0.05})
+
+        assert all(r.success for r in reports)
+        assert writers[0].command_gap == 0.02  # the setting of the job wins
+        assert writers[1].command_gap == 0.05
+        assert writers[2].settings.rtscts and writers[2].command_gap == 0.0
+
+    def test_load_manifest_unknown_config(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "manifest.json")
+        with open(path, "wt") as f:
+            json.dump({"devices": [{"device": "/dev/ttyUSB0", "config": "missing"}]}, f)
+
+        with pytest.raises(ValueError):
+            load_manifest(path)
+
+    def test_commands_compiled_once_per_config(self, tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        compiled: List[Sequence[str]] = list()
+        compile_commands = batch.compile_commands
+
+        def counting_compile_commands(switch_type: str, config_args: Sequence[str]) -> List[List[int]]:
+            compiled.append(config_args)
+            return compile_commands(switch_type, config_args)
+
+        monkeypatch.setattr(batch, "compile_commands", counting_compile_commands)
+
+        jobs = [BatchJob("test", "switchblox", ["erase"]) for _ in range(10)]
+        jobs.append(BatchJob("test", "switchblox", ["tag-vlan", "--reset"]))
+        reports = provision(jobs, max_workers=4, state_store=DeviceStateStore(os.path.join(tmp_path, "s.json")))
+
+        assert len(compiled) == 2
+        assert len(reports) == 11
+        assert all(r.success for r in reports)
+        assert reports[0].num_commands == 2
+        assert reports[0].attempts == 1
+        assert reports[10].num_commands == 7
+
+    def test_equivalent_configs_share_the_cache(self, tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        compiled: List[Sequence[str]] = list()
+        compile_commands = batch.compile_commands
+
+        def counting_compile_commands(switch_type: str, config_args: Sequence[str]) -> List[List[int]]:
+            compiled.append(config_args)
+            return compile_commands(switch_type, config_args)
+
+        monkeypatch.setattr(batch, "compile_commands", counting_compile_commands)
+        jobs = [
+            BatchJob("test", "switchblox", ["vlan", "--group", "1", "2"]),
+            BatchJob("test", "switchblox", ["vlan", "-g", "1", "2"]),
+            BatchJob("test", "switchblox", ["mirror", "--rx-port", "3", "--mirror-port", "4"]),
+            BatchJob("test", "switchblox", ["mirror", "--mirror-port", "4", "--rx-port", "3"]),
+            BatchJob("test", "switchblox", ["vlan", "--group", "1", "3"]),
+        ]
+        reports = provision(jobs, command_cache=CommandCache(os.path.join(tmp_path, "commands")),
+                            state_store=DeviceStateStore(os.path.join(tmp_path, "s.json")))
+
+        assert all(r.success for r in reports)
+        assert compiled == [tuple(jobs[0].config_args), tuple(jobs[2].config_args), tuple(jobs[4].config_args)]
+        assert reports[1].num_commands == reports[0].num_commands
+
+    def test_failures_are_reported(self, tmp_path: str) -> None:
+        jobs = [
+            BatchJob("test", "switchblox", ["mirror", "--mirror-port", "9"]),
+            BatchJob("COM1", "switchblox", ["erase"]),
+            BatchJob("test", "unknown", ["erase"]),
+        ]
+        reports = provision(jobs, state_store=DeviceStateStore(os.path.join(tmp_path, "s.json")))
+
+        assert [r.success for r in reports] == [False, False, False]
+        assert all(r.error is not None for r in reports)
+        assert reports[0].as_dict()["retries"] == 0
+
+    def test_retries_are_the_only_repeats(self, tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        pushes: List[bytes] = list()
+        monkeypatch.setattr(UARTWriter, "connect", lambda self: None)
+        monkeypatch.setattr(UARTWriter, "disconnect", lambda self: None)
+        monkeypatch.setattr(UARTWriter, "negotiate", lambda self: None)
+        monkeypatch.setattr(UARTWriter, "_push", lambda self, data: pushes.append(data.tobytes()) or b'')
+
+        jobs = [BatchJob("/dev/ttyUSB0", "switchblox", ["erase"])]
+        reports = provision(jobs, retries=2, state_store=DeviceStateStore(os.path.join(tmp_path, "s.json")))
+
+        assert not reports[0].success
+        assert reports[0].attempts == 3
+        assert len(pushes) == 3
+
+    def test_changed_profile_is_compiled_again(self, tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        pushed: List[List[List[int]]] = list()
+        provision_device = batch.provision_device
+
+        def recording_provision_device(job: BatchJob, commands: CommandBuffer, *args: Any) -> batch.DeviceReport:
+            pushed.append(commands.tolist())
+            return provision_device(job, commands, *args)
+
+        monkeypatch.setattr(batch, "provision_device", recording_provision_device)
+        profile = os.path.join(tmp_path, "site.json")
+        command_cache = CommandCache(os.path.join(tmp_path, "commands"))
+        state_store = DeviceStateStore(os.path.join(tmp_path, "s.json"))
+        jobs = [BatchJob("test", "switchblox", ["vlan", "--reset", "+", "apply", "-p", profile])]
+
+        for groups in ([[1, 2]], [[1, 3]]):
+            with open(profile, "wt") as f:
+                json.dump({"switch": "switchblox", "vlan": {"groups": groups}}, f)
+            assert provision(jobs, state_store=state_store, command_cache=command_cache)[0].success
+        assert [23, 16, 12, 12] in pushed[0]
+        assert [23, 16, 20, 255] in pushed[1]
+
+        assert batch.args_identify_config(["vlan", "--reset", "+", "mirror", "--reset"])
+        assert not batch.args_identify_config(["vlan", "--reset", "+", "apply", "-p", profile])
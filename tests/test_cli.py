@@ -0,0 +1,182 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botblox_config.cli import create_parser, get_parser, run
+from botblox_config.data_manager.argparse_utils import LazySubParsersAction
+from botblox_config.switch.baud_registry import BaudRateRegistry
+from botblox_config.switch.config_writer import UARTSettings, UARTWriter
+from botblox_config.switch.device_state import ERASE_COMMAND, STOP_COMMAND
+from botblox_config.switch.emulator import EmulatedDevice
+from pytest import CaptureFixture
+
+from .conftest import get_data_from_cli_args
+
+
+class TestCli:
+    def test_only_selected_command_is_loaded(self) -> None:
+        code = (
+            "import sys\n"
+            "from botblox_config.cli import create_parser\n"
+            "create_parser().parse_args(['--device', 'test', 'vlan', '--reset'])\n"
+            "sys.stdout.write(' '.join(sorted(m for m in sys.modules if m.startswith('botblox_config'))))\n"
+        )
+        modules = subprocess.check_output([sys.executable, "-c", code]).decode().split()
+        assert "botblox_config.data_manager.vlan" in modules
+        assert "botblox_config.data_manager.tagvlan" not in modules
+        assert "botblox_config.data_manager.mirror" not in modules
+
+    def test_command_parser_follows_switch_type(self) -> None:
+        parser = create_parser()
+        nano_args = ["--switch", "nano", "--device", "test", "tag-vlan", "--vlan", "2", "1"]
+        assert len(get_data_from_cli_args(parser=parser, args=nano_args)) > 0
+
+        # port 5 exists only on the full switchblox, the parser has to be rebuilt for it
+        args = ["--device", "test", "tag-vlan", "--vlan", "2", "5"]
+        assert len(get_data_from_cli_args(parser=parser, args=args)) > 0
+
+
+class TestRun:
+    def test_configuration(self) -> None:
+        result = run(["--device", "test", "vlan", "--group", "1", "2"])
+        assert result.success
+        assert result.commands == [[23, 16, 12, 12], [23, 17, 255, 0], [23, 18, 255, 255], [STOP_COMMAND, 0, 0, 0]]
+        assert result.errors == ""
+
+    def test_argument_error(self, capfd: CaptureFixture) -> None:
+        result = run(["--device", "test", "mirror", "-m", "TX", "-M", "1"])
+        assert result.exit_code == 2
+        assert result.commands is None
+        assert "botblox mirror: error: the following arguments are required: -tx/--tx-port" in result.errors
+        assert capfd.readouterr() == ("", "")
+
+    def test_help(self) -> None:
+        result = run([])
+        assert result.success
+        assert result.output.startswith("usage: botblox")
+
+    def test_failed_write(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(UARTWriter, "connect", lambda self: None)
+        monkeypatch.setattr(UARTWriter, "write", lambda self, data: False)
+        result = run(["--device", "/dev/ttyUSB0", "erase"])
+        assert result.exit_code == 1
+        assert result.commands == [[ERASE_COMMAND, 0, 0, 0], [STOP_COMMAND, 0, 0, 0]]
+        assert "Failed to configure /dev/ttyUSB0" in result.errors
+
+    def test_writer_settings(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        writers = list()
+        monkeypatch.setattr(UARTWriter, "connect", lambda self: None)
+        monkeypatch.setattr(UARTWriter, "write", lambda self, data: writers.append(self) or True)
+
+        assert run(["--device", "/dev/ttyUSB0", "--rtscts", "--adaptive-gap", "erase"]).success
+        assert writers[-1].settings.rtscts
+        assert writers[-1].settings.command_gap == 0.0  # paced by flow control
+
+        assert run(["--device", "/dev/ttyUSB0", "--command-gap", "0.02", "erase"]).success
+        assert not writers[-1].settings.rtscts
+        assert writers[-1].command_gap == 0.02
+
+        assert run(["--device", "/dev/ttyUSB0", "--adaptive-gap", "erase"]).success
+        assert writers[-1].command_gap == UARTSettings.FAST_COMMAND_GAP
+
+        assert run(["--device", "/dev/ttyUSB0", "erase"]).success
+        assert writers[-1].command_gap == UARTSettings.DEFAULT_COMMAND_GAP
+        assert writers[-1].settings.protocol == "legacy"
+
+        assert run(["--device", "/dev/ttyUSB0", "--protocol", "framed", "erase"]).success
+        assert writers[-1].settings.protocol == "framed"
+        assert run(["--device", "/dev/ttyUSB0", "--protocol", "frames", "erase"]).exit_code == 2
+
+        result = run(["--device", "/dev/ttyUSB0", "--adaptive-gap", "--command-gap", "0.02", "erase"])
+        assert result.exit_code == 2
+        assert "not allowed with argument" in result.errors
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+    def test_framed_protocol(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            result = run(["--device", device.device_name, "--protocol", "framed", "vlan", "--group", "1", "2"])
+            assert result.success
+            assert device.num_write_frames > 0
+            assert device.emulator.eeprom[(23, 16)] == bytes([12, 12])
+            assert BaudRateRegistry().get(device.device_name) == 921600  # the session switched to the fastest rate
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+    def test_no_baud_negotiation(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            result = run(["--device", device.device_name, "--protocol", "framed", "--no-baud-negotiation",
+                          "vlan", "--group", "1", "2"])
+            assert result.success
+            assert device.num_write_frames > 0
+            assert BaudRateRegistry().get(device.device_name) is None
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+    def test_probe(self) -> None:
+        with EmulatedDevice("switchblox") as device:
+            result = run(["--device", device.device_name, "--probe", "vlan", "--group", "1", "2"])
+            assert result.success
+            assert device.emulator.eeprom[(23, 16)] == bytes([12, 12])
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+    def test_probe_without_board(self) -> None:
+        with EmulatedDevice("switchblox", framed=False) as device:  # nothing answers the probe
+            start = time.monotonic()
+            result = run(["--device", device.device_name, "--probe", "erase"])
+            assert time.monotonic() - start < 1
+            assert result.exit_code == 1
+            assert result.commands is None
+            assert "No board answers on " + device.device_name in result.errors
+            assert device.emulator.num_stores == 0
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+    def test_no_probe_by_default(self) -> None:
+        with EmulatedDevice("switchblox", framed=False) as device:  # older firmware takes the probe for a write
+            result = run(["--device", device.device_name, "vlan", "--group", "1", "2"])
+            assert result.success
+            assert device.emulator.eeprom[(23, 16)] == bytes([12, 12])
+            assert all(address[0] == 23 for address in device.emulator.eeprom)
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+    def test_probe_wrong_switch(self) -> None:
+        with EmulatedDevice("nano") as device:
+            result = run(["--device", device.device_name, "--probe", "--switch", "switchblox", "erase"])
+            assert result.exit_code == 1
+            assert "Device is a switchblox_nano, not a switchblox" in result.errors
+            assert device.emulator.num_stores == 0
+
+
+class TestReusableParser:
+    def test_command_lines_are_independent(self) -> None:
+        parser = create_parser()
+        vlan = run(["--device", "test", "vlan", "--group", "1", "2"], parser).commands
+        run(["--device", "test", "tag-vlan", "--vlan", "2", "1", "2"], parser)
+        assert run(["--device", "test", "vlan", "--group", "1", "2"], parser).commands == vlan
+        assert run(["--device", "test", "vlan", "--reset"], parser).commands != vlan
+
+    def test_parsers_are_built_once_per_switch_type(self) -> None:
+        parser = get_parser()
+        assert parser is get_parser()
+        run(["--switch", "nano", "--device", "test", "tag-vlan", "--vlan", "2", "1"], parser)
+        subparsers = next(a for a in parser._actions if isinstance(a, LazySubParsersAction))
+        nano = subparsers.build("tag-vlan", "nano")
+        run(["--device", "test", "tag-vlan", "--vlan", "2", "5"], parser)
+        assert subparsers.build("tag-vlan", "nano") is nano
+        assert subparsers.build("tag-vlan", "switchblox") is not nano
+
+    def test_concurrent_parsing(self) -> None:
+        command_lines = [
+            ["--device", "test", "vlan", "--group", "1", "2"],
+            ["--switch", "nano", "--device", "test", "tag-vlan", "--vlan", "2", "1", "2"],
+            ["--device", "test", "mirror", "-m", "TX", "-tx", "2"],
+            ["--device", "test", "mirror", "-m", "TX"],
+        ]
+        expected = [run(argv, create_parser()) for argv in command_lines]
+        parser = create_parser()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda argv: run(argv, parser), command_lines * 25))
+        for i, result in enumerate(results):
+            assert result.exit_code == expected[i % len(command_lines)].exit_code
+            assert result.commands == expected[i % len(command_lines)].commands
+            assert result.errors == expected[i % len(command_lines)].errors
@@ -0,0 +1,82 @@
+import os
+from typing import Any, List
+
+import pytest
+from botblox_config import batch
+from botblox_config.batch import BatchJob, provision
+from botblox_config.compiler import CommandCache, compile_config, config_key, decode_commands, encode_commands
+from botblox_config.switch.device_state import DeviceStateStore
+
+
+class TestCommandBlob:
+    def test_round_trip(self) -> None:
+        commands = [[101, 0, 0, 0], [23, 16, 12, 12], [100, 0, 0, 0]]
+        blob = encode_commands(commands)
+        assert blob == bytes([101, 0, 0, 0, 23, 16, 12, 12, 100, 0, 0, 0])
+        assert decode_commands(blob) == commands
+
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError):
+            encode_commands([[23, 16, 1]])
+        with pytest.raises(ValueError):
+            encode_commands([[23, 16, 1, 256]])
+        with pytest.raises(ValueError):
+            decode_commands(b'\x17\x10\x01')
+
+
+class TestCompileConfig:
+    def test_key(self) -> None:
+        assert config_key('nano', ['erase']) == config_key('switchblox_nano', ['erase'])
+        assert config_key('nano', ['erase']) != config_key('switchblox', ['erase'])
+        assert config_key('switchblox', {'a': 1, 'b': 2}) == config_key('switchblox', {'b': 2, 'a': 1})
+        with pytest.raises(ValueError):
+            config_key('unknown', ['erase'])
+
+    def test_built_once(self, tmp_path: Any) -> None:
+        built: List[int] = list()
+
+        def build() -> List[List[int]]:
+            built.append(1)
+            return [[23, 16, 12, 12]]
+
+        cache = CommandCache(str(tmp_path))
+        for _ in range(3):
+            assert compile_config('switchblox', ['vlan'], build, cache) == [[23, 16, 12, 12]]
+        assert len(built) == 1
+        compile_config('switchblox', ['vlan'], build)
+        assert len(built) == 2
+
+    def test_damaged_blob_is_rebuilt(self, tmp_path: Any) -> None:
+        cache = CommandCache(str(tmp_path))
+        cache.put(config_key('switchblox', ['vlan']), b'\x17\x10')
+        assert compile_config('switchblox', ['vlan'], lambda: [[23, 16, 12, 12]], cache) == [[23, 16, 12, 12]]
+        assert cache.get(config_key('switchblox', ['vlan'])) == bytes([23, 16, 12, 12])
+
+    def test_lru_eviction(self, tmp_path: Any) -> None:
+        cache = CommandCache(str(tmp_path), max_entries=2)
+        cache.put('a', b'\x00\x00\x00\x01')
+        cache.put('b', b'\x00\x00\x00\x02')
+        os.utime(os.path.join(str(tmp_path), 'a.bin'), (1, 1))
+        os.utime(os.path.join(str(tmp_path), 'b.bin'), (2, 2))
+        assert cache.get('a') is not None  # used recently now
+        cache.put('c', b'\x00\x00\x00\x03')
+        assert sorted(cache.keys()) == ['a', 'c']
+        assert cache.get('b') is None
+
+    def test_batch_uses_cache(self, tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+        compiled: List[Any] = list()
+        compile_commands = batch.compile_commands
+
+        def counting_compile_commands(switch_type: str, config_args: Any) -> List[List[int]]:
+            compiled.append(config_args)
+            return compile_commands(switch_type, config_args)
+
+        monkeypatch.setattr(batch, "compile_commands", counting_compile_commands)
+        state_store = DeviceStateStore(os.path.join(str(tmp_path), "s.json"))
+        jobs = [BatchJob("test", "switchblox", ["tag-vlan", "--reset"]), BatchJob("test", "nano", ["erase"])]
+
+        first = provision(jobs, state_store=state_store)
+        second = provision(jobs, state_store=state_store)
+        assert len(compiled) == 2
+        assert [r.num_commands for r in first] == [r.num_commands for r in second] == [7, 2]
+        assert all(r.success for r in first + second)
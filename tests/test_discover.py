@@ -0,0 +1,117 @@
+import json
+import os
+import time
+from typing import List, Optional
+
+import pytest
+from botblox_config import discover
+from botblox_config.cli import run
+from botblox_config.discover import DiscoveredPort, DiscoveryCache
+from botblox_config.switch.device_state import STOP_COMMAND
+from botblox_config.switch.emulator import EmulatedDevice
+from serial.tools.list_ports_common import ListPortInfo
+
+
+def list_port(device: str, serial_number: Optional[str] = None, vid: Optional[int] = 0x0403) -> ListPortInfo:
+    port = ListPortInfo(device, skip_link_detection=True)
+    port.serial_number = serial_number
+    port.vid, port.pid = (vid, 0x6001) if vid is not None else (None, None)
+    return port
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs pseudo-terminals")
+class TestDiscover:
+    @pytest.fixture
+    def devices(self, monkeypatch: pytest.MonkeyPatch) -> List[EmulatedDevice]:
+        devices = [EmulatedDevice("switchblox"), EmulatedDevice("nano"), EmulatedDevice("switchblox", framed=False)]
+        ports = [list_port(device.start(), "SN{}".format(i)) for i, device in enumerate(devices)]
+        ports.append(list_port("/dev/botblox-missing", "SN9"))
+        ports.append(list_port("/dev/ttyS0", vid=None))  # built-in serial port
+        monkeypatch.setattr(discover.list_ports, "comports", lambda: ports)
+        yield devices
+        for device in devices:
+            device.stop()
+
+    def test_discover(self, devices: List[EmulatedDevice], tmp_path: str) -> None:
+        cache = DiscoveryCache(os.path.join(tmp_path, DiscoveryCache.FILE_NAME))
+        start = time.monotonic()
+        ports = {port.serial_number: port for port in discover.discover(cache=cache)}
+        assert time.monotonic() - start < 0.5  # probed at the same time
+
+        assert ports["SN0"].found and ports["SN0"].switch_type == "switchblox"
+        assert ports["SN1"].found and ports["SN1"].switch_type == "switchblox_nano"
+        assert not ports["SN2"].found and ports["SN2"].error is None  # firmware does not answer the probe
+        assert not ports["SN9"].found and ports["SN9"].error is not None
+        assert all(device.emulator.num_stores == 0 for device in devices)
+
+        assert cache.get("SN0")["device"] == devices[0].device_name
+        assert cache.get("SN1")["switch"] == "switchblox_nano"
+        assert cache.get("SN2")["board"] is False
+        assert cache.get("SN9") is None  # could not be opened
+
+    def test_only_usb_ports(self, devices: List[EmulatedDevice]) -> None:
+        ports = discover.list_candidate_ports()
+        assert "/dev/ttyS0" not in [port.device for port in ports]
+        assert len(ports) == 4
+
+    def test_discover_one_at_a_time(self, devices: List[EmulatedDevice]) -> None:
+        ports = discover.discover([DiscoveredPort(device.device_name) for device in devices], workers=1)
+        assert [port.found for port in ports] == [True, True, False]
+
+    def test_cli_without_probing(self, devices: List[EmulatedDevice], capsys: pytest.CaptureFixture) -> None:
+        result = run(["discover"])
+        assert result.exit_code == 0
+        out = capsys.readouterr().out
+        assert "{} [SN2]: USB serial port".format(devices[2].device_name) in out
+        assert "BotBlox board" not in out
+
+        # nothing was sent, so the board with older firmware has no command queued that it could store
+        assert all(device.emulator.num_commands == 0 for device in devices)
+        devices[2].emulator.feed(bytes([STOP_COMMAND, 0, 0, 0]))
+        assert devices[2].emulator.eeprom == {}
+        assert run(["discover", "--cached"]).exit_code == 0
+        assert "SN0" not in capsys.readouterr().out  # ports that were not probed are not recorded
+
+    def test_cli(self, devices: List[EmulatedDevice], capsys: pytest.CaptureFixture) -> None:
+        result = run(["discover", "--framed-firmware"])
+        assert result.exit_code == 0
+        out = capsys.readouterr().out
+        assert "{} [SN0]: BotBlox board (switchblox)".format(devices[0].device_name) in out
+        assert "{} [SN2]: no board".format(devices[2].device_name) in out
+
+        assert run(["discover", "--framed-firmware", "--json"]).exit_code == 0
+        results = json.loads(capsys.readouterr().out)
+        assert {port["serial_number"]: port["board"] for port in results} == {
+            "SN0": True, "SN1": True, "SN2": False, "SN9": False}
+
+        assert run(["discover", "--cached"]).exit_code == 0
+        out = capsys.readouterr().out
+        assert "[SN1]: BotBlox board (switchblox_nano)" in out
+        assert "SN2" not in out
+
+
+class TestDiscoveryCache:
+    def test_record(self, tmp_path: str) -> None:
+        cache = DiscoveryCache(os.path.join(tmp_path, DiscoveryCache.FILE_NAME))
+        assert cache.get("SN0") is None
+
+        port = DiscoveredPort("/dev/ttyUSB0", "SN0")
+        port.probed, port.found, port.switch_type = True, True, "switchblox"
+        cache.record([port, DiscoveredPort("/dev/ttyS0"), DiscoveredPort("/dev/ttyUSB1", "SN1")])
+        assert cache.get("SN0")["device"] == "/dev/ttyUSB0"
+        assert list(cache.entries()) == ["SN0"]
+
+        # the converter was plugged into another port
+        port.device = "/dev/ttyUSB3"
+        cache.record([port])
+        assert cache.get("SN0")["device"] == "/dev/ttyUSB3"
+
+    def test_invalid_port(self) -> None:
+        port = discover.probe_port(DiscoveredPort("COM3"))  # a Windows port name on another system
+        assert not port.found and port.error is not None
+
+    def test_no_ports(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(discover.list_ports, "comports", lambda: [])
+        assert discover.discover() == []
+        assert run(["discover"]).exit_code == 1
+        assert run(["discover", "--framed-firmware"]).exit_code == 1
@@ -0,0 +1,136 @@
+import json
+import os
+from typing import Any, List
+
+import pytest
+from botblox_config.cli import create_parser, parse_commands
+from botblox_config.data_manager import profiles as profile_module
+from botblox_config.data_manager.profiles import build_profile, compile_profile, parse_profile
+from botblox_config.switch import create_switch
+
+PROFILE = {
+    'switch': 'switchblox',
+    'vlan': {'groups': [[1, 2], [3, 4]]},
+    'mirror': {'mode': 'RXandTX', 'mirror_port': 5, 'rx_ports': [1], 'tx_ports': [2]},
+    'tag_vlan': {'vlan_mode': 'ENABLED', 'vlans': {'2': [1, 2], '3': [3]}, 'ports': {'1': {'default_vlan': 2}}},
+}
+
+YAML_PROFILE = '''
+switch: switchblox
+vlan:
+  groups: [[1, 2], [3, 4]]
+mirror:
+  mode: RXandTX
+  mirror_port: 5
+  rx_ports: [1]
+  tx_ports: [2]
+tag_vlan:
+  vlan_mode: ENABLED
+  vlans:
+    2: [1, 2]
+    3: [3]
+  ports:
+    1: {default_vlan: 2}
+'''
+
+TOML_PROFILE = '''
+switch = "switchblox"
+
+[vlan]
+groups = [[1, 2], [3, 4]]
+
+[mirror]
+mode = "RXandTX"
+mirror_port = 5
+rx_ports = [1]
+tx_ports = [2]
+
+[tag_vlan]
+vlan_mode = "ENABLED"
+vlans = { 2 = [1, 2], 3 = [3] }
+ports = { 1 = { default_vlan = 2 } }
+'''
+
+
+def cli_commands(switch_type: str = 'switchblox') -> List[List[int]]:
+    _, transaction = parse_commands(create_parser(), [
+        '--switch', switch_type,
+        'vlan', '--group', '1', '2', '--group', '3', '4', '+',
+        'mirror', '--mode', 'RXandTX', '--mirror-port', '5', '--rx-port', '1', '--tx-port', '2', '+',
+        'tag-vlan', '--vlan-mode', 'ENABLED', '--vlan', '2', '1', '2', '--vlan', '3', '3',
+        '--port-default-vlan', '1', '2',
+    ])
+    return transaction.get_commands()
+
+
+def write_profile(tmp_path: Any, name: str, content: str) -> str:
+    path = str(tmp_path / name)
+    with open(path, 'wt') as f:
+        f.write(content)
+    return path
+
+
+class TestProfile:
+    def test_same_commands_as_cli(self, tmp_path: Any) -> None:
+        expected = cli_commands()
+        assert compile_profile(write_profile(tmp_path, 'site.json', json.dumps(PROFILE)), 'switchblox') == expected
+        assert compile_profile(write_profile(tmp_path, 'site.toml', TOML_PROFILE), 'switchblox') == expected
+        pytest.importorskip('yaml')
+        assert compile_profile(write_profile(tmp_path, 'site.yaml', YAML_PROFILE), 'switchblox') == expected
+
+    def test_unchanged_profile_is_not_parsed_again(self, tmp_path: Any, monkeypatch: Any) -> None:
+        path = write_profile(tmp_path, 'site.json', json.dumps(PROFILE))
+        commands = compile_profile(path, 'switchblox')
+
+        def fail(*args: Any) -> None:
+            raise AssertionError('profile parsed again')
+        monkeypatch.setattr(profile_module, 'parse_profile', fail)
+        monkeypatch.setattr(profile_module, 'create_switch', fail)
+        assert compile_profile(path, 'switchblox') == commands
+
+        # another switch type or a changed profile need new commands
+        with pytest.raises(AssertionError):
+            compile_profile(path, 'nano')
+        write_profile(tmp_path, 'site.json', json.dumps(dict(PROFILE, erase=True)))
+        with pytest.raises(AssertionError):
+            compile_profile(path, 'switchblox')
+
+    def test_reset_and_erase(self) -> None:
+        switch = create_switch('switchblox')
+        transaction = build_profile({'erase': True, 'vlan': {'reset': True}, 'mirror': {'reset': True}}, switch)
+        commands = transaction.get_commands()
+        assert commands[0] == [101, 0, 0, 0]
+        assert [c[0:2] for c in commands[1:]] == [[20, 3], [20, 4], [23, 16], [23, 17], [23, 18]]
+
+    @pytest.mark.parametrize('profile', [
+        {'vlans': {}},
+        {'vlan': {'groups': [[1, 9]]}},
+        {'vlan': [[1, 2]]},
+        {'mirror': {'mode': 'both'}},
+        {'tag_vlan': {'vlan_mode': 'ENABLED', 'ports': {'1': {'defaut_vlan': 2}}}},
+        {'tag_vlan': {'vlans': {'x': [1]}}},
+        {'tag_vlan': {'force_vlan_id': 'yes'}},
+    ])
+    def test_invalid_profile(self, profile: Any) -> None:
+        with pytest.raises(ValueError):
+            build_profile(profile, create_switch('switchblox'))
+
+    def test_invalid_file(self, tmp_path: Any, cache_dir: str) -> None:
+        with pytest.raises(ValueError):
+            compile_profile(write_profile(tmp_path, 'site.ini', '[vlan]'), 'switchblox')
+        with pytest.raises(ValueError):
+            compile_profile(write_profile(tmp_path, 'site.json', '{"vlan": '), 'switchblox')
+        with pytest.raises(ValueError):
+            compile_profile(write_profile(tmp_path, 'site.json', json.dumps(PROFILE)), 'nano')
+        assert not os.path.exists(os.path.join(cache_dir, 'commands'))
+
+    def test_empty_profile(self) -> None:
+        assert parse_profile(b'', 'toml') == {}
+
+    def test_apply_command(self, tmp_path: Any) -> None:
+        path = write_profile(tmp_path, 'site.json', json.dumps(PROFILE))
+        args, transaction = parse_commands(create_parser(), ['--device', 'test', 'apply', '--profile', path])
+        assert transaction.get_commands() == cli_commands()
+
+        args, transaction = parse_commands(create_parser(), ['apply', '--profile', path, '+', 'erase'])
+        assert transaction.get_commands() == [[101, 0, 0, 0]] + cli_commands()
@@ -0,0 +1,126 @@
+import json
+import os
+from typing import Any, List
+
+import pytest
+from botblox_config.batch import compile_commands
+from botblox_config.cli import create_parser, parse_commands
+from botblox_config.data_manager.mirror import PortMirrorConfig
+from botblox_config.data_manager.transaction import ConfigTransaction
+from botblox_config.data_manager.vlan import VlanConfig
+from botblox_config.switch import create_switch
+from botblox_config.switch.config_writer import ConfigWriter
+
+
+class RecordingWriter(ConfigWriter):
+    def __init__(self) -> None:
+        super().__init__("test")
+        self.writes: List[List[Any]] = list()
+
+    def write(self, data: List[Any]) -> bool:
+        self.writes.append(data)
+        return True
+
+
+class TestConfigTransaction:
+    def test_configs_are_merged(self) -> None:
+        switch = create_switch("switchblox")
+        transaction = ConfigTransaction(switch)
+        vlan = VlanConfig(switch)
+        vlan.add_group([switch.get_port("1"), switch.get_port("2")])
+        mirror = PortMirrorConfig(switch)
+        mirror.set_rx_ports([switch.get_port("3")])
+        transaction.add(vlan).add(mirror)
+
+        writer = RecordingWriter()
+        assert transaction.write(writer)
+        assert writer.writes == [[
+            [20, 3, 16, 128], [20, 4, 1, 224],
+            [23, 16, 12, 12], [23, 17, 255, 0], [23, 18, 255, 255],
+            [100, 0, 0, 0],
+        ]]
+
+    def test_config_of_other_switch(self) -> None:
+        transaction = ConfigTransaction(create_switch("switchblox"))
+        with pytest.raises(ValueError):
+            transaction.add(VlanConfig(create_switch("switchblox")))
+
+    def test_added_commands_replace_registers(self) -> None:
+        transaction = ConfigTransaction(create_switch("switchblox"))
+        transaction.add_commands([[23, 16, 1, 0], [23, 17, 1, 0]])
+        transaction.add_commands([[23, 16, 2, 0], [101, 0, 0, 0], [100, 0, 0, 0]])
+        assert transaction.get_commands() == [[101, 0, 0, 0], [23, 16, 2, 0], [23, 17, 1, 0]]
+
+    def test_commands_are_merged_in_order(self) -> None:
+        switch = create_switch("switchblox")
+        transaction = ConfigTransaction(switch)
+        vlan = VlanConfig(switch)
+        vlan.add_group([switch.get_port("1"), switch.get_port("2")])
+        transaction.add(vlan)
+        transaction.add_commands([[23, 16, 1, 0]])
+        assert [23, 16, 1, 0] in transaction.get_commands()
+
+        mirror = PortMirrorConfig(switch)
+        mirror.set_rx_ports([switch.get_port("3")])
+        transaction.add(mirror)  # does not change the VLAN registers
+        assert [23, 16, 1, 0] in transaction.get_commands()
+
+        vlan.add_group([switch.get_port("1"), switch.get_port("3")])
+        transaction.add(vlan)  # changes the VLAN registers again
+        assert [23, 16, 28, 12] in transaction.get_commands()
+
+
+class TestCombinedCommands:
+    def test_cli_commands_share_one_register_image(self) -> None:
+        argv = [
+            '--device', 'test',
+            'vlan', '--group', '1', '2', '+',
+            'mirror', '--rx-port', '3', '+',
+            'tag-vlan', '--vlan', '2', '1', '2',
+        ]
+        _, transaction = parse_commands(create_parser(), argv)
+        commands = transaction.get_commands()
+        registers = [(c[0], c[1]) for c in commands]
+        assert len(registers) == len(set(registers))
+        assert [23, 16, 12, 12] in commands
+        assert [20, 3, 16, 128] in commands
+        assert [24, 1, 2, 0] in commands
+
+    def test_profile_and_cli_commands_in_order(self, tmp_path: str) -> None:
+        path = os.path.join(tmp_path, "profile.json")
+        with open(path, "wt") as f:
+            json.dump({"switch": "switchblox", "vlan": {"groups": [[1, 3]]}}, f)
+
+        def commands(*argv: str) -> List[List[int]]:
+            return parse_commands(create_parser(), ['--device', 'test'] + list(argv))[1].get_commands().tolist()
+
+        profile = commands('apply', '-p', path)
+        vlan = commands('vlan', '--group', '1', '2')
+        assert [23, 16, 20, 255] in profile and [23, 16, 12, 12] in vlan
+
+        assert commands('vlan', '--group', '1', '2', '+', 'apply', '-p', path) == profile
+        assert commands('apply', '-p', path, '+', 'vlan', '--group', '1', '2') == vlan
+        combined = commands('vlan', '--group', '1', '2', '+', 'apply', '-p', path, '+', 'mirror', '--rx-port', '3')
+        assert [23, 16, 20, 255] in combined
+        assert [20, 3, 16, 128] in combined
+
+    def test_erase_comes_first(self) -> None:
+        _, transaction = parse_commands(create_parser(), ['--device', 'test', 'vlan', '--reset', '+', 'erase'])
+        assert transaction.get_commands()[0] == [101, 0, 0, 0]
+
+    @pytest.mark.parametrize("argv", [
+        ['--device', 'test', 'vlan', '--reset', '+'],
+        ['--device', 'test', 'vlan', '--reset', '+', 'batch', 'manifest.json'],
+        ['--device', 'test', 'batch', 'manifest.json', '+', 'erase'],
+    ])
+    def test_invalid_combination(self, argv: List[str]) -> None:
+        with pytest.raises(SystemExit):
+            parse_commands(create_parser(), argv)
+
+    def test_batch_config_with_several_commands(self) -> None:
+        commands = compile_commands("switchblox", ["vlan", "--reset", "+", "mirror", "--reset"])
+        assert commands == [
+            [20, 3, 1, 0], [20, 4, 1, 224],
+            [23, 16, 255, 255], [23, 17, 255, 0], [23, 18, 255, 255],
+            [100, 0, 0, 0],
+        ]
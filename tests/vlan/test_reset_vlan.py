@@ -18,7 +18,7 @@ class TestSetReset:
         self,
     ) -> None:
         data = get_data_from_cli_args(
-            parser=create_parser(self.base_args),
+            parser=create_parser(),
             args=self.base_args,
         )
         assert_ip175g_command_is_correct_type(data=data)
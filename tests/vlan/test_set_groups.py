@@ -25,8 +25,23 @@ class TestSetGroups:
             '4',
         ]
 
-        data = get_data_from_cli_args(parser=create_parser(args), args=args)
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
         assert_ip175g_command_is_correct_type(data=data)
 
         expected_result = [[23, 16, 12, 12], [23, 17, 80, 0], [23, 18, 80, 255]]
         assert data == expected_result
+
+    def test_nano_groups(
+        self,
+    ) -> None:
+        args = ['--switch', 'nano'] + self.base_args + [
+            '--group',
+            '1',
+            '3',
+        ]
+
+        data = get_data_from_cli_args(parser=create_parser(), args=args)
+        assert_ip175g_command_is_correct_type(data=data)
+
+        expected_result = [[23, 16, 20, 255], [23, 17, 20, 0]]
+        assert data == expected_result